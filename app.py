@@ -1,26 +1,31 @@
 import streamlit as st
-import pandas as pd
 import datetime
 import time
 import random
 import sqlite3
-import vertexai
-try:
-    # 新しいVertex AI SDK を試す
-    from vertexai.generative_models import GenerativeModel
-except ImportError:
-    # フォールバック: 古いAPI
-    from vertexai.preview.generative_models import GenerativeModel
 import os
 import io
 import re
-import gspread
-from google.oauth2.service_account import Credentials
 import pickle
+import functools
+
+# 重いSDKは最初に使う時点で読み込む（ログイン画面の表示を待たせない）
+# vertexai / google.oauth2 は使用箇所で関数内インポート
+from lazy_imports import lazy_import
+pd = lazy_import("pandas")
+gspread = lazy_import("gspread")
+
+from config import Config
 
 # 🔐 認証システムのインポート
 from auth_system import check_password, show_auth_status
 
+# 📈 メトリクス公開（ログイン前の最初の再実行で起動、プロセスで1回のみ）
+# ログイン画面を開いたままでもスクレイプできるよう認証チェックより前に起動する
+if Config.METRICS_PORT:
+    from metrics import start_metrics_server
+    start_metrics_server(Config.METRICS_PORT, Config.DATABASE_PATH)
+
 # 🔐 認証チェック（アプリの最初に実行）
 if not check_password():
     st.stop()
@@ -28,10 +33,57 @@ if not check_password():
 # 🔐 認証状態表示
 show_auth_status()
 
-from config import Config
+# 🔥 ウォームアップ（ログイン後にバックグラウンドで実行、プロセスで1回のみ）
+# ログイン画面の表示では重いSDKの読み込みやトークンファイルの読み書きを行わない
+if Config.PREWARM_ON_START:
+    from prewarm import default_tasks, start_prewarm
+    if Config.is_production_environment() and "gcp_service_account" in st.secrets:
+        start_prewarm(default_tasks(Config.DATABASE_PATH, dict(st.secrets["gcp_service_account"])))
+    else:
+        start_prewarm(default_tasks(Config.DATABASE_PATH))
 
 # X API投稿機能
 from x_api_poster import x_poster
+from x_async_poster import async_available, summarize_batch_results
+
+# 一括送信エンジン・送信アウトボックス
+from bulk_sender import BulkSendEngine, in_send_worker
+from send_outbox import SendOutbox, start_outbox_dispatcher
+from schedule_lease import (
+    claim_posts, claim_retweet, ensure_lease_columns, finish_retweets,
+    count_expired_post_leases, make_lease_owner, release_expired_post_leases, renew_post_leases,
+    reschedule_failed_retweet,
+)
+
+# プロセス共通キャッシュ
+from data_cache import (
+    APP_SETTINGS_KEY, app_settings_cache, bump_reference_tables_for_query, invalidate_cast_sheets_config,
+    reference_cache,
+)
+
+# Google Drive URL正規化
+from drive_url import normalize_drive_url, validate_image_url
+
+# X投稿用メディアの事前検証
+from media_pipeline import inspect_media
+
+# リツイート予約のアプリ内タイマー
+from retweet_scheduler import (
+    execute_retweet, get_retweet_timer, now_jst_str, settle_retweets, shared_rate_limits, start_retweet_timer,
+)
+
+# Vertex AI / Gemini モデルのプロセス共通レジストリ
+from gemini_models import gemini_models, service_account_identity
+
+# ホットパスの処理時間計測
+from perf_timing import CATEGORY_LABELS, perf, timed
+
+# Gemini のトークン使用量・コスト台帳、投稿文の生成
+from generation_usage import GenerationBudgetExceeded, GenerationUsageLedger
+import post_generation
+
+# 投稿・リツイート予約の送信（Google Sheets / Cloud Functions / GAS）
+from post_senders import CloudFunctionsPoster, PostSender, setup_google_sheets_oauth_simple
 
 # Cloud Functions投稿クライアント
 import requests
@@ -109,35 +161,6 @@ def initialize_database_for_production():
 # Initialize production environment
 setup_production_environment()
 
-class CloudFunctionsPoster:
-    """Cloud Functions経由のX投稿クライアント"""
-    
-    def __init__(self, function_url=None):
-        self.function_url = function_url or os.environ.get('CLOUD_FUNCTIONS_URL')
-    
-    def post_tweet(self, account_id, text, image_url=None):
-        """Cloud Functions経由でX投稿"""
-        if not self.function_url:
-            return {"status": "error", "message": "Cloud Functions URL not configured"}
-        
-        payload = {
-            "account_id": account_id,
-            "text": text,
-            "image_url": image_url
-        }
-        
-        try:
-            response = requests.post(
-                self.function_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            
-            return response.json()
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-
 class DualPostingSystem:
     """デュアル投稿システム：スプレッドシート + Cloud Functions"""
     
@@ -301,6 +324,17 @@ if not project_id:
 # Vertex AI基本地域（最も確実）
 location = "us-central1"  # Vertex AIの基本地域
 DB_FILE = "casting_office.db"
+
+# 送信処理（Streamlit に依存しないため送信ワーカー・ベンチマークからも同じ処理を使う）
+post_sender = PostSender(DB_FILE)
+get_cast_sheets_config = post_sender.get_cast_sheets_config
+get_cast_name_by_id = post_sender.get_cast_name
+get_account_id_for_cast_local = post_sender.get_account_id_for_cast
+send_to_google_sheets = post_sender.send_to_google_sheets
+send_to_x_api = post_sender.send_to_x_api
+send_post_to_destination = post_sender.send_post_to_destination
+send_retweet_to_google_sheets = post_sender.send_retweet_to_google_sheets
+send_retweet_to_gas_direct = post_sender.send_retweet_to_gas_direct
 JST = datetime.timezone(datetime.timedelta(hours=9))
 
 # --- データベースの列定義 ---
@@ -312,6 +346,14 @@ PERSONA_FIELDS = [
 ]
 
 # --- データベース関数 ---
+def show_error(message):
+    """エラーを画面に表示（送信ワーカーのスレッドには Streamlit の実行コンテキストがないためログに出力）"""
+    if in_send_worker():
+        print(f"❌ {message}")
+    else:
+        st.error(message)
+
+@timed("execute_query", "db")
 def execute_query(query, params=(), fetch=None):
     """データベース接続、クエリ実行、接続切断を安全に行う"""
     conn = None
@@ -328,18 +370,59 @@ def execute_query(query, params=(), fetch=None):
             result = cursor.fetchall()
         else:
             conn.commit()
+            bump_reference_tables_for_query(query)
             result = cursor.lastrowid if cursor.lastrowid else None
         return result
     except sqlite3.Error as e:
         if "UNIQUE constraint failed" in str(e):
-            st.error(f"データベースエラー: 同じ内容が既に存在するため、追加できません。")
+            show_error(f"データベースエラー: 同じ内容が既に存在するため、追加できません。")
         else:
-            st.error(f"データベースエラー: {e}")
+            show_error(f"データベースエラー: {e}")
         return None if fetch else False
     finally:
         if conn:
             conn.close()
 
+def cached_query(query, tables, params=()):
+    """参照用データを取得（対象テーブルが更新されるまでプロセス共通でキャッシュ）
+
+    Args:
+        tables (tuple): クエリが参照するテーブル（execute_query での更新時に変更カウンターが進む）
+    """
+    rows = reference_cache.get_or_load((query, params), tables, lambda: execute_query(query, params, fetch="all"))
+    if rows is None:
+        # 読み込みに失敗した場合はキャッシュせず次回再取得
+        reference_cache.invalidate((query, params))
+        return []
+    return list(rows)
+
+@timed("execute_many", "db")
+def execute_many(statements):
+    """複数の更新クエリを1トランザクションでまとめて実行する
+
+    Args:
+        statements (list[tuple]): (query, params) のリスト
+    """
+    if not statements:
+        return True
+    conn = None
+    try:
+        conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA foreign_keys = ON;")
+        with conn:
+            for query, params in statements:
+                cursor.execute(query, params)
+        for query, _ in statements:
+            bump_reference_tables_for_query(query)
+        return True
+    except sqlite3.Error as e:
+        show_error(f"データベースエラー: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
 def init_db():
     """データベースとテーブルを初期化する"""
     persona_columns = ", ".join([f"{field} TEXT" for field in PERSONA_FIELDS if field != 'name'])
@@ -429,6 +512,7 @@ def init_db():
         ]
         for setting in default_settings:
             execute_query("INSERT OR REPLACE INTO app_settings (key, value, description, category) VALUES (?, ?, ?, ?)", setting)
+        app_settings_cache.invalidate(APP_SETTINGS_KEY)
     
     # 既存のpostsテーブルに新しいカラムを追加（マイグレーション）
     # カラムの存在確認と追加
@@ -446,24 +530,25 @@ def init_db():
     
     add_column_if_not_exists("posts", "sent_status", "TEXT DEFAULT 'not_sent'")
     add_column_if_not_exists("posts", "sent_at", "TEXT")
+    add_column_if_not_exists("posts", "scheduled_at", "TEXT")
+
+    # 投稿一覧のページ送り用インデックス
+    execute_query("CREATE INDEX IF NOT EXISTS idx_posts_cast_status_created ON posts(cast_id, status, created_at)")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_send_history_post_id ON send_history(post_id)")
+
+    # 送信アウトボックス
+    SendOutbox(DB_FILE).ensure_schema()
+    GenerationUsageLedger(DB_FILE).ensure_schema()
+
+    # 予約実行・送信のリース用の列
+    ensure_lease_columns(DB_FILE)
 
 def initialize_default_settings():
-    """デフォルト設定を初期化"""
-    # app_settingsテーブルが存在するか確認
-    tables = execute_query("SELECT name FROM sqlite_master WHERE type='table' AND name='app_settings'", fetch="all")
-    if not tables:
-        # テーブルが存在しない場合は作成
-        execute_query("""
-            CREATE TABLE app_settings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                key TEXT UNIQUE NOT NULL,
-                value TEXT NOT NULL,
-                description TEXT,
-                category TEXT DEFAULT 'その他'
-            )
-        """)
-    
-    # デフォルト設定を挿入
+    """デフォルト設定を初期化（app_settings テーブルは init_db で作成済み）
+
+    再実行のたびに呼ばれるため、キャッシュ済みの設定と比較して未登録のキーだけを1トランザクションで追加する
+    """
+    # デフォルト設定を挿入（既存の設定値は上書きしない）
     default_settings = [
         ("default_char_count", "300", "デフォルト文字数", "投稿生成"),
         ("default_placeholder", "今日の出来事について教えて", "デフォルトプレースホルダー", "投稿生成"),
@@ -492,10 +577,19 @@ def initialize_default_settings():
         ("cast_reason_for_job_placeholder", "様々な人の物語に触れたいから", "なぜこの仕事をしているのかプレースホルダー", "キャスト管理"),
         ("cast_secret_placeholder", "実は、大のSF小説好き", "ちょっとした秘密プレースホルダー", "キャスト管理"),
         ("cast_customer_interaction_placeholder", "お客様の心に寄り添うように、静かに話を聞く", "お客様への接し方プレースホルダー", "キャスト管理"),
+        ("gemini_monthly_budget_usd", "0", "Gemini月間予算（USD、0は無制限）", "AI設定"),
+        ("gemini_budget_throttle_ratio", "0.8", "予算のこの割合を超えたらバッチ生成の間隔を空ける", "AI設定"),
     ]
     
-    for key, value, description, category in default_settings:
-        execute_query("INSERT OR REPLACE INTO app_settings (key, value, description, category) VALUES (?, ?, ?, ?)", (key, value, description, category))
+    existing_keys = load_app_settings()
+    missing_settings = [setting for setting in default_settings if setting[0] not in existing_keys]
+    if not missing_settings:
+        return
+    execute_many([
+        ("INSERT OR IGNORE INTO app_settings (key, value, description, category) VALUES (?, ?, ?, ?)", setting)
+        for setting in missing_settings
+    ])
+    app_settings_cache.invalidate(APP_SETTINGS_KEY)
 
 def format_persona(cast_id, cast_data):
     if not cast_data: return "ペルソナデータがありません。"
@@ -519,9 +613,38 @@ def load_css(file_name):
     except FileNotFoundError:
         st.warning(f"CSSファイル '{file_name}' が見つかりません。")
 
+def show_rerun_profile(placeholder):
+    """今回の再実行の処理時間の内訳をサイドバーに表示"""
+    profile = perf.current_profile()
+    if profile is None:
+        return
+    summary = profile.summary()
+    with placeholder.container():
+        with st.expander(f"⏱️ 処理時間 {summary['total_ms']:.0f} ms", expanded=False):
+            st.caption(f"ページ: {summary['page']}")
+            for category, label in CATEGORY_LABELS.items():
+                st.text(f"{label:<6} {summary[f'{category}_ms']:9.1f} ms")
+            st.text(f"{'描画':<5} {summary['render_ms']:9.1f} ms")
+            if summary['operations']:
+                st.dataframe([{
+                    '処理': item['operation'],
+                    '回数': item['count'],
+                    '合計ms': round(item['ms'], 1),
+                } for item in summary['operations']], use_container_width=True, hide_index=True)
+            page_stats = [row for row in perf.snapshot() if row['page'] == summary['page']]
+            if page_stats:
+                st.caption("このページの累計（プロセス内）")
+                st.dataframe([{
+                    '処理': row['operation'],
+                    '回数': row['count'],
+                    '平均ms': round(row['avg_ms'], 1),
+                    'p95ms': row['p95_ms'],
+                    '最大ms': round(row['max_ms'], 1),
+                } for row in page_stats], use_container_width=True, hide_index=True)
+
 def get_dynamic_persona_fields():
     """動的に定義されたペルソナフィールドを取得"""
-    custom_fields = execute_query("SELECT field_name FROM custom_fields ORDER BY sort_order", fetch="all")
+    custom_fields = cached_query("SELECT field_name FROM custom_fields ORDER BY sort_order", ('custom_fields',))
     if custom_fields:
         custom_field_names = [field['field_name'] for field in custom_fields]
         return PERSONA_FIELDS + custom_field_names
@@ -584,22 +707,48 @@ def parse_ai_profile(ai_text, name, nickname, categories):
     
     return cast_data
 
-def safe_generate_content(model, prompt, delay_seconds=1.0):
-    """レート制限対策を含む安全なコンテンツ生成"""
-    try:
-        # レート制限回避のため少し待機
-        time.sleep(delay_seconds)
-        
-        response = model.generate_content(prompt)
-        return response
-    except Exception as e:
-        if "429" in str(e) or "Quota exceeded" in str(e):
-            st.error("⚠️ API使用量制限に達しました。数分お待ちください。")
-            st.info("💡 制限回避のため、生成間隔を空けるか、しばらく時間を置いてから再実行してください。")
-            time.sleep(5)  # 5秒待機
-            raise e
-        else:
-            raise e
+def init_vertex_ai(use_cloud_secrets=False):
+    """Vertex AI を初期化（プロセス共通、同じ認証情報で初期化済みの場合は何もしない）"""
+    if use_cloud_secrets:
+        # Streamlit Cloud secrets のサービスアカウントで認証
+        from google.oauth2 import service_account
+        credentials_info = dict(st.secrets["gcp_service_account"])
+        credentials = service_account.Credentials.from_service_account_info(credentials_info)
+        return gemini_models.init(project_id, location, credentials, service_account_identity(credentials_info))
+    # ローカル開発環境・デフォルト認証
+    return gemini_models.init(project_id, location)
+
+def check_generation_budget():
+    """今月の Gemini 推定コストと予算の状態
+
+    Returns:
+        tuple: ('ok' / 'throttle' / 'block', 今月の推定コスト(USD), 月間予算(USD))
+    """
+    return post_generation.check_generation_budget(
+        DB_FILE,
+        get_app_setting_float("gemini_monthly_budget_usd", 0.0),
+        get_app_setting_float("gemini_budget_throttle_ratio", 0.8)
+    )
+
+def show_generation_rate_limit():
+    st.error("⚠️ API使用量制限に達しました。数分お待ちください。")
+    st.info("💡 制限回避のため、生成間隔を空けるか、しばらく時間を置いてから再実行してください。")
+
+@timed("safe_generate_content", "ai")
+def safe_generate_content(model, prompt, delay_seconds=1.0, cast_id=None, batch=False):
+    """レート制限対策を含む安全なコンテンツ生成（アプリ設定の月間予算と画面通知で post_generation を呼ぶ）
+
+    Args:
+        cast_id (int, optional): 使用量台帳に記録するキャストID
+        batch (bool): 一括生成の場合 True（月間予算の警告ラインで間隔を空け、予算到達で GenerationBudgetExceeded）
+    """
+    return post_generation.safe_generate_content(
+        model, prompt, DB_FILE, delay_seconds, cast_id, batch,
+        budget_usd=get_app_setting_float("gemini_monthly_budget_usd", 0.0),
+        throttle_ratio=get_app_setting_float("gemini_budget_throttle_ratio", 0.8),
+        page=perf.current_page(),
+        on_rate_limited=show_generation_rate_limit,
+    )
 
 def clean_generated_content(content):
     """生成されたコンテンツから不要な指示文・例文を除去し、最初の投稿のみを返す"""
@@ -703,56 +852,7 @@ def clean_generated_content(content):
     print(f"✨ [DEBUG] 最終結果: {repr(result)}")
     return result
 
-def setup_google_sheets_oauth_simple():
-    """シンプル版Google Sheets OAuth認証（共通認証ファイル使用）"""
-    try:
-        from google.auth.transport.requests import Request
-        from google_auth_oauthlib.flow import InstalledAppFlow
-        import pickle
-        
-        SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-        credentials_path = "credentials/credentials.json"
-        token_path = "credentials/token.pickle"
-        
-        creds = None
-        
-        # 既存のトークンを確認
-        if os.path.exists(token_path):
-            with open(token_path, 'rb') as token:
-                creds = pickle.load(token)
-                
-                # 辞書形式の場合はCredentialsオブジェクトに変換
-                if isinstance(creds, dict):
-                    from google.oauth2.credentials import Credentials
-                    creds = Credentials(
-                        token=creds.get('access_token'),
-                        refresh_token=creds.get('refresh_token'),
-                        token_uri=creds.get('token_uri'),
-                        client_id=creds.get('client_id'),
-                        client_secret=creds.get('client_secret'),
-                        scopes=creds.get('scopes', SCOPES)
-                    )
-        
-        # 認証が必要な場合
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                if not os.path.exists(credentials_path):
-                    return None, "共通認証ファイルが見つかりません: credentials/credentials.json"
-                
-                # シンプル版：自動ブラウザ認証
-                flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
-                creds = flow.run_local_server(port=0)
-            
-            # トークンを保存
-            os.makedirs("credentials", exist_ok=True)
-            with open(token_path, 'wb') as token:
-                pickle.dump(creds, token)
-        
-        return creds, "認証成功"
-    except Exception as e:
-        return None, f"OAuth認証エラー: {str(e)}"
+
 
 def setup_google_sheets_oauth(credentials_path="credentials/credentials.json"):
     """Google Sheets OAuth認証の初期設定（複雑版 - 下位互換用）"""
@@ -913,197 +1013,7 @@ def setup_google_sheets_oauth(credentials_path="credentials/credentials.json"):
 
 def convert_google_drive_url(url):
     """Google Drive共有URLを直接アクセス可能なURLに変換"""
-    if not url or 'drive.google.com' not in url:
-        return url
-    
-    # Google Drive共有URLのパターンを検出
-    import re
-    
-    # パターン1: https://drive.google.com/file/d/FILE_ID/view?usp=sharing
-    pattern1 = r'https://drive\.google\.com/file/d/([a-zA-Z0-9_-]+)/view'
-    match1 = re.search(pattern1, url)
-    if match1:
-        file_id = match1.group(1)
-        return f"https://drive.google.com/uc?export=view&id={file_id}"
-    
-    # パターン2: https://drive.google.com/open?id=FILE_ID
-    pattern2 = r'https://drive\.google\.com/open\?id=([a-zA-Z0-9_-]+)'
-    match2 = re.search(pattern2, url)
-    if match2:
-        file_id = match2.group(1)
-        return f"https://drive.google.com/uc?export=view&id={file_id}"
-    
-    # 既に変換済みのURL
-    if 'uc?export=view&id=' in url:
-        return url
-    
-    return url  # 変換できない場合は元のURLを返す
-
-def send_to_google_sheets(cast_name, post_content, scheduled_datetime, cast_id=None, action_type='post', image_urls=None):
-    """Google Sheetsにデータを送信する（アクション別シート対応・Google Drive URL対応）"""
-    try:
-        os.makedirs("credentials", exist_ok=True)
-        
-        # キャスト別・アクション別スプレッドシート設定をチェック
-        cast_config = None
-        if cast_id:
-            cast_config = get_cast_sheets_config(cast_id, action_type)
-        
-        if cast_config:
-            # キャスト別スプレッドシート設定を使用
-            spreadsheet_id = cast_config['spreadsheet_id']
-            sheet_name = cast_config['sheet_name'] or 'Sheet1'
-        else:
-            # デフォルト設定を使用
-            spreadsheet_id = "1VPSyQOp0p2U9bPHghP4JZiyePsev2Uoq3nVbbC26VAo"  # デフォルトスプレッドシート
-            sheet_name = "Sheet1"
-        
-        # シンプル版OAuth認証を実行（共通認証ファイル使用）
-        creds, auth_message = setup_google_sheets_oauth_simple()
-        if not creds:
-            return False, auth_message
-        
-        client = gspread.authorize(creds)
-        
-        # スプレッドシートを開く
-        try:
-            if cast_config and cast_config['spreadsheet_id']:
-                # スプレッドシートIDで直接開く
-                spreadsheet = client.open_by_key(cast_config['spreadsheet_id'])
-                try:
-                    sheet = spreadsheet.worksheet(sheet_name)
-                except gspread.WorksheetNotFound:
-                    # シートが存在しない場合は作成
-                    sheet = spreadsheet.add_worksheet(title=sheet_name, rows=1000, cols=10)
-                    sheet.append_row(["datetime", "content", "name"])
-            else:
-                # デフォルト動作：名前でスプレッドシートを開く
-                try:
-                    sheet = client.open(spreadsheet_id).sheet1
-                except gspread.SpreadsheetNotFound:
-                    # スプレッドシートが存在しない場合は作成
-                    spreadsheet = client.create(spreadsheet_id)
-                    sheet = spreadsheet.sheet1
-                    # ヘッダー行を追加
-                    sheet.append_row(["datetime", "content", "name"])
-        except Exception as e:
-            return False, f"スプレッドシートアクセスエラー: {str(e)}"
-        
-        # データを追加（日時, 投稿内容, name, 画像URL1-4 の順）
-        formatted_datetime = scheduled_datetime.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 画像URLを4列分に分割（最大4枚対応・Google Drive URL変換）
-        image_url_columns = ['', '', '', '']  # 空の4列を準備
-        if image_urls:
-            for i, url in enumerate(image_urls[:4]):  # 最大4枚まで
-                if url:
-                    # Google Drive URLを直接アクセス可能な形式に変換
-                    converted_url = convert_google_drive_url(url)
-                    image_url_columns[i] = converted_url
-        
-        # ヘッダーが存在しない場合は作成
-        try:
-            headers = sheet.row_values(1)
-            if not headers or len(headers) < 7:  # datetime, content, name, image1-4
-                sheet.clear()
-                sheet.append_row(["datetime", "content", "name", "image_url1", "image_url2", "image_url3", "image_url4"])
-        except:
-            # シートが空の場合
-            sheet.append_row(["datetime", "content", "name", "image_url1", "image_url2", "image_url3", "image_url4"])
-        
-        # データ行を追加
-        row_data = [formatted_datetime, post_content, cast_name] + image_url_columns
-        sheet.append_row(row_data)
-        
-        if cast_config:
-            return True, f"キャスト専用Google Sheetsに送信しました。(スプレッドシートID: {cast_config['spreadsheet_id'][:10]}...)"
-        else:
-            return True, "デフォルトGoogle Sheetsに送信しました。"
-        
-    except Exception as e:
-        return False, f"Google Sheets送信エラー: {str(e)}"
-
-def send_retweet_to_google_sheets(cast_id, tweet_id, comment, scheduled_datetime):
-    """リツイート予約をGoogle Sheetsに送信"""
-    try:
-        # リツイート用の設定を取得
-        config = get_cast_sheets_config(cast_id, 'retweet')
-        if not config:
-            return False, "リツイート用Google Sheets設定が見つかりません"
-        
-        # 認証
-        creds, auth_message = setup_google_sheets_oauth_simple()
-        if not creds:
-            return False, auth_message
-        
-        client = gspread.authorize(creds)
-        
-        # スプレッドシートを開く
-        try:
-            spreadsheet = client.open_by_key(config['spreadsheet_id'])
-            try:
-                sheet = spreadsheet.worksheet(config['sheet_name'])
-            except gspread.WorksheetNotFound:
-                # シートが存在しない場合は作成
-                sheet = spreadsheet.add_worksheet(title=config['sheet_name'], rows=1000, cols=10)
-                # ヘッダー行を追加（GASのretweetMain関数に合わせる）
-                sheet.append_row(["実行日時", "ツイートID", "コメント", "ステータス", "実行完了日時"])
-        except Exception as e:
-            return False, f"スプレッドシートアクセスエラー: {str(e)}"
-        
-        # データを追加（GASの形式に合わせる）
-        formatted_datetime = scheduled_datetime.strftime('%Y-%m-%d %H:%M:%S')
-        sheet.append_row([formatted_datetime, tweet_id, comment or '', '', ''])
-        
-        return True, f"リツイート予約をGoogle Sheetsに送信しました。(ID: {tweet_id})"
-        
-    except Exception as e:
-        return False, f"リツイート予約送信エラー: {str(e)}"
-
-def send_retweet_to_gas_direct(cast_id, tweet_id, comment, scheduled_datetime):
-    """GAS Direct API経由でリツイート予約を送信（スプレッドシート不要）"""
-    try:
-        # GAS Web AppのURLを設定から取得
-        config = get_cast_sheets_config(cast_id, 'retweet')
-        if not config:
-            return False, "リツイート用Google Sheets設定が見つかりません"
-        
-        # GAS Web App URLを取得（新しい設定項目として想定）
-        gas_web_app_url = config.get('gas_web_app_url')
-        if not gas_web_app_url:
-            return False, "GAS Web App URLが設定されていません。設定で 'gas_web_app_url' を追加してください。"
-        
-        # キャスト名を取得
-        cast_name = get_cast_name_by_id(cast_id)
-        
-        # リクエストペイロード
-        payload = {
-            "action": "schedule_retweet",
-            "tweet_id": tweet_id,
-            "comment": comment if comment and comment.strip() else "",
-            "scheduled_at": scheduled_datetime.isoformat(),
-            "cast_name": cast_name
-        }
-        
-        # GAS Web Appに直接POST
-        response = requests.post(
-            gas_web_app_url,
-            json=payload,
-            headers={'Content-Type': 'application/json'},
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('status') == 'success':
-                return True, f"GAS直接予約が完了しました。(ID: {tweet_id}, トリガーID: {result['data'].get('trigger_id', 'N/A')})"
-            else:
-                return False, f"GAS応答エラー: {result.get('message', 'Unknown error')}"
-        else:
-            return False, f"GAS接続エラー: HTTP {response.status_code} - {response.text}"
-            
-    except Exception as e:
-        return False, f"GAS Direct API送信エラー: {str(e)}"
+    return normalize_drive_url(url)
 
 def execute_retweet_via_gas_direct(cast_id, tweet_id, comment):
     """GAS Direct API経由でリツイートを即座に実行"""
@@ -1167,11 +1077,14 @@ def save_retweet_to_database(cast_id, tweet_id, comment, scheduled_datetime):
         # JSTで統一してデータベースに保存
         scheduled_at_str = scheduled_datetime.astimezone(JST).strftime('%Y-%m-%d %H:%M:%S')
         
-        execute_query("""
+        retweet_id = execute_query("""
             INSERT INTO retweet_schedules 
             (cast_id, tweet_id, comment, scheduled_at, status, created_at)
             VALUES (?, ?, ?, ?, 'scheduled', ?)
         """, (cast_id, tweet_id, comment or '', scheduled_at_str, created_at))
+        timer = get_retweet_timer()
+        if timer and retweet_id:
+            timer.schedule(retweet_id, scheduled_at_str)
         
         retweet_type = "引用ツイート" if comment and comment.strip() else "リツイート"
         return True, f"✅ {retweet_type}予約を作成しました（実行予定: {scheduled_datetime.astimezone(JST).strftime('%Y-%m-%d %H:%M')}）"
@@ -1179,43 +1092,121 @@ def save_retweet_to_database(cast_id, tweet_id, comment, scheduled_datetime):
     except Exception as e:
         return False, f"❌ リツイート予約保存エラー: {str(e)}"
 
+RETWEET_STATUS_LABELS = {
+    'scheduled': "🔄 予約中",
+    'running': "⏳ 実行中",
+    'completed': "✅ 完了",
+    'failed': "❌ 失敗",
+}
+RETWEET_PAGE_SIZE = 20
+
+def build_retweet_schedule_filter(cast_id=None, statuses=None, date_from=None, date_to=None):
+    """リツイート予約一覧の絞り込み条件（WHERE句とパラメータ）を作成"""
+    conditions = []
+    params = []
+    if cast_id:
+        conditions.append("rs.cast_id = ?")
+        params.append(cast_id)
+    if statuses:
+        conditions.append(f"rs.status IN ({','.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if date_from:
+        conditions.append("rs.scheduled_at >= ?")
+        params.append(date_from.strftime('%Y-%m-%d 00:00:00'))
+    if date_to:
+        conditions.append("rs.scheduled_at < ?")
+        params.append((date_to + datetime.timedelta(days=1)).strftime('%Y-%m-%d 00:00:00'))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def count_retweet_schedules(cast_id=None, statuses=None, date_from=None, date_to=None):
+    """絞り込み条件に一致するリツイート予約の件数"""
+    where, params = build_retweet_schedule_filter(cast_id, statuses, date_from, date_to)
+    row = execute_query(f"""
+        SELECT COUNT(*) AS count
+        FROM retweet_schedules rs
+        JOIN casts c ON rs.cast_id = c.id
+        {where}
+    """, tuple(params), fetch="one")
+    return row['count'] if row else 0
+
+def fetch_retweet_schedule_page(cast_id=None, statuses=None, date_from=None, date_to=None,
+                                cursor=None, limit=RETWEET_PAGE_SIZE):
+    """リツイート予約を1ページ分取得（実行予定日時の新しい順、キーセット方式）
+
+    Args:
+        cursor (tuple): 前ページ最後の予約の (scheduled_at, id)。None の場合は先頭ページ
+
+    Returns:
+        tuple: (予約のリスト, 次のページがあるか)
+    """
+    where, params = build_retweet_schedule_filter(cast_id, statuses, date_from, date_to)
+    if cursor:
+        keyset = "(rs.scheduled_at < ? OR (rs.scheduled_at = ? AND rs.id < ?))"
+        where = f"{where} AND {keyset}" if where else f"WHERE {keyset}"
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    rows = execute_query(f"""
+        SELECT rs.id, rs.cast_id, rs.tweet_id, rs.comment, rs.scheduled_at, rs.status,
+               rs.created_at, rs.executed_at, rs.result_tweet_id, rs.error_message,
+               c.name as cast_name, c.nickname
+        FROM retweet_schedules rs
+        JOIN casts c ON rs.cast_id = c.id
+        {where}
+        ORDER BY rs.scheduled_at DESC, rs.id DESC
+        LIMIT ?
+    """, tuple(params) + (limit + 1,), fetch="all") or []
+    retweets = [dict(row) for row in rows]
+    return retweets[:limit], len(retweets) > limit
+
 def display_retweet_schedules(cast_id=None):
-    """リツイート予約一覧を表示"""
+    """リツイート予約一覧を表示（絞り込み・ページ送り対応）"""
     try:
-        # クエリ条件
-        if cast_id:
-            query = """
-                SELECT rs.id, rs.tweet_id, rs.comment, rs.scheduled_at, rs.status, 
-                       rs.created_at, rs.executed_at, rs.result_tweet_id, rs.error_message,
-                       c.name as cast_name, c.nickname
-                FROM retweet_schedules rs
-                JOIN casts c ON rs.cast_id = c.id
-                WHERE rs.cast_id = ?
-                ORDER BY rs.scheduled_at DESC
-            """
-            retweets = execute_query(query, (cast_id,), fetch="all")
-        else:
-            query = """
-                SELECT rs.id, rs.tweet_id, rs.comment, rs.scheduled_at, rs.status, 
-                       rs.created_at, rs.executed_at, rs.result_tweet_id, rs.error_message,
-                       c.name as cast_name, c.nickname
-                FROM retweet_schedules rs
-                JOIN casts c ON rs.cast_id = c.id
-                ORDER BY rs.scheduled_at DESC
-            """
-            retweets = execute_query(query, fetch="all")
-        
-        if not retweets:
-            st.info("📭 予約されたリツイートはありません")
+        key_prefix = f"retweet_list_{cast_id or 'all'}"
+        filter_col1, filter_col2, filter_col3 = st.columns([2, 1, 1])
+        with filter_col1:
+            statuses = st.multiselect(
+                "ステータス",
+                list(RETWEET_STATUS_LABELS),
+                default=['scheduled', 'failed'],
+                format_func=lambda status: RETWEET_STATUS_LABELS[status],
+                key=f"{key_prefix}_statuses"
+            )
+        with filter_col2:
+            date_from = st.date_input("📅 開始日", value=None, key=f"{key_prefix}_from")
+        with filter_col3:
+            date_to = st.date_input("📅 終了日", value=None, key=f"{key_prefix}_to")
+        
+        # 絞り込み条件が変わったら先頭ページに戻す
+        filter_key = (tuple(statuses), date_from, date_to)
+        page_state = st.session_state.setdefault(f"{key_prefix}_page", {'filter': filter_key, 'cursors': [None]})
+        if page_state['filter'] != filter_key:
+            page_state['filter'] = filter_key
+            page_state['cursors'] = [None]
+        
+        total = count_retweet_schedules(cast_id, statuses, date_from, date_to)
+        if not total:
+            st.info("📭 条件に一致するリツイート予約はありません")
             return
         
-        st.write(f"📊 {len(retweets)}件の予約があります")
+        retweets, has_next = fetch_retweet_schedule_page(
+            cast_id, statuses, date_from, date_to, cursor=page_state['cursors'][-1]
+        )
+        if not retweets and len(page_state['cursors']) > 1:
+            # 削除などで現在のページが空になった場合は先頭ページに戻す
+            page_state['cursors'] = [None]
+            retweets, has_next = fetch_retweet_schedule_page(cast_id, statuses, date_from, date_to)
+        
+        first_index = (len(page_state['cursors']) - 1) * RETWEET_PAGE_SIZE + 1
+        st.write(f"📊 {total}件の予約があります（{first_index}〜{first_index + len(retweets) - 1}件目を表示）")
         
         for retweet in retweets:
             # ステータスに応じた表示色
             if retweet['status'] == 'scheduled':
                 status_color = "🔄"
                 status_text = "予約中"
+            elif retweet['status'] == 'running':
+                status_color = "⏳"
+                status_text = "実行中"
             elif retweet['status'] == 'completed':
                 status_color = "✅"
                 status_text = "完了"
@@ -1421,6 +1412,18 @@ def display_retweet_schedules(cast_id=None):
                                 st.rerun()
                             st.rerun()
         
+        # ページ送り
+        nav_col1, nav_col2 = st.columns(2)
+        with nav_col1:
+            if len(page_state['cursors']) > 1 and st.button("⬅️ 前のページ", key=f"{key_prefix}_prev"):
+                page_state['cursors'].pop()
+                st.rerun()
+        with nav_col2:
+            if has_next and st.button("次のページ ➡️", key=f"{key_prefix}_next"):
+                last = retweets[-1]
+                page_state['cursors'].append((last['scheduled_at'], last['id']))
+                st.rerun()
+        
     except Exception as e:
         st.error(f"❌ リツイート予約一覧取得エラー: {str(e)}")
 
@@ -1428,13 +1431,16 @@ def delete_retweet_schedule(retweet_id):
     """リツイート予約を削除"""
     try:
         execute_query("DELETE FROM retweet_schedules WHERE id = ?", (retweet_id,))
+        timer = get_retweet_timer()
+        if timer:
+            timer.cancel(retweet_id)
         return True
     except Exception as e:
         st.error(f"❌ 削除エラー: {str(e)}")
         return False
 
 def reschedule_retweet(retweet_id, new_datetime):
-    """失敗したリツイートを再スケジュール"""
+    """失敗したリツイートを再スケジュール（実行中・実行済みの予約は変更しない）"""
     try:
         # new_datetimeがnaiveの場合はJSTとして扱う
         if new_datetime.tzinfo is None:
@@ -1443,94 +1449,62 @@ def reschedule_retweet(retweet_id, new_datetime):
         # JSTで統一してデータベースに保存
         formatted_datetime = new_datetime.astimezone(JST).strftime('%Y-%m-%d %H:%M:%S')
         
-        execute_query("""
-            UPDATE retweet_schedules 
-            SET scheduled_at = ?, 
-                status = 'scheduled', 
-                error_message = NULL,
-                executed_at = NULL
-            WHERE id = ?
-        """, (formatted_datetime, retweet_id))
+        if not reschedule_failed_retweet(DB_FILE, retweet_id, formatted_datetime):
+            st.warning("⚠️ この予約は他の処理で実行中か、既に再スケジュール・実行済みです")
+            return False
+        timer = get_retweet_timer()
+        if timer:
+            timer.schedule(retweet_id, formatted_datetime)
         return True
     except Exception as e:
         st.error(f"❌ 再スケジュールエラー: {str(e)}")
         return False
 
 def execute_retweet_now(retweet):
-    """リツイート予約を今すぐ実行"""
+    """リツイート予約を今すぐ実行（実行前に予約を確保して二重実行を防ぐ）
+
+    スケジューラーと同じ処理で実行し、レート制限（429）の場合は失敗にせず再実行可能時刻に予約し直す
+    """
+    lease_owner = make_lease_owner("app")
+    claimed = claim_retweet(DB_FILE, retweet['id'], lease_owner)
+    if not claimed:
+        st.warning("⚠️ この予約は他の処理で実行中か、既に実行済みです")
+        return
+    
+    action = "quote_tweet" if (claimed.get('comment') or '').strip() else "retweet"
     try:
-        import requests
-        
-        # 実行タイプを決定
-        if retweet['comment'] and retweet['comment'].strip():
-            action = "quote_tweet"
-            payload = {
-                "action": action,
-                "account_id": get_account_id_for_cast_local(retweet['cast_name']),
-                "tweet_id": retweet['tweet_id'],
-                "comment": retweet['comment'].strip()
-            }
-        else:
-            action = "retweet"
-            payload = {
-                "action": action,
-                "account_id": get_account_id_for_cast_local(retweet['cast_name']),
-                "tweet_id": retweet['tweet_id']
-            }
-        
-        # Cloud Functions呼び出し
-        CLOUD_FUNCTION_URL = Config.get_cloud_functions_url()
-        response = requests.post(CLOUD_FUNCTION_URL, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('status') == 'success':
-                # 成功時の状態更新
-                executed_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                result_tweet_id = result.get('tweet_id', '')
-                
-                execute_query("""
-                    UPDATE retweet_schedules 
-                    SET status = 'completed', executed_at = ?, result_tweet_id = ?
-                    WHERE id = ?
-                """, (executed_at, result_tweet_id, retweet['id']))
-                
-                st.success(f"✅ {action}を実行しました！")
-                if result_tweet_id:
-                    st.info(f"🔗 新しいツイートID: {result_tweet_id}")
-            else:
-                error_msg = result.get('message', '不明なエラー')
-                execute_query("""
-                    UPDATE retweet_schedules 
-                    SET status = 'failed', error_message = ?
-                    WHERE id = ?
-                """, (error_msg, retweet['id']))
-                st.error(f"❌ 実行失敗: {error_msg}")
-        else:
-            error_msg = f"HTTP {response.status_code}: {response.text}"
-            execute_query("""
-                UPDATE retweet_schedules 
-                SET status = 'failed', error_message = ?
-                WHERE id = ?
-            """, (error_msg, retweet['id']))
-            st.error(f"❌ HTTP エラー: {error_msg}")
-            
+        success, detail = execute_retweet(claimed, Config.get_cloud_functions_url(), shared_rate_limits, observe_lag=False)
     except Exception as e:
-        error_msg = f"実行エラー: {str(e)}"
-        execute_query("""
-            UPDATE retweet_schedules 
-            SET status = 'failed', error_message = ?
-            WHERE id = ?
-        """, (error_msg, retweet['id']))
-        st.error(f"❌ {error_msg}")
+        success, detail = False, f"実行エラー: {str(e)}"
+    _, _, retries = settle_retweets(DB_FILE, lease_owner, [(claimed, success, detail, now_jst_str())], shared_rate_limits)
+    
+    if retries:
+        retry_at = retries[0][1]
+        timer = get_retweet_timer()
+        if timer:
+            timer.schedule(retweet['id'], retry_at)
+        st.warning(f"⏳ API使用制限中のため {retry_at} に再予約しました: {detail}")
+    elif success:
+        st.success(f"✅ {action}を実行しました！")
+        if detail:
+            st.info(f"🔗 新しいツイートID: {detail}")
+    else:
+        st.error(f"❌ 実行失敗: {detail}")
 
 def execute_retweet_via_gas_direct_now(retweet):
-    """GAS Direct API経由でリツイートを今すぐ実行"""
+    """GAS Direct API経由でリツイートを今すぐ実行（実行前に予約を確保して二重実行を防ぐ）"""
+    lease_owner = make_lease_owner("app")
+    if not claim_retweet(DB_FILE, retweet['id'], lease_owner):
+        st.warning("⚠️ この予約は他の処理で実行中か、既に実行済みです")
+        return
+    
     try:
         # キャスト名からキャストIDを取得して設定を読み込み
         cast_id = get_cast_id_by_name(retweet['cast_name'])
         if not cast_id:
-            st.error(f"❌ キャスト '{retweet['cast_name']}' が見つかりません")
+            error_msg = f"キャスト '{retweet['cast_name']}' が見つかりません"
+            finish_retweets(DB_FILE, lease_owner, [(retweet['id'], False, error_msg, None)])
+            st.error(f"❌ {error_msg}")
             return
         
         success, message = execute_retweet_via_gas_direct(
@@ -1542,36 +1516,31 @@ def execute_retweet_via_gas_direct_now(retweet):
         if success:
             # 成功時の状態更新
             executed_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            execute_query("""
-                UPDATE retweet_schedules 
-                SET status = 'completed', executed_at = ?
-                WHERE id = ?
-            """, (executed_at, retweet['id']))
+            finish_retweets(DB_FILE, lease_owner, [(retweet['id'], True, None, executed_at)])
             st.success(f"✅ GAS Direct経由で実行完了: {message}")
         else:
-            execute_query("""
-                UPDATE retweet_schedules 
-                SET status = 'failed', error_message = ?
-                WHERE id = ?
-            """, (message, retweet['id']))
+            finish_retweets(DB_FILE, lease_owner, [(retweet['id'], False, message, None)])
             st.error(f"❌ GAS Direct実行失敗: {message}")
             
     except Exception as e:
         error_msg = f"GAS Direct実行エラー: {str(e)}"
-        execute_query("""
-            UPDATE retweet_schedules 
-            SET status = 'failed', error_message = ?
-            WHERE id = ?
-        """, (error_msg, retweet['id']))
+        finish_retweets(DB_FILE, lease_owner, [(retweet['id'], False, error_msg, None)])
         st.error(f"❌ {error_msg}")
 
 def execute_retweet_via_sheets_now(retweet):
-    """Google Sheets経由でリツイートを今すぐ実行"""
+    """Google Sheets経由でリツイートを今すぐ実行（実行前に予約を確保して二重実行を防ぐ）"""
+    lease_owner = make_lease_owner("app")
+    if not claim_retweet(DB_FILE, retweet['id'], lease_owner):
+        st.warning("⚠️ この予約は他の処理で実行中か、既に実行済みです")
+        return
+    
     try:
         # 現在時刻でGoogle Sheetsに送信
         cast_id = get_cast_id_by_name(retweet['cast_name'])
         if not cast_id:
-            st.error(f"❌ キャスト '{retweet['cast_name']}' が見つかりません")
+            error_msg = f"キャスト '{retweet['cast_name']}' が見つかりません"
+            finish_retweets(DB_FILE, lease_owner, [(retweet['id'], False, error_msg, None)])
+            st.error(f"❌ {error_msg}")
             return
         
         current_time = datetime.datetime.now()
@@ -1585,27 +1554,15 @@ def execute_retweet_via_sheets_now(retweet):
         if success:
             # 成功時の状態更新
             executed_at = current_time.strftime('%Y-%m-%d %H:%M:%S')
-            execute_query("""
-                UPDATE retweet_schedules 
-                SET status = 'completed', executed_at = ?
-                WHERE id = ?
-            """, (executed_at, retweet['id']))
+            finish_retweets(DB_FILE, lease_owner, [(retweet['id'], True, None, executed_at)])
             st.success(f"✅ Google Sheets経由で送信完了: {message}")
         else:
-            execute_query("""
-                UPDATE retweet_schedules 
-                SET status = 'failed', error_message = ?
-                WHERE id = ?
-            """, (message, retweet['id']))
+            finish_retweets(DB_FILE, lease_owner, [(retweet['id'], False, message, None)])
             st.error(f"❌ Google Sheets送信失敗: {message}")
             
     except Exception as e:
         error_msg = f"Google Sheets実行エラー: {str(e)}"
-        execute_query("""
-            UPDATE retweet_schedules 
-            SET status = 'failed', error_message = ?
-            WHERE id = ?
-        """, (error_msg, retweet['id']))
+        finish_retweets(DB_FILE, lease_owner, [(retweet['id'], False, error_msg, None)])
         st.error(f"❌ {error_msg}")
 
 def get_cast_id_by_name(cast_name):
@@ -1622,58 +1579,6 @@ def get_cast_id_by_name(cast_name):
         print(f"キャストID取得エラー: {e}")
         return None
 
-def get_cast_name_by_id(cast_id):
-    """キャストIDから名前を取得"""
-    try:
-        result = execute_query("""
-            SELECT name FROM casts WHERE id = ?
-        """, (cast_id,))
-        
-        if result:
-            return result[0][0]
-        return f"Cast_{cast_id}"  # フォールバック
-    except Exception as e:
-        print(f"キャスト名取得エラー: {e}")
-        return f"Cast_{cast_id}"
-
-def get_account_id_for_cast_local(cast_name):
-    """キャスト名からX APIアカウントIDを取得（ローカル用）"""
-    try:
-        result = execute_query("""
-            SELECT cxc.twitter_username 
-            FROM cast_x_credentials cxc
-            JOIN casts c ON c.id = cxc.cast_id
-            WHERE c.name = ?
-        """, (cast_name,), fetch="one")
-        return result['twitter_username'] if result else None
-    except Exception as e:
-        st.error(f"❌ アカウントID取得エラー: {str(e)}")
-        return None
-
-def send_to_x_api(cast_name, post_content, scheduled_datetime=None, cast_id=None):
-    """Cloud Functions経由でX (Twitter) APIに投稿を送信する"""
-    try:
-        # Cloud Functions投稿クライアントを初期化
-        cloud_poster = CloudFunctionsPoster(Config.get_cloud_functions_url())
-        
-        # キャストIDに基づいてアカウントIDを決定
-        account_id = get_account_id_for_cast_local(cast_name)
-        if not account_id:
-            return False, f"❌ キャスト '{cast_name}' のX APIアカウント設定が見つかりません"
-        
-        # Cloud Functions経由で投稿
-        result = cloud_poster.post_tweet(account_id, post_content)
-        
-        if result.get("status") == "success":
-            tweet_id = result.get("tweet_id", "")
-            return True, f"✅ X (Twitter) に投稿しました！ Tweet ID: {tweet_id}"
-        else:
-            error_msg = result.get("message", "投稿に失敗しました")
-            return False, f"❌ X API投稿エラー: {error_msg}"
-            
-    except Exception as e:
-        return False, f"❌ Cloud Functions X API送信エラー: {str(e)}"
-
 def get_cast_x_credentials(cast_id):
     """キャストのX API認証情報を取得"""
     result = execute_query(
@@ -1721,40 +1626,12 @@ def delete_cast_x_credentials(cast_id):
     try:
         execute_query("UPDATE cast_x_credentials SET is_active = 0 WHERE cast_id = ?", (cast_id,))
         # キャッシュからも削除
-        if cast_id in x_poster.cast_clients:
-            del x_poster.cast_clients[cast_id]
+        x_poster.invalidate_cast_client(cast_id)
         return True
     except Exception as e:
         st.error(f"認証情報の削除中にエラーが発生しました: {e}")
         return False
 
-def get_cast_sheets_config(cast_id, action_type='post'):
-    """キャストのGoogle Sheets設定を取得（アクション別対応）"""
-    # 新しいテーブルから設定を取得（gas_web_app_url含む）
-    result = execute_query(
-        "SELECT id, cast_id, action_type, spreadsheet_id, sheet_name, gas_web_app_url, is_active, created_at, updated_at FROM cast_action_sheets WHERE cast_id = ? AND action_type = ? AND is_active = 1", 
-        (cast_id, action_type), 
-        fetch="one"
-    )
-    
-    if result:
-        return dict(result)
-    
-    # 新しいテーブルにない場合は、既存テーブルから取得（互換性）
-    if action_type == 'post':
-        result_old = execute_query(
-            "SELECT id, cast_id, spreadsheet_id, sheet_name, is_active, created_at, updated_at FROM cast_sheets_config WHERE cast_id = ? AND is_active = 1", 
-            (cast_id,), 
-            fetch="one"
-        )
-        if result_old:
-            config = dict(result_old)
-            config['action_type'] = 'post'  # アクションタイプを追加
-            config['gas_web_app_url'] = None  # 既存テーブルにはGAS URLはない
-            return config
-    
-    return None
-
 def save_cast_sheets_config(cast_id, spreadsheet_id, sheet_name=None):
     """キャストのGoogle Sheets設定を保存（シンプル版）"""
     try:
@@ -1777,6 +1654,7 @@ def save_cast_sheets_config(cast_id, spreadsheet_id, sheet_name=None):
                 VALUES (?, ?, ?, ?, ?)
             """, (cast_id, spreadsheet_id, sheet_name or 'Sheet1', current_time, current_time))
         
+        invalidate_cast_sheets_config(cast_id)
         return True
     except Exception as e:
         st.error(f"Google Sheets設定保存エラー: {str(e)}")
@@ -1804,6 +1682,7 @@ def save_cast_action_sheets_config(cast_id, action_type, spreadsheet_id, sheet_n
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (cast_id, action_type, spreadsheet_id, sheet_name or 'Sheet1', current_time, current_time))
         
+        invalidate_cast_sheets_config(cast_id)
         return True
     except Exception as e:
         st.error(f"アクション別Google Sheets設定保存エラー: {str(e)}")
@@ -1831,6 +1710,7 @@ def save_cast_action_sheets_config_with_gas_url(cast_id, action_type, spreadshee
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (cast_id, action_type, spreadsheet_id, sheet_name or 'Sheet1', gas_web_app_url, current_time, current_time))
         
+        invalidate_cast_sheets_config(cast_id)
         return True
     except Exception as e:
         st.error(f"アクション別Google Sheets設定（GAS URL含む）保存エラー: {str(e)}")
@@ -1844,33 +1724,12 @@ def delete_cast_sheets_config(cast_id):
             "UPDATE cast_sheets_config SET is_active = 0, updated_at = ? WHERE cast_id = ?",
             (current_time, cast_id)
         )
+        invalidate_cast_sheets_config(cast_id)
         return True
     except Exception as e:
         st.error(f"Google Sheets設定削除エラー: {str(e)}")
         return False
 
-def send_post_to_destination(cast_name, post_content, scheduled_datetime, destination, cast_id=None):
-    """投稿を指定した送信先に送信する統合関数（キャスト別設定対応）"""
-    if destination == "google_sheets":
-        return send_to_google_sheets(cast_name, post_content, scheduled_datetime, cast_id)
-    elif destination == "x_api":
-        return send_to_x_api(cast_name, post_content, scheduled_datetime, cast_id)
-    elif destination == "both":
-        # 両方に送信
-        sheets_success, sheets_message = send_to_google_sheets(cast_name, post_content, scheduled_datetime, cast_id)
-        x_success, x_message = send_to_x_api(cast_name, post_content, scheduled_datetime, cast_id)
-        
-        if sheets_success and x_success:
-            return True, "Google Sheets と X (Twitter) 両方に送信しました！"
-        elif sheets_success:
-            return True, f"Google Sheets に送信しました。X投稿エラー: {x_message}"
-        elif x_success:
-            return True, f"X (Twitter) に投稿しました。Sheets送信エラー: {sheets_message}"
-        else:
-            return False, f"両方の送信に失敗: Sheets({sheets_message}), X({x_message})"
-    else:
-        return False, "不明な送信先です"
-
 def add_column_to_casts_table(field_name):
     """castsテーブルに新しい列を追加"""
     try:
@@ -1933,10 +1792,165 @@ def clear_editing_post():
     if 'editing_post_id' in st.session_state:
         st.session_state.editing_post_id = None
 
+def load_app_settings():
+    """アプリ設定を全件取得（1回のクエリで読み込み、更新されるまでプロセス共通でキャッシュ）"""
+    def load():
+        rows = execute_query("SELECT key, value FROM app_settings", fetch="all")
+        return {row['key']: row['value'] for row in rows} if rows is not None else None
+    
+    settings = app_settings_cache.get_or_load(APP_SETTINGS_KEY, load)
+    if settings is None:
+        # 読み込みに失敗した場合はキャッシュせず次回再取得
+        app_settings_cache.invalidate(APP_SETTINGS_KEY)
+        return {}
+    return settings
+
 def get_app_setting(key, default_value=""):
     """アプリ設定を取得"""
-    result = execute_query("SELECT value FROM app_settings WHERE key = ?", (key,), fetch="one")
-    return result['value'] if result else default_value
+    return load_app_settings().get(key, default_value)
+
+def get_app_setting_int(key, default_value=0):
+    """アプリ設定を整数で取得（未設定・変換できない場合は既定値）"""
+    try:
+        return int(get_app_setting(key, default_value))
+    except (TypeError, ValueError):
+        return default_value
+
+def get_app_setting_float(key, default_value=0.0):
+    """アプリ設定を小数で取得（未設定・変換できない場合は既定値）"""
+    try:
+        return float(get_app_setting(key, default_value))
+    except (TypeError, ValueError):
+        return default_value
+
+def get_app_setting_bool(key, default_value=False):
+    """アプリ設定を真偽値で取得（true / 1 / yes / on を真とする）"""
+    value = get_app_setting(key, None)
+    if value is None:
+        return default_value
+    return str(value).strip().lower() in ('true', '1', 'yes', 'on')
+
+POST_PAGE_SIZE_OPTIONS = [20, 50, 100]
+
+# 投稿一覧タブごとの取得列・条件・並び順（キーセット方式のページ送りに使用）
+POST_LIST_QUERIES = {
+    'draft': {
+        'columns': "p.id, p.cast_id, p.content, p.theme, p.advice, p.free_advice, p.created_at, p.generated_at",
+        'condition': "p.status = 'draft'",
+        'order': "p.created_at",
+    },
+    'approved': {
+        'columns': "p.id, p.cast_id, p.content, p.evaluation, p.advice, p.free_advice, p.created_at, p.generated_at, "
+                   "p.posted_at, p.scheduled_at, p.sent_status",
+        'condition': "p.status = 'approved' AND (p.sent_status = 'not_sent' OR p.sent_status = 'scheduled' OR p.sent_status IS NULL)",
+        'order': "COALESCE(p.posted_at, '')",
+    },
+    'sent': {
+        'columns': "p.id, p.content, p.evaluation, p.created_at, p.generated_at, p.posted_at, p.sent_at, p.scheduled_at, "
+                   "sh.destination, sh.sent_at as send_timestamp, sh.scheduled_datetime",
+        'joins': "LEFT JOIN send_history sh ON sh.id = (SELECT MAX(id) FROM send_history WHERE post_id = p.id AND status = 'completed')",
+        'condition': "p.sent_status = 'sent'",
+        'order': "COALESCE(p.sent_at, '')",
+    },
+    'rejected': {
+        'columns': "p.id, p.content, p.evaluation, p.advice, p.free_advice, p.created_at, p.generated_at",
+        'condition': "p.status = 'rejected'",
+        'order': "p.created_at",
+    },
+}
+
+def count_post_list(cast_id, list_type):
+    """投稿一覧タブの件数"""
+    spec = POST_LIST_QUERIES[list_type]
+    row = execute_query(f"SELECT COUNT(*) as count FROM posts p WHERE p.cast_id = ? AND {spec['condition']}", (cast_id,), fetch="one")
+    return row['count'] if row else 0
+
+def fetch_post_page(cast_id, list_type, cursor=None, limit=POST_PAGE_SIZE_OPTIONS[0]):
+    """投稿一覧タブの1ページ分を取得（並び順の新しい順、キーセット方式）
+
+    Args:
+        cursor (tuple): 前ページ最後の投稿の (sort_key, id)。None の場合は先頭ページ
+
+    Returns:
+        tuple: (投稿のリスト, 次のページがあるか)
+    """
+    spec = POST_LIST_QUERIES[list_type]
+    where = f"p.cast_id = ? AND {spec['condition']}"
+    params = [cast_id]
+    if cursor:
+        where += f" AND ({spec['order']} < ? OR ({spec['order']} = ? AND p.id < ?))"
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    rows = execute_query(f"""
+        SELECT {spec['columns']}, {spec['order']} as sort_key
+        FROM posts p
+        {spec.get('joins', '')}
+        WHERE {where}
+        ORDER BY {spec['order']} DESC, p.id DESC
+        LIMIT ?
+    """, tuple(params) + (limit + 1,), fetch="all") or []
+    return rows[:limit], len(rows) > limit
+
+def fetch_post_list_rows(cast_id, list_type, post_ids=None):
+    """投稿一覧タブの条件に合う投稿をページ分割せずに取得（一括操作用。post_ids を指定した場合はその投稿のみ）"""
+    spec = POST_LIST_QUERIES[list_type]
+    where = f"p.cast_id = ? AND {spec['condition']}"
+    params = [cast_id]
+    if post_ids is not None:
+        if not post_ids:
+            return []
+        where += f" AND p.id IN ({','.join('?' * len(post_ids))})"
+        params.extend(post_ids)
+    return execute_query(f"""
+        SELECT {spec['columns']}
+        FROM posts p
+        {spec.get('joins', '')}
+        WHERE {where}
+        ORDER BY {spec['order']} DESC, p.id DESC
+    """, tuple(params), fetch="all") or []
+
+def get_post_list_page(cast_id, list_type):
+    """投稿一覧タブの現在ページを取得（件数が多い場合は表示件数の選択を表示）
+
+    Returns:
+        tuple: (投稿のリスト, 総件数, ページ状態)
+    """
+    state_key = f"post_list_page_{list_type}"
+    page_state = st.session_state.setdefault(state_key, {'cast_id': cast_id, 'page_size': POST_PAGE_SIZE_OPTIONS[0], 'cursors': [None]})
+    total = count_post_list(cast_id, list_type)
+    page_size = POST_PAGE_SIZE_OPTIONS[0]
+    if total > POST_PAGE_SIZE_OPTIONS[0]:
+        page_size = st.columns([1, 5])[0].selectbox("表示件数", POST_PAGE_SIZE_OPTIONS, key=f"{state_key}_size")
+    
+    # キャストや表示件数が変わったら先頭ページに戻す
+    if page_state['cast_id'] != cast_id or page_state['page_size'] != page_size:
+        page_state.update({'cast_id': cast_id, 'page_size': page_size, 'cursors': [None]})
+    
+    posts, has_next = fetch_post_page(cast_id, list_type, page_state['cursors'][-1], page_size)
+    if not posts and len(page_state['cursors']) > 1:
+        # 承認・削除などで現在のページが空になった場合は先頭ページに戻す
+        page_state['cursors'] = [None]
+        posts, has_next = fetch_post_page(cast_id, list_type, None, page_size)
+    page_state['has_next'] = has_next
+    page_state['last'] = (posts[-1]['sort_key'], posts[-1]['id']) if posts else None
+    return posts, total, page_state
+
+def show_post_list_pager(list_type, page_state, shown_count):
+    """投稿一覧タブのページ送り（1ページに収まる場合は表示しない）"""
+    page_index = len(page_state['cursors']) - 1
+    if page_index == 0 and not page_state['has_next']:
+        return
+    first_index = page_index * page_state['page_size'] + 1
+    col_prev, col_range, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if page_index > 0 and st.button("⬅️ 前のページ", key=f"post_list_page_{list_type}_prev", use_container_width=True):
+            page_state['cursors'].pop()
+            st.rerun()
+    with col_range:
+        st.caption(f"{first_index}〜{first_index + shown_count - 1}件目を表示")
+    with col_next:
+        if page_state['has_next'] and st.button("次のページ ➡️", key=f"post_list_page_{list_type}_next", use_container_width=True):
+            page_state['cursors'].append(page_state['last'])
+            st.rerun()
 
 def update_app_setting(key, value, description="", category="general"):
     """アプリ設定を更新（存在しない場合は作成）"""
@@ -1945,27 +1959,36 @@ def update_app_setting(key, value, description="", category="general"):
         execute_query("UPDATE app_settings SET value = ? WHERE key = ?", (value, key))
     else:
         execute_query("INSERT INTO app_settings (key, value, description, category) VALUES (?, ?, ?, ?)", (key, value, description, category))
+    app_settings_cache.invalidate(APP_SETTINGS_KEY)
 
 def main():
     st.set_page_config(layout="wide")
+    perf.begin_rerun()
+    st.sidebar.title("AIcast room")
+    profile_panel = st.sidebar.empty()  # 処理時間の内訳（再実行の最後に表示）
+    # st.stop() / st.rerun() やエラーで途中終了した再実行も内訳を表示する
+    try:
+        render_page()
+    finally:
+        show_rerun_profile(profile_panel)
+
+def render_page():
+    """ページ本体（初期化・サイドバーのメニュー・選択されたページ）"""
     load_css("style.css")
     init_db()
     initialize_default_settings()  # デフォルト設定を初期化
+    start_outbox_dispatcher(DB_FILE, send_post_to_destination)  # バックグラウンド送信
+    if Config.IN_APP_RETWEET_TIMER:
+        start_retweet_timer(DB_FILE)  # リツイート予約を実行時刻に実行
 
     try:
-        import vertexai
+        # vertexai.init はプロセス共通（初期化済みの場合は何もしない）
+        use_cloud_secrets = Config.is_production_environment() and "gcp_service_account" in st.secrets
+        init_vertex_ai(use_cloud_secrets)
         if 'auth_done' not in st.session_state:
-            # 🌐 Streamlit Cloud production environment support
-            if Config.is_production_environment() and "gcp_service_account" in st.secrets:
-                # Use Streamlit Cloud secrets for GCP authentication
-                from google.oauth2 import service_account
-                credentials_info = dict(st.secrets["gcp_service_account"])
-                credentials = service_account.Credentials.from_service_account_info(credentials_info)
-                vertexai.init(project=project_id, location=location, credentials=credentials)
+            if use_cloud_secrets:
                 st.sidebar.success("🌐 Streamlit Cloud認証完了")
             else:
-                # Local development or default authentication
-                vertexai.init(project=project_id, location=location)
                 st.sidebar.success("✅ Googleサービス認証完了")
             st.session_state.auth_done = True
     except Exception as e:
@@ -2000,35 +2023,17 @@ def main():
         
         st.stop()
 
-    if 'gemini_model' not in st.session_state:
+    # モデルはプロセス共通のレジストリから取得（モデル切り替え時も再初期化しない）
+    selected_model = (st.session_state.get('selected_model_name') or '').strip() or 'gemini-2.5-flash'
+    if 'gemini_model' not in st.session_state or st.session_state.get('gemini_model_name') != selected_model:
+        st.session_state.gemini_model_name = selected_model
         try:
-            # APIインポートを動的に決定
-            try:
-                from vertexai.generative_models import GenerativeModel
-                api_version = "stable"
-            except ImportError:
-                from vertexai.preview.generative_models import GenerativeModel
-                api_version = "preview"
-            
-            # Gemini 2.0 Flash 専用設定（フォールバック制御）
-            force_mode = st.session_state.get('force_gemini_2_flash', True)
-            
-            # シンプルモデル選択（フォールバックなし）
-            selected_model = st.session_state.get('selected_model_name', 'gemini-2.5-flash')
-            
-            if not selected_model or selected_model.strip() == "":
-                selected_model = 'gemini-2.5-flash'  # デフォルト
-            
             try:
-                st.session_state.gemini_model = GenerativeModel(selected_model)
-                st.sidebar.success(f"🤖 AIモデル: {selected_model} ({api_version})")
-                model_initialized = True
+                st.session_state.gemini_model = gemini_models.get_model(selected_model)
+                st.sidebar.success(f"🤖 AIモデル: {selected_model} ({gemini_models.api_version})")
             except Exception as model_error:
                 st.sidebar.error(f"❌ モデル読み込み失敗: {selected_model}")
                 st.sidebar.warning(f"エラー: {str(model_error)[:80]}...")
-                model_initialized = False
-            
-            if not model_initialized:
                 raise Exception(f"指定されたモデル '{selected_model}' の読み込みに失敗しました。サイドバーで別のモデルを選択してください。エラー: {model_error}")
                 
         except Exception as e:
@@ -2053,8 +2058,6 @@ def main():
                 
             st.session_state.gemini_model = None
 
-    st.sidebar.title("AIcast room")
-    
     # AIモデル設定（シンプル入力方式）
     with st.sidebar.expander("🤖 AIモデル設定", expanded=False):
         # プリセットモデル選択
@@ -2106,6 +2109,7 @@ def main():
             
             # モデル強制更新ボタン
             if st.button("🔄 モデルを再読み込み", use_container_width=True):
+                gemini_models.evict(selected_model)
                 if 'gemini_model' in st.session_state:
                     del st.session_state.gemini_model
                 st.rerun()
@@ -2134,6 +2138,7 @@ def main():
         pass
     else:
         page = selected_page
+    perf.set_page(page)
     if page == "📊 ダッシュボード":
         st.title("📊 AIcast Room ダッシュボード")
         
@@ -2158,7 +2163,7 @@ def main():
         st.markdown("")  # 軽い間隔
         
         # キャスト別統計の取得
-        casts = execute_query("SELECT id, name, nickname FROM casts ORDER BY name", fetch="all")
+        casts = cached_query("SELECT id, name, nickname FROM casts ORDER BY name", ('casts',))
         
         if not casts:
             st.warning("キャスト未登録です。「キャスト管理」で作成してください。")
@@ -2241,7 +2246,7 @@ def main():
         if st.session_state.get('dashboard_redirect'):
             del st.session_state.dashboard_redirect
         
-        casts = execute_query("SELECT id, name, nickname FROM casts ORDER BY name", fetch="all")
+        casts = cached_query("SELECT id, name, nickname FROM casts ORDER BY name", ('casts',))
         if not casts:
             st.warning("キャスト未登録です。「キャスト管理」で作成してください。"); st.stop()
 
@@ -2282,7 +2287,7 @@ def main():
             eval_options = ['未評価', '◎', '◯', '△', '✕']; current_eval = post['evaluation'] if post['evaluation'] in eval_options else '未評価'
             st.selectbox("評価", eval_options, index=eval_options.index(current_eval), key=f"eval_{post_id}")
 
-            advice_master_rows = execute_query("SELECT content FROM advice_master ORDER BY id", fetch="all")
+            advice_master_rows = cached_query("SELECT content FROM advice_master ORDER BY id", ('advice_master',))
             advice_options = [row['content'] for row in advice_master_rows] if advice_master_rows else []
             current_advice_list = post['advice'].split(',') if post['advice'] else []
             valid_current_advice = [adv for adv in current_advice_list if adv in advice_options]
@@ -2317,7 +2322,7 @@ def main():
                             history_ts = datetime.datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
                             persona_sheet = format_persona(selected_cast_id, selected_cast_details)
                             regeneration_prompt = f"""# ペルソナ\n{persona_sheet}\n\n# シチュエーション\n{post['theme']}\n\n# 以前の投稿（これは失敗作です）\n{post['content']}\n\n# プロデューサーからの改善アドバイス\n「{final_advice_str}」\n\n# 指示\n以前の投稿を改善アドバイスを元に書き直してください。\n\n# ルール\n- **{regen_char_limit}文字以内**で生成。"""
-                            response = safe_generate_content(st.session_state.gemini_model, regeneration_prompt)
+                            response = safe_generate_content(st.session_state.gemini_model, regeneration_prompt, cast_id=selected_cast_id)
                             # 履歴に保存：前の投稿内容とアドバイス、そして新しい投稿内容
                             execute_query("INSERT INTO tuning_history (post_id, timestamp, previous_content, advice_used) VALUES (?, ?, ?, ?)", 
                                       (post_id, history_ts, f"<span style='color: #888888'>前回の投稿:</span>\n<span style='color: #888888'>{post['content']}</span>\n\n**新しい投稿:**\n{clean_generated_content(response.text)}", final_advice_str))
@@ -2417,7 +2422,7 @@ def main():
                 allowed_categories_str = selected_cast_details.get('allowed_categories', '')
                 allowed_categories = allowed_categories_str.split(',') if allowed_categories_str else []
                 # 存在しないカテゴリを除外
-                all_category_rows = execute_query("SELECT name FROM situation_categories", fetch="all")
+                all_category_rows = cached_query("SELECT name FROM situation_categories", ('situation_categories',))
                 existing_category_names = [row['name'] for row in all_category_rows] if all_category_rows else []
                 valid_allowed_categories = [cat for cat in allowed_categories if cat in existing_category_names]
                 
@@ -2429,11 +2434,11 @@ def main():
                 else:
                     placeholders = ','.join('?' for _ in valid_allowed_categories)
                     query = f"SELECT s.content, s.time_slot FROM situations s JOIN situation_categories sc ON s.category_id = sc.id WHERE sc.name IN ({placeholders})"
-                    situations_rows = execute_query(query, valid_allowed_categories, fetch="all")
+                    situations_rows = cached_query(query, ('situations', 'situation_categories'), tuple(valid_allowed_categories))
                     col1, col2 = st.columns(2)
-                    default_post_count = int(get_app_setting("default_post_count", "5"))
+                    default_post_count = get_app_setting_int("default_post_count", 5)
                     num_posts = col1.number_input("生成する数", min_value=1, max_value=50, value=default_post_count, key="auto_post_num")
-                    default_char_limit = int(get_app_setting("default_char_limit", "140"))
+                    default_char_limit = get_app_setting_int("default_char_limit", 140)
                     char_limit = col2.number_input("文字数（以内）", min_value=20, max_value=300, value=default_char_limit, key="auto_char_limit")
 
                     if st.button("自動生成開始", type="primary", key="auto_generate"):
@@ -2446,6 +2451,7 @@ def main():
                                     successful_posts = 0
                                     error_occurred = False
                                     error_message = None
+                                    budget_exceeded = False
                                     
                                     for i in range(num_posts):
                                         selected_situation = random.choice(situations_rows)
@@ -2457,7 +2463,7 @@ def main():
                                         
                                         for retry in range(max_retries):
                                             try:
-                                                response = safe_generate_content(st.session_state.gemini_model, prompt_template)
+                                                response = safe_generate_content(st.session_state.gemini_model, prompt_template, cast_id=selected_cast_id, batch=True)
                                                 generated_text = clean_generated_content(response.text)
                                                 time_slot_map = {"朝": (7, 11), "昼": (12, 17), "夜": (18, 23)}
                                                 hour_range = time_slot_map.get(selected_situation['time_slot'], (0, 23))
@@ -2468,6 +2474,10 @@ def main():
                                                 successful_posts += 1
                                                 break  # 成功したらリトライループを抜ける
                                                 
+                                            except GenerationBudgetExceeded as e:
+                                                error_occurred = budget_exceeded = True
+                                                error_message = str(e)
+                                                break
                                             except Exception as e:
                                                 error_message = str(e)
                                                 
@@ -2492,8 +2502,10 @@ def main():
                                         time.sleep(2)
                                 # 結果に応じてメッセージを表示
                                 if error_occurred:
+                                    if budget_exceeded:
+                                        top_status_placeholder.error(f"💰 {error_message}")
                                     # API制限エラーの特別処理
-                                    if "429" in error_message or "Resource exhausted" in error_message:
+                                    elif "429" in error_message or "Resource exhausted" in error_message:
                                         top_status_placeholder.error("⏱️ API制限に達しました")
                                         with st.expander("🔍 API制限エラーの解決方法", expanded=True):
                                             st.warning("**429 Resource Exhausted エラー**")
@@ -2538,7 +2550,7 @@ def main():
                     custom_num_posts = st.number_input("生成する数", min_value=1, max_value=20, value=1, key="custom_post_num")
                 
                 with col2:
-                    custom_char_limit = st.number_input("文字数（以内）", min_value=20, max_value=300, value=int(get_app_setting("default_char_limit", "140")), key="custom_char_limit")
+                    custom_char_limit = st.number_input("文字数（以内）", min_value=20, max_value=300, value=get_app_setting_int("default_char_limit", 140), key="custom_char_limit")
                 
                 with col3:
                     time_slot = st.selectbox(
@@ -2570,6 +2582,7 @@ def main():
                                 successful_posts = 0
                                 error_occurred = False
                                 error_message = None
+                                budget_exceeded = False
                                 
                                 # 進捗表示
                                 progress_bar = st.progress(0)
@@ -2601,7 +2614,7 @@ def main():
                                         
                                         for retry in range(max_retries):
                                             try:
-                                                response = safe_generate_content(st.session_state.gemini_model, custom_prompt)
+                                                response = safe_generate_content(st.session_state.gemini_model, custom_prompt, cast_id=selected_cast_id, batch=custom_num_posts > 1)
                                                 generated_text = clean_generated_content(response.text)
                                                 
                                                 # 投稿予定時刻を設定（複数生成時は少しずつずらす）
@@ -2625,6 +2638,10 @@ def main():
                                                 successful_posts += 1
                                                 break  # 成功したらリトライループを抜ける
                                                 
+                                            except GenerationBudgetExceeded as e:
+                                                error_occurred = budget_exceeded = True
+                                                error_message = str(e)
+                                                break
                                             except Exception as e:
                                                 retry_error = str(e)
                                                 if "429" in retry_error or "Resource exhausted" in retry_error:
@@ -2659,7 +2676,9 @@ def main():
                                 
                                 # 結果表示
                                 if error_occurred:
-                                    if "429" in error_message or "Resource exhausted" in error_message:
+                                    if budget_exceeded:
+                                        top_status_placeholder.error(f"💰 {error_message}")
+                                    elif "429" in error_message or "Resource exhausted" in error_message:
                                         top_status_placeholder.error("⏱️ API制限に達しました")
                                         st.info("しばらく待ってから再試行してください。")
                                     else:
@@ -2685,10 +2704,10 @@ def main():
             tab1, tab2, tab3, tab4, tab_schedule, tab_retweet = st.tabs(["投稿案 (Drafts)", "承認済み (Approved)", "送信済み (Sent)", "却下済み (Rejected)", "📅 スケジュール投稿", "🔄 リツイート予約"])
 
             with tab1:
-                # 最新データを確実に取得するため、キャッシュをクリア
-                draft_posts = execute_query("SELECT * FROM posts WHERE cast_id = ? AND status = 'draft' ORDER BY created_at DESC", (selected_cast_id,), fetch="all")
+                # 現在のページ分だけ取得
+                draft_posts, draft_total, draft_page = get_post_list_page(selected_cast_id, 'draft')
                 if draft_posts:
-                    st.info(f"{len(draft_posts)}件の投稿案があります。")
+                    st.info(f"{draft_total}件の投稿案があります。")
                     
                     # 一括操作パネル
                     with st.expander("📋 一括操作", expanded=False):
@@ -2745,7 +2764,7 @@ def main():
                         st.subheader("🎯 選択した投稿をAIで改善")
                         
                         # アドバイス選択
-                        advice_options = execute_query("SELECT content FROM advice_master ORDER BY content", fetch="all")
+                        advice_options = cached_query("SELECT content FROM advice_master ORDER BY content", ('advice_master',))
                         advice_list = [advice['content'] for advice in advice_options]
                         
                         if len(advice_list) == 0:
@@ -2833,7 +2852,7 @@ def main():
 上記の改善指示に従って投稿を改善してください。キャラクターの個性を保ちながら、指示された点を改善した新しい投稿を生成してください。元の投稿のテーマとメッセージは維持してください。"""
 
                                             # AI で改善
-                                            response = safe_generate_content(st.session_state.gemini_model, improvement_prompt)
+                                            response = safe_generate_content(st.session_state.gemini_model, improvement_prompt, cast_id=original_post['cast_id'], batch=True)
                                             improved_content = clean_generated_content(response.text)
                                             
                                             # チューニング履歴に記録
@@ -2850,6 +2869,9 @@ def main():
                                             progress_bar.progress((i + 1) / total_posts)
                                             time.sleep(1)  # API制限対策
                                             
+                                        except GenerationBudgetExceeded as e:
+                                            st.error(str(e))
+                                            break
                                         except Exception as e:
                                             st.error(f"投稿ID {post_id} の改善中にエラーが発生しました: {str(e)}")
                                             continue
@@ -2878,7 +2900,7 @@ def main():
                     
                     st.markdown("---")
                     
-                    # 全選択/全解除ボタン
+                    # 全選択/全解除ボタン（表示中のページが対象）
                     col_select1, col_select2, col_select3 = st.columns([1,1,4])
                     with col_select1:
                         if st.button("🔲 全選択", use_container_width=True):
@@ -2943,6 +2965,7 @@ def main():
                                 st.button("却下", key=f"quick_reject_{post_id}", on_click=quick_reject, args=(post_id,), use_container_width=True)
                             
                             st.markdown("---")
+                    show_post_list_pager('draft', draft_page, len(draft_posts))
                 else: 
                     st.info("チューニング対象の投稿案はありません。")
 
@@ -2978,9 +3001,34 @@ def main():
 
 **注意**: 初回送信時にブラウザでGoogle認証が必要です。認証後はトークンが自動保存されます。""")
                 
-                approved_posts = execute_query("SELECT * FROM posts WHERE cast_id = ? AND status = 'approved' AND (sent_status = 'not_sent' OR sent_status = 'scheduled' OR sent_status IS NULL) ORDER BY posted_at DESC", (selected_cast_id,), fetch="all")
+                approved_posts, approved_total, approved_page = get_post_list_page(selected_cast_id, 'approved')
+
+                # 送信中のまま期限切れになった投稿（送信中にプロセスが停止したもの）はオペレーターの操作で未送信に戻す
+                expired_sending_count = count_expired_post_leases(DB_FILE, selected_cast_id)
+                if expired_sending_count:
+                    st.warning(f"⚠️ 送信中のまま停止した投稿が{expired_sending_count}件あります（送信中にアプリが停止した可能性があります）。")
+                    if st.button("↩️ 未送信に戻す", key="release_expired_post_leases"):
+                        release_expired_post_leases(DB_FILE, selected_cast_id)
+                        st.rerun()
+
+                # 送信キュー（アウトボックス）の状況
+                send_outbox = SendOutbox(DB_FILE)
+                outbox_counts = send_outbox.get_status_counts(selected_cast_id)
+                outbox_in_flight = outbox_counts.get('pending', 0) + outbox_counts.get('sending', 0)
+                if outbox_in_flight:
+                    st.info(f"🕒 送信キュー: {outbox_in_flight}件を送信中です（自動再送あり）。完了した投稿は「送信済み」タブに移動します。")
+                if outbox_counts.get('dead', 0):
+                    with st.expander(f"⚠️ 送信に失敗した投稿 ({outbox_counts['dead']}件)", expanded=False):
+                        dead_letters = send_outbox.get_dead_letters(selected_cast_id)
+                        for dead in dead_letters:
+                            st.caption(f"投稿ID {dead['post_id']} | 送信先: {dead['destination']} | 試行: {dead['attempts']}回 | {dead['updated_at']}")
+                            st.error(dead['last_error'] or "不明なエラー")
+                        if st.button("🔁 失敗した投稿を再送信", key="requeue_dead_letters"):
+                            send_outbox.requeue_dead([dead['id'] for dead in dead_letters])
+                            start_outbox_dispatcher(DB_FILE, send_post_to_destination).wake()
+                            st.rerun()
                 if approved_posts:
-                    st.info(f"{len(approved_posts)}件の承認済み投稿があります。")
+                    st.info(f"{approved_total}件の承認済み投稿があります。")
                     
                     # 一括送信パネル
                     with st.expander("📤 一括送信", expanded=False):
@@ -3001,60 +3049,116 @@ def main():
                         
                         bulk_destination_value = next((opt[1] for opt in bulk_destination_options if opt[0] == bulk_destination), "google_sheets")
                         
-                        st.info(f"選択した投稿を元の投稿予定時刻で{bulk_destination}に一括送信します。")
+                        # チェックボックスの選択は表示中のページのみ保持される（他のページの選択はページ送りで消える）
+                        bulk_all_pages = False
+                        if approved_total > len(approved_posts):
+                            bulk_all_pages = st.checkbox(
+                                f"📚 全ページの承認済み投稿（{approved_total}件）を送信対象にする",
+                                value=False,
+                                key="bulk_all_pages",
+                                help="オフの場合は、表示中のページで選択した投稿のみを送信します。"
+                            )
+                        if bulk_all_pages:
+                            st.info(f"承認済みの{approved_total}件すべてを元の投稿予定時刻で{bulk_destination}に一括送信します。")
+                        else:
+                            st.info(f"表示中のページで選択した投稿を元の投稿予定時刻で{bulk_destination}に一括送信します。")
+
+                        use_outbox = st.checkbox(
+                            "🕒 バックグラウンド送信（ブラウザを閉じても送信を継続）",
+                            value=True,
+                            key="bulk_use_outbox",
+                            help="送信キューに登録し、バックグラウンドで自動再送付きで送信します（少なくとも1回の送信。送信直後にアプリが停止した場合は再送により重複することがあります）。オフにするとこの画面で送信完了まで待機します。"
+                        )
                         
                         # 一括送信実行
                         if st.button("📤 選択した投稿を一括送信", type="primary", use_container_width=True):
                             selected_posts = [post_id for post_id, selected in st.session_state.items() 
                                             if post_id.startswith('select_approved_') and selected]
+                            if bulk_all_pages:
+                                selected_post_data = fetch_post_list_rows(selected_cast_id, 'approved')
+                            else:
+                                selected_post_data = fetch_post_list_rows(
+                                    selected_cast_id, 'approved',
+                                    [int(post_key.replace('select_approved_', '')) for post_key in selected_posts]
+                                )
                             
-                            if selected_posts:
-                                progress_bar = st.progress(0)
-                                status_text = st.empty()
-                                sent_count = 0
-                                total_posts = len(selected_posts)
-                                
+                            if selected_post_data:
                                 # キャスト名とIDを取得
                                 current_cast = next((c for c in casts if c['name'] == selected_cast_name), None)
                                 cast_name_only = current_cast['name'] if current_cast else selected_cast_name
                                 cast_id = current_cast['id'] if current_cast else None
-                                
-                                for i, post_key in enumerate(selected_posts):
-                                    try:
-                                        post_id = post_key.replace('select_approved_', '')
-                                        status_text.text(f"投稿ID {post_id} を送信中... ({i+1}/{total_posts})")
-                                        
-                                        # 投稿データを取得
-                                        post_data = next((p for p in approved_posts if str(p['id']) == post_id), None)
-                                        if not post_data:
-                                            continue
-                                        
-                                        # 元の投稿予定時刻を使用
-                                        original_datetime = datetime.datetime.strptime(post_data['created_at'], '%Y-%m-%d %H:%M:%S')
-                                        
-                                        # 指定された送信先に送信（キャストIDを渡す）
-                                        success, message = send_post_to_destination(cast_name_only, post_data['content'], original_datetime, bulk_destination_value, cast_id)
-                                        
-                                        if success:
-                                            # 送信成功時のデータベース更新
-                                            sent_at = datetime.datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
-                                            execute_query("UPDATE posts SET sent_status = 'sent', sent_at = ? WHERE id = ?", (sent_at, post_id))
-                                            execute_query("INSERT INTO send_history (post_id, destination, sent_at, scheduled_datetime, status) VALUES (?, ?, ?, ?, ?)", 
-                                                        (post_id, bulk_destination_value, sent_at, original_datetime.strftime('%Y-%m-%d %H:%M:%S'), 'completed'))
-                                            sent_count += 1
-                                        else:
-                                            # 送信失敗時のログ記録
-                                            failed_at = datetime.datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
-                                            execute_query("INSERT INTO send_history (post_id, destination, sent_at, scheduled_datetime, status, error_message) VALUES (?, ?, ?, ?, ?, ?)", 
-                                                        (post_id, bulk_destination_value, failed_at, original_datetime.strftime('%Y-%m-%d %H:%M:%S'), 'failed', message))
-                                        
-                                        progress_bar.progress((i + 1) / total_posts)
-                                        time.sleep(0.5)  # 短い間隔で高速処理
-                                        
-                                    except Exception as e:
-                                        st.error(f"投稿ID {post_id} の送信中にエラーが発生しました: {str(e)}")
-                                        continue
-                                
+
+                                # 送信ジョブを作成（元の投稿予定時刻を使用）
+                                send_jobs = []
+                                for post_data in selected_post_data:
+                                    send_jobs.append({
+                                        'post_id': post_data['id'],
+                                        'cast_name': cast_name_only,
+                                        'content': post_data['content'],
+                                        'scheduled_datetime': datetime.datetime.strptime(post_data['created_at'], '%Y-%m-%d %H:%M:%S'),
+                                        'destination': bulk_destination_value,
+                                        'cast_id': cast_id,
+                                    })
+
+                                # Google Sheets の認証は並列送信の前にこのスレッドで1回だけ解決する
+                                sheets_creds = None
+                                if bulk_destination_value in ("google_sheets", "both"):
+                                    sheets_creds, auth_message = setup_google_sheets_oauth_simple()
+                                    if not sheets_creds:
+                                        st.error(f"❌ {auth_message}")
+                                        st.stop()
+
+                                if use_outbox:
+                                    # 投稿状態の変更と送信キュー登録を同一トランザクションで実行
+                                    queued_count = SendOutbox(DB_FILE).enqueue_posts(send_jobs)
+                                    start_outbox_dispatcher(DB_FILE, send_post_to_destination).wake()
+                                    for post_key in selected_posts:
+                                        st.session_state[post_key] = False
+                                    st.session_state.page_status_message = ("success", f"🕒 {queued_count}件の投稿を送信キューに登録しました。バックグラウンドで{bulk_destination}に送信します。")
+                                    st.rerun()
+
+                                # 送信中として確保できた投稿だけを送信（他の操作で送信中・送信済みのものは除外）
+                                claimed_post_ids = claim_posts(DB_FILE, [job['post_id'] for job in send_jobs])
+                                if len(claimed_post_ids) < len(send_jobs):
+                                    st.warning(f"⚠️ {len(send_jobs) - len(claimed_post_ids)}件の投稿は他の操作で送信中か、既に送信済みのためスキップしました")
+                                send_jobs = [job for job in send_jobs if job['post_id'] in claimed_post_ids]
+                                previous_sent_status = {p['id']: p['sent_status'] or 'not_sent' for p in selected_post_data}
+
+                                progress_bar = st.progress(0)
+                                status_text = st.empty()
+
+                                in_flight_post_ids = {job['post_id'] for job in send_jobs}
+
+                                def update_bulk_progress(done, total, result):
+                                    # 送信が続いている間は残りの投稿のリースを延長し、他の操作から再取得されないようにする
+                                    in_flight_post_ids.discard(result['post_id'])
+                                    renew_post_leases(DB_FILE, list(in_flight_post_ids))
+                                    progress_bar.progress(done / total)
+                                    mark = "✅" if result['success'] else "❌"
+                                    status_text.text(f"{mark} 投稿ID {result['post_id']} 送信完了 ({done}/{total})")
+
+                                # 送信先ごとの同時実行数制限付きで並列送信
+                                bulk_send_func = functools.partial(send_post_to_destination, sheets_creds=sheets_creds)
+                                send_results = BulkSendEngine(bulk_send_func).run(send_jobs, on_progress=update_bulk_progress)
+
+                                # DB更新は最後に1トランザクションでまとめて反映
+                                finished_at = datetime.datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
+                                db_statements = []
+                                for result in send_results:
+                                    scheduled_str = result['scheduled_datetime'].strftime('%Y-%m-%d %H:%M:%S')
+                                    if result['success']:
+                                        db_statements.append(("UPDATE posts SET sent_status = 'sent', sent_at = ?, lease_until = NULL WHERE id = ?", (finished_at, result['post_id'])))
+                                        db_statements.append(("INSERT INTO send_history (post_id, destination, sent_at, scheduled_datetime, status) VALUES (?, ?, ?, ?, ?)",
+                                                              (result['post_id'], bulk_destination_value, finished_at, scheduled_str, 'completed')))
+                                    else:
+                                        db_statements.append(("UPDATE posts SET sent_status = ?, lease_until = NULL WHERE id = ? AND sent_status = 'sending'",
+                                                              (previous_sent_status.get(result['post_id'], 'not_sent'), result['post_id'])))
+                                        db_statements.append(("INSERT INTO send_history (post_id, destination, sent_at, scheduled_datetime, status, error_message) VALUES (?, ?, ?, ?, ?, ?)",
+                                                              (result['post_id'], bulk_destination_value, finished_at, scheduled_str, 'failed', result['message'])))
+                                        st.error(f"投稿ID {result['post_id']} の送信に失敗しました: {result['message']}")
+                                execute_many(db_statements)
+                                sent_count = sum(1 for result in send_results if result['success'])
+
                                 progress_bar.empty()
                                 status_text.empty()
                                 
@@ -3102,11 +3206,18 @@ def main():
                             
                             st.write(f"📸 アップロード済み画像: {len(uploaded_images)}枚")
                             
-                            # 画像プレビュー
+                            # 画像プレビュー・送信前チェック
+                            invalid_images = []
                             cols = st.columns(len(uploaded_images))
                             for i, img in enumerate(uploaded_images):
                                 with cols[i]:
                                     st.image(img, caption=f"画像{i+1}: {img.name}", use_column_width=True)
+                                    is_valid, check_message = inspect_media(img.name, img.getvalue())
+                                    if not is_valid:
+                                        invalid_images.append(img.name)
+                                        st.error(f"❌ {check_message}")
+                                    elif check_message != "OK":
+                                        st.caption(f"🔧 {check_message}")
                         
                         # 投稿ボタン
                         col1, col2 = st.columns(2)
@@ -3116,6 +3227,8 @@ def main():
                                     st.error("⚠️ 投稿テキストを入力してください")
                                 elif not uploaded_images:
                                     st.error("⚠️ 画像をアップロードしてください")
+                                elif invalid_images:
+                                    st.error(f"⚠️ 投稿できない画像があります: {', '.join(invalid_images)}")
                                 else:
                                     with st.spinner("画像付き投稿を送信中..."):
                                         try:
@@ -3177,6 +3290,9 @@ def main():
                             **📝 対応するURL形式:**
                             - `https://drive.google.com/file/d/FILE_ID/view?usp=sharing`
                             - `https://drive.google.com/open?id=FILE_ID`
+                            - `https://drive.google.com/file/d/FILE_ID/edit`
+                            - `https://drive.google.com/uc?id=FILE_ID`
+                            - `https://drive.usercontent.google.com/download?id=FILE_ID`
                             - 自動的に直接アクセス可能な形式に変換されます
                             """)
                         
@@ -3191,6 +3307,7 @@ def main():
                         # Google Drive画像URL入力（最大4つ）
                         st.write("� Google Drive画像URL（最大4つ）")
                         image_urls = []
+                        invalid_image_urls = []
                         for i in range(4):
                             url = st.text_input(
                                 f"Google Drive画像URL {i+1}",
@@ -3199,7 +3316,12 @@ def main():
                                 help="Google Drive共有URL（自動変換されます）"
                             )
                             if url.strip():
-                                image_urls.append(url.strip())
+                                is_valid_url, url_error = validate_image_url(url)
+                                if is_valid_url:
+                                    image_urls.append(url.strip())
+                                else:
+                                    invalid_image_urls.append(url.strip())
+                                    st.error(f"⚠️ 画像URL {i+1}: {url_error}")
                         
                         if image_urls:
                             st.write(f"🔗 設定済みGoogle Drive画像: {len(image_urls)}個")
@@ -3215,6 +3337,8 @@ def main():
                             if st.button("� Google Drive画像付きでSheets送信", type="primary", use_container_width=True):
                                 if not sheets_post_text.strip():
                                     st.error("⚠️ 投稿テキストを入力してください")
+                                elif invalid_image_urls:
+                                    st.error("⚠️ 使用できない画像URLがあります。修正してから送信してください")
                                 else:
                                     with st.spinner("Google Sheetsに送信中..."):
                                         try:
@@ -3247,7 +3371,7 @@ def main():
                     
                     st.markdown("---")
                     
-                    # 全選択/全解除ボタン
+                    # 全選択/全解除ボタン（表示中のページが対象）
                     col_select1, col_select2, col_select3 = st.columns([1,1,4])
                     with col_select1:
                         if st.button("🔲 全選択", key="approved_select_all", use_container_width=True):
@@ -3516,20 +3640,24 @@ def main():
                                         execute_query("UPDATE posts SET scheduled_at = ?, sent_status = 'scheduled' WHERE id = ?", 
                                                     (scheduled_at_str, post['id']))
                                         st.session_state.page_status_message = ("success", f"📅 {final_scheduled_datetime.strftime('%Y-%m-%d %H:%M')} にスケジュール投稿を設定しました")
+                                    elif post['id'] not in claim_posts(DB_FILE, [post['id']]):
+                                        # 他の操作で送信中・送信済み
+                                        st.session_state.page_status_message = ("warning", "⚠️ この投稿は他の操作で送信中か、既に送信済みです")
                                     else:
-                                        # 即座投稿：従来通りの処理
+                                        # 即座投稿：送信中として確保してから送信
                                         success, message = send_post_to_destination(cast_name_only, post['content'], final_scheduled_datetime, destination_value, cast_id)
                                         
                                         if success:
                                             # 送信成功時のデータベース更新
                                             sent_at = datetime.datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
-                                            execute_query("UPDATE posts SET sent_status = 'sent', sent_at = ? WHERE id = ?", (sent_at, post['id']))
+                                            execute_query("UPDATE posts SET sent_status = 'sent', sent_at = ?, lease_until = NULL WHERE id = ?", (sent_at, post['id']))
                                             execute_query("INSERT INTO send_history (post_id, destination, sent_at, scheduled_datetime, status) VALUES (?, ?, ?, ?, ?)", 
                                                         (post['id'], destination_value, sent_at, final_scheduled_datetime.strftime('%Y-%m-%d %H:%M:%S'), 'completed'))
                                             st.session_state.page_status_message = ("success", message)
                                         else:
-                                            # 送信失敗時のログ記録
+                                            # 送信失敗時は確保前の状態に戻してログ記録
                                             failed_at = datetime.datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
+                                            execute_query("UPDATE posts SET sent_status = ?, lease_until = NULL WHERE id = ? AND sent_status = 'sending'", (post['sent_status'] or 'not_sent', post['id']))
                                             execute_query("INSERT INTO send_history (post_id, destination, sent_at, scheduled_datetime, status, error_message) VALUES (?, ?, ?, ?, ?, ?)", 
                                                         (post['id'], destination_value, failed_at, final_scheduled_datetime.strftime('%Y-%m-%d %H:%M:%S'), 'failed', message))
                                             st.session_state.page_status_message = ("error", message)
@@ -3540,13 +3668,14 @@ def main():
                                     st.session_state.page_status_message = ("success", "投稿を「投稿案」に戻しました。"); st.rerun()
                             
                             st.markdown("---")
+                    show_post_list_pager('approved', approved_page, len(approved_posts))
                 else: st.info("承認済みの投稿はまだありません。")
 
             with tab3:
                 # 送信済みタブ
-                sent_posts = execute_query("SELECT p.*, sh.destination, sh.sent_at as send_timestamp, sh.scheduled_datetime FROM posts p LEFT JOIN send_history sh ON p.id = sh.post_id WHERE p.cast_id = ? AND p.sent_status = 'sent' ORDER BY p.sent_at DESC", (selected_cast_id,), fetch="all")
+                sent_posts, sent_total, sent_page = get_post_list_page(selected_cast_id, 'sent')
                 if sent_posts:
-                    st.info(f"{len(sent_posts)}件の送信済み投稿があります。")
+                    st.info(f"{sent_total}件の送信済み投稿があります。")
                     for post in sent_posts:
                         with st.container():
                             col_content, col_info = st.columns([3,1])
@@ -3585,13 +3714,14 @@ def main():
                                 else:
                                     st.write(f"**投稿時間**: {post['posted_at']}")
                             st.markdown("---")
+                    show_post_list_pager('sent', sent_page, len(sent_posts))
                 else: 
                     st.info("送信済みの投稿はまだありません。")
 
             with tab4:
-                rejected_posts = execute_query("SELECT * FROM posts WHERE cast_id = ? AND status = 'rejected' ORDER BY created_at DESC", (selected_cast_id,), fetch="all")
+                rejected_posts, rejected_total, rejected_page = get_post_list_page(selected_cast_id, 'rejected')
                 if rejected_posts:
-                    st.info(f"{len(rejected_posts)}件の投稿が却下されています。")
+                    st.info(f"{rejected_total}件の投稿が却下されています。")
                     for post in rejected_posts:
                         full_advice_list = []
                         if post['advice']: full_advice_list.extend(post['advice'].split(','))
@@ -3610,6 +3740,7 @@ def main():
                             time_display = scheduled_time.strftime('%Y-%m-%d %H:%M')
                             st.caption(f"🕐 生成時刻: {time_display} | 評価: {post['evaluation']} | アドバイス: {full_advice_str}")
                         st.error(post['content'], icon="✖")
+                    show_post_list_pager('rejected', rejected_page, len(rejected_posts))
                 else: st.info("却下済みの投稿はまだありません。")
 
             with tab_schedule:
@@ -3796,7 +3927,7 @@ def main():
 
     elif page == "一斉指示":
         st.title("📣 一斉指示（キャンペーン）")
-        casts = execute_query("SELECT id, name, nickname FROM casts ORDER BY name", fetch="all")
+        casts = cached_query("SELECT id, name, nickname FROM casts ORDER BY name", ('casts',))
         if not casts:
             st.warning("キャスト未登録です。「キャスト管理」で作成してください。"); st.stop()
         
@@ -3814,7 +3945,7 @@ def main():
             st.subheader("指示内容")
             campaign_placeholder = get_app_setting("campaign_placeholder", "例：「グッチセール」というキーワードと、URL「https://gucci.com/sale」を必ず文末に入れて、セールをお知らせする投稿を作成してください。")
             campaign_instruction = st.text_area("具体的な指示内容*", placeholder=campaign_placeholder)
-            default_char_limit = int(get_app_setting("default_char_limit", "140"))
+            default_char_limit = get_app_setting_int("default_char_limit", 140)
             char_limit = st.number_input("文字数（以内）", min_value=20, max_value=300, value=default_char_limit)
             if st.form_submit_button("選択したキャスト全員に投稿を生成させる", type="primary"):
                 if not selected_cast_names:
@@ -3833,12 +3964,15 @@ def main():
                             persona_sheet = format_persona(cast_id, cast_details)
                             prompt = f"""# ペルソナ\n{persona_sheet}\n\n# 特別な指示\n{campaign_instruction}\n\n# ルール\nSNS投稿を**{char_limit}文字以内**で生成。"""
                             try:
-                                response = safe_generate_content(st.session_state.gemini_model, prompt)
+                                response = safe_generate_content(st.session_state.gemini_model, prompt, cast_id=cast_id, batch=True)
                                 generated_text = clean_generated_content(response.text)
                                 created_at = datetime.datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
                                 theme = f"一斉指示：{campaign_instruction[:20]}..."
                                 execute_query("INSERT INTO posts (cast_id, created_at, content, theme) VALUES (?, ?, ?, ?)", (cast_id, created_at, generated_text, theme))
                                 time.sleep(5)
+                            except GenerationBudgetExceeded as e:
+                                st.error(str(e))
+                                break
                             except Exception as e:
                                 st.warning(f"キャスト「{cast_name}」の生成中にエラーが発生しました: {e}")
                                 continue
@@ -3926,7 +4060,7 @@ def main():
                 col3.text("🔒 標準")
             
             # カスタムフィールド
-            custom_fields = execute_query("SELECT * FROM custom_fields ORDER BY sort_order", fetch="all")
+            custom_fields = cached_query("SELECT * FROM custom_fields ORDER BY sort_order", ('custom_fields',))
             if custom_fields:
                 st.markdown("### ⚙️ カスタム項目")
                 for field in custom_fields:
@@ -4035,14 +4169,14 @@ def main():
             st.header("キャストの個別管理")
             tab_create, tab_edit, tab_list = st.tabs(["新しいキャストの作成", "既存キャストの編集・削除", "一覧表示"])
         
-            cat_rows = execute_query("SELECT name FROM situation_categories ORDER BY name", fetch="all")
+            cat_rows = cached_query("SELECT name FROM situation_categories ORDER BY name", ('situation_categories',))
             category_options = [row['name'] for row in cat_rows] if cat_rows else []
             
-            group_rows = execute_query("SELECT id, name FROM groups ORDER BY name", fetch="all")
+            group_rows = cached_query("SELECT id, name FROM groups ORDER BY name", ('groups',))
             group_options = {row['name']: row['id'] for row in group_rows} if group_rows else {}
             
             # カスタムフィールドを取得
-            custom_fields = execute_query("SELECT * FROM custom_fields ORDER BY sort_order", fetch="all")
+            custom_fields = cached_query("SELECT * FROM custom_fields ORDER BY sort_order", ('custom_fields',))
 
             with tab_create:
                 with st.form(key="new_cast_form"):
@@ -4140,7 +4274,7 @@ def main():
                         else: st.error("キャスト名は必須項目です。")
 
         with tab_edit:
-            casts = execute_query("SELECT id, name, nickname FROM casts ORDER BY name", fetch="all")
+            casts = cached_query("SELECT id, name, nickname FROM casts ORDER BY name", ('casts',))
             if not casts:
                  st.info("編集できるキャストがまだいません。")
             else:
@@ -4284,8 +4418,7 @@ def main():
                                 with st.spinner("認証情報を確認中..."):
                                     try:
                                         # キャッシュされたクライアントを削除して再認証
-                                        if cast_id_to_edit in x_poster.cast_clients:
-                                            del x_poster.cast_clients[cast_id_to_edit]
+                                        x_poster.invalidate_cast_client(cast_id_to_edit)
                                         
                                         success, message, user_data = x_poster.setup_cast_credentials(
                                             cast_id_to_edit,
@@ -4529,6 +4662,7 @@ def main():
                                     execute_query("DELETE FROM posts WHERE cast_id = ?", (cast_id_to_edit,))
                                     execute_query("DELETE FROM cast_groups WHERE cast_id = ?", (cast_id_to_edit,))
                                     execute_query("DELETE FROM casts WHERE id = ?", (cast_id_to_edit,))
+                                    invalidate_cast_sheets_config(cast_id_to_edit)
                                     st.success(f"キャスト「{selected_cast_name_edit}」を削除しました。"); st.rerun()
                                 else: st.error("入力されたキャスト名が一致しません。")
         
@@ -4574,7 +4708,7 @@ def main():
                             st.write(f"• 許可カテゴリ: {cast_dict.get('allowed_categories', '')}")
                             
                             # カスタムフィールドがある場合は表示
-                            custom_fields = execute_query("SELECT * FROM custom_fields ORDER BY sort_order", fetch="all")
+                            custom_fields = cached_query("SELECT * FROM custom_fields ORDER BY sort_order", ('custom_fields',))
                             if custom_fields:
                                 st.write("**カスタム項目**")
                                 for field in custom_fields:
@@ -4626,7 +4760,7 @@ def main():
                 
                 # 許可カテゴリの選択
                 st.subheader("📚 許可するシチュエーションカテゴリ")
-                cat_rows = execute_query("SELECT name FROM situation_categories ORDER BY name", fetch="all")
+                cat_rows = cached_query("SELECT name FROM situation_categories ORDER BY name", ('situation_categories',))
                 category_options = [row['name'] for row in cat_rows] if cat_rows else []
                 
                 if category_options:
@@ -4640,7 +4774,7 @@ def main():
                     gen_categories = []
                 
                 # 所属グループの選択
-                group_rows = execute_query("SELECT id, name FROM groups ORDER BY name", fetch="all")
+                group_rows = cached_query("SELECT id, name FROM groups ORDER BY name", ('groups',))
                 group_options = {row['name']: row['id'] for row in group_rows} if group_rows else {}
                 
                 if group_options:
@@ -4745,7 +4879,7 @@ def main():
 - 性別に合った自然な設定にする"""
 
                                 try:
-                                    response = safe_generate_content(st.session_state.gemini_model, prompt)
+                                    response = safe_generate_content(st.session_state.gemini_model, prompt, batch=True)
                                     ai_profile = response.text
                                     
                                     # AI出力を解析してフィールドに分割
@@ -4754,6 +4888,9 @@ def main():
                                     
                                     time.sleep(2)  # API制限を考慮
                                     
+                                except GenerationBudgetExceeded as e:
+                                    st.error(str(e))
+                                    break
                                 except Exception as e:
                                     st.warning(f"キャスト「{display_name}（{username}）」の生成中にエラーが発生しました: {e}")
                                     continue
@@ -5027,7 +5164,7 @@ def main():
             new_content = st.text_area("シチュエーション内容", placeholder=situation_placeholder)
             c1, c2 = st.columns(2)
             time_slot = c1.selectbox("時間帯", ["いつでも", "朝", "昼", "夜"])
-            cat_rows = execute_query("SELECT id, name FROM situation_categories ORDER BY name", fetch="all")
+            cat_rows = cached_query("SELECT id, name FROM situation_categories ORDER BY name", ('situation_categories',))
             category_options = [row['name'] for row in cat_rows] if cat_rows else []
             selected_category_name = c2.selectbox("カテゴリ", category_options)
             if st.form_submit_button("追加する"):
@@ -5040,7 +5177,7 @@ def main():
         st.header("登録済みシチュエーション一覧")
         all_situations = execute_query("SELECT s.id, s.content, s.time_slot, sc.name as category_name, s.category_id FROM situations s LEFT JOIN situation_categories sc ON s.category_id = sc.id ORDER BY s.id DESC", fetch="all")
         if all_situations:
-            cat_rows = execute_query("SELECT id, name FROM situation_categories ORDER BY name", fetch="all")
+            cat_rows = cached_query("SELECT id, name FROM situation_categories ORDER BY name", ('situation_categories',))
             category_options = [row['name'] for row in cat_rows] if cat_rows else []
             time_slot_options = ["いつでも", "朝", "昼", "夜"]
             
@@ -5354,19 +5491,13 @@ def main():
             # リアルタイム認証テスト
             auth_test_result = None
             try:
-                import vertexai
-                # APIバージョンを動的に決定
-                try:
-                    from vertexai.generative_models import GenerativeModel
-                    test_models = ["gemini-2.5-flash", "gemini-2.0-flash-exp", "gemini-1.5-flash-001"]
-                except ImportError:
-                    from vertexai.preview.generative_models import GenerativeModel
-                    test_models = ["gemini-2.5-flash", "gemini-2.0-flash-exp", "gemini-1.5-flash-001"]
+                test_models = ["gemini-2.5-flash", "gemini-2.0-flash-exp", "gemini-1.5-flash-001"]
                 
-                vertexai.init(project="aicast-472807", location="us-central1")
+                # 初期化済みのプロセス共通レジストリを使用（同じ設定なら再初期化しない）
+                init_vertex_ai(Config.is_production_environment() and "gcp_service_account" in st.secrets)
                 
                 # 最初の利用可能なモデルでテスト
-                model = GenerativeModel(test_models[0])
+                model = gemini_models.get_model(test_models[0])
                 auth_test_result = "active"
             except Exception as e:
                 auth_test_result = f"error: {str(e)}"
@@ -5405,6 +5536,7 @@ def main():
                                 del st.session_state['auth_done']
                             if 'gemini_model' in st.session_state:
                                 del st.session_state['gemini_model']
+                            gemini_models.reset()
                             st.success("✅ 認証情報をリセットしました。ページを更新してください。")
                             st.rerun()
                         except Exception as e:
@@ -5436,6 +5568,7 @@ def main():
                                 del st.session_state['auth_done']
                             if 'gemini_model' in st.session_state:
                                 del st.session_state['gemini_model']
+                            gemini_models.reset()
                             st.success("✅ 認証情報をリセットしました。ページを更新してください。")
                             st.rerun()
                         except Exception as e:
@@ -5862,6 +5995,44 @@ def main():
             st.info("設定項目がありません。初期化中...")
             st.rerun()
         
+        st.markdown("---")
+        st.subheader("💰 Gemini 使用量・コスト")
+        usage_ledger = GenerationUsageLedger(DB_FILE)
+        budget_state, month_spent, month_budget = check_generation_budget()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("今月の推定コスト", f"${month_spent:.4f}")
+        col2.metric("月間予算", f"${month_budget:.2f}" if month_budget > 0 else "無制限")
+        col3.metric("一括生成", {'ok': "通常", 'throttle': "間隔を空けて実行", 'block': "停止中"}[budget_state])
+        st.caption("予算は「🔧 アプリ設定」の AI設定（gemini_monthly_budget_usd / gemini_budget_throttle_ratio）で変更できます。コストは usage_metadata のトークン数と公開料金からの推定値です。")
+        
+        with st.expander("📅 日別の使用量（直近30日）", expanded=False):
+            daily_rows = usage_ledger.daily_rollups(30)
+            if daily_rows:
+                st.dataframe(pd.DataFrame([{
+                    '日付': row['day'],
+                    'リクエスト': row['requests'],
+                    'エラー': row['errors'],
+                    '入力トークン': row['prompt_tokens'],
+                    '出力トークン': row['response_tokens'],
+                    '平均ms': round(row['avg_latency_ms'] or 0, 1),
+                    'コスト(USD)': round(row['cost_usd'], 4),
+                } for row in daily_rows]), use_container_width=True, hide_index=True)
+            else:
+                st.info("まだ生成の記録がありません")
+        
+        with st.expander("👤 キャスト別 承認1件あたりのコスト（今月）", expanded=False):
+            cost_rows = usage_ledger.cost_per_approved_post()
+            if cost_rows:
+                st.dataframe(pd.DataFrame([{
+                    'キャスト': row['name'],
+                    'リクエスト': row['requests'],
+                    'コスト(USD)': round(row['cost_usd'], 4),
+                    '承認済み投稿': row['approved_posts'],
+                    '承認1件あたり(USD)': round(row['cost_per_approved_usd'], 4) if row['cost_per_approved_usd'] is not None else None,
+                } for row in cost_rows]), use_container_width=True, hide_index=True)
+            else:
+                st.info("今月の生成・承認の記録がありません")
+        
         st.markdown("---")
         st.subheader("🐦 X (Twitter) API設定")
         
@@ -5981,7 +6152,25 @@ def main():
     "access_token_secret": "YOUR_ACCESS_TOKEN_SECRET"
 }
                 ''', language='json')
-        
+
+        # X API 残りリクエスト数
+        with st.expander("📊 X API 残りリクエスト数", expanded=False):
+            rate_limit_basis = "API応答前はプラン既定枠で見積もり" if Config.X_API_PLAN_DEFAULTS else "API応答のヘッダーのみで判定"
+            st.caption(f"プラン: {Config.X_API_PLAN.upper()}（{rate_limit_basis}。制限中の操作は待機せず再実行可能時刻を表示し、予約リツイートは再実行可能時刻に自動で再予約します）")
+            rate_limit_rows = x_poster.get_rate_limit_status()
+            if rate_limit_rows:
+                rate_limit_casts = {row['id']: row['name'] for row in cached_query("SELECT id, name FROM casts", ('casts',)) or []}
+                st.dataframe(pd.DataFrame([{
+                    'アカウント': 'グローバル' if row['account'] == 'global' else rate_limit_casts.get(row['account'], f"Cast_{row['account']}"),
+                    '操作': row['label'],
+                    '残り': row['remaining'],
+                    '上限': row['limit'],
+                    'リセット': row['reset_at'] or '-',
+                    '取得元': 'API応答' if row['source'] == 'header' else 'プラン既定値',
+                } for row in rate_limit_rows]), use_container_width=True, hide_index=True)
+            else:
+                st.info("まだX APIの呼び出し履歴がありません")
+
         # X API いいね機能テスト
         with st.expander("👍 X API いいね機能テスト", expanded=False):
             st.warning("""
@@ -6082,17 +6271,9 @@ def main():
                     with col2_1:
                         if st.button("👍 いいね", key="cast_like", use_container_width=True):
                             if tweet_id_cast:
-                                # キャスト認証を設定
+                                # キャスト認証情報の確認（クライアントは x_poster が遅延読み込み）
                                 cast_creds = get_cast_x_credentials(selected_cast_id)
                                 if cast_creds:
-                                    x_poster.setup_cast_credentials(
-                                        selected_cast_id,
-                                        cast_creds['api_key'],
-                                        cast_creds['api_secret'], 
-                                        cast_creds['bearer_token'],
-                                        cast_creds['access_token'],
-                                        cast_creds['access_token_secret']
-                                    )
                                     success, message = x_poster.like_tweet(tweet_id_cast, cast_id=selected_cast_id)
                                     if success:
                                         st.success(message)
@@ -6108,14 +6289,6 @@ def main():
                             if tweet_id_cast:
                                 cast_creds = get_cast_x_credentials(selected_cast_id)
                                 if cast_creds:
-                                    x_poster.setup_cast_credentials(
-                                        selected_cast_id,
-                                        cast_creds['api_key'],
-                                        cast_creds['api_secret'],
-                                        cast_creds['bearer_token'], 
-                                        cast_creds['access_token'],
-                                        cast_creds['access_token_secret']
-                                    )
                                     success, message = x_poster.unlike_tweet(tweet_id_cast, cast_id=selected_cast_id)
                                     if success:
                                         st.success(message)
@@ -6129,14 +6302,6 @@ def main():
                     if st.button("📋 いいね履歴", key="cast_liked_tweets", use_container_width=True):
                         cast_creds = get_cast_x_credentials(selected_cast_id)
                         if cast_creds:
-                            x_poster.setup_cast_credentials(
-                                selected_cast_id,
-                                cast_creds['api_key'],
-                                cast_creds['api_secret'],
-                                cast_creds['bearer_token'],
-                                cast_creds['access_token'], 
-                                cast_creds['access_token_secret']
-                            )
                             success, data = x_poster.get_liked_tweets(cast_id=selected_cast_id, max_results=3)
                             if success:
                                 st.success(f"✅ {data['account_type']} いいね履歴 ({data['count']}件)")
@@ -6223,14 +6388,6 @@ def main():
                             if tweet_id_rt_cast:
                                 cast_creds = get_cast_x_credentials(selected_cast_id_rt)
                                 if cast_creds:
-                                    x_poster.setup_cast_credentials(
-                                        selected_cast_id_rt,
-                                        cast_creds['api_key'],
-                                        cast_creds['api_secret'],
-                                        cast_creds['bearer_token'],
-                                        cast_creds['access_token'], 
-                                        cast_creds['access_token_secret']
-                                    )
                                     success, message = x_poster.retweet(tweet_id_rt_cast, cast_id=selected_cast_id_rt)
                                     if success:
                                         st.success(message)
@@ -6246,14 +6403,6 @@ def main():
                             if tweet_id_rt_cast:
                                 cast_creds = get_cast_x_credentials(selected_cast_id_rt)
                                 if cast_creds:
-                                    x_poster.setup_cast_credentials(
-                                        selected_cast_id_rt,
-                                        cast_creds['api_key'],
-                                        cast_creds['api_secret'],
-                                        cast_creds['bearer_token'],
-                                        cast_creds['access_token'],
-                                        cast_creds['access_token_secret']
-                                    )
                                     success, message = x_poster.unretweet(tweet_id_rt_cast, cast_id=selected_cast_id_rt)
                                     if success:
                                         st.success(message)
@@ -6266,6 +6415,52 @@ def main():
                 else:
                     st.info("X API認証が設定されたキャストがありません")
         
+        # 複数キャストでの一斉リツイート・いいね（アカウント間は並行、同一アカウント内は順番に実行）
+        with st.expander("📣 複数キャストで一斉リツイート・いいね", expanded=False):
+            fanout_casts = execute_query("""
+                SELECT c.id, c.name, cx.twitter_username
+                FROM casts c
+                JOIN cast_x_credentials cx ON c.id = cx.cast_id
+                WHERE cx.is_active = 1
+                ORDER BY c.name
+            """, fetch="all") or []
+            if fanout_casts:
+                fanout_labels = {cast['id']: f"{cast['name']} (@{cast['twitter_username']})" for cast in fanout_casts}
+                fanout_cast_ids = st.multiselect(
+                    "実行するキャスト",
+                    list(fanout_labels),
+                    format_func=lambda cast_id: fanout_labels[cast_id],
+                    key="fanout_cast_ids"
+                )
+                fanout_action_options = {"🔄 リツイート": 'retweet', "❌ RT取消": 'unretweet', "👍 いいね": 'like', "💔 いいね取消": 'unlike'}
+                fanout_action = st.radio("操作", list(fanout_action_options), horizontal=True, key="fanout_action")
+                fanout_tweet_id = st.text_input("投稿ID", placeholder="例: 1234567890123456789", key="fanout_tweet_id")
+                st.caption("非同期モード（tweepy[async]）" if async_available() else "スレッド並列モード（tweepy[async] 未インストール）")
+
+                if st.button("📣 一斉実行", key="fanout_run", type="primary", use_container_width=True):
+                    if not fanout_cast_ids or not fanout_tweet_id:
+                        st.warning("キャストと投稿IDを指定してください")
+                    else:
+                        with st.spinner(f"{len(fanout_cast_ids)}アカウントで実行中..."):
+                            fanout_results = x_poster.run_batch_async([{
+                                'action': fanout_action_options[fanout_action],
+                                'cast_id': cast_id,
+                                'params': {'tweet_id': fanout_tweet_id.strip()},
+                            } for cast_id in fanout_cast_ids])
+                        fanout_summary = summarize_batch_results(fanout_results)
+                        if fanout_summary['failed']:
+                            st.warning(f"成功 {fanout_summary['succeeded']}件 / 失敗 {fanout_summary['failed']}件")
+                        else:
+                            st.success(f"✅ {fanout_summary['succeeded']}アカウントで実行しました")
+                        st.dataframe(pd.DataFrame([{
+                            'キャスト': fanout_labels.get(result['cast_id'], result['cast_id']),
+                            '結果': "✅" if result['success'] else "❌",
+                            'メッセージ': result['message'],
+                            '秒': round(result['elapsed'], 2),
+                        } for result in fanout_results]), use_container_width=True, hide_index=True)
+            else:
+                st.info("X API認証が設定されたキャストがありません")
+
         # X API コメント入りリツイート機能テスト
         with st.expander("💬 X API コメント入りリツイート機能テスト", expanded=False):
             st.success("""
@@ -6336,14 +6531,6 @@ def main():
                         if tweet_id_quote_cast and comment_cast:
                             cast_creds = get_cast_x_credentials(selected_cast_id_quote)
                             if cast_creds:
-                                x_poster.setup_cast_credentials(
-                                    selected_cast_id_quote,
-                                    cast_creds['api_key'],
-                                    cast_creds['api_secret'],
-                                    cast_creds['bearer_token'],
-                                    cast_creds['access_token'], 
-                                    cast_creds['access_token_secret']
-                                )
                                 success, message = x_poster.quote_tweet(
                                     tweet_id_quote_cast, 
                                     comment_cast, 
@@ -0,0 +1,298 @@
+# オフラインベンチマーク用のフェイク実装
+# Gemini（GenerativeModel）・gspread・Cloud Functions / GAS の HTTP エンドポイント・tweepy Client を
+# ローカルで置き換え、外部サービスに接続せずにスループットと所要時間を計測する（offline_benchmark.py から使用）
+
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count, thoughts_token_count=0):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.thoughts_token_count = thoughts_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count + thoughts_token_count
+
+
+class FakeGenerateResponse:
+    def __init__(self, text, usage_metadata):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeGenerativeModel:
+    """vertexai の GenerativeModel の代わり（所要時間と 429 の発生率を指定できる）
+
+    Args:
+        latency (float): 1回の生成にかかる秒数（±jitter の割合でばらつかせる）
+        rate_limit_ratio (float): 429（Resource exhausted）を返す割合
+        response_chars (int): 生成する文字数
+    """
+
+    def __init__(self, model_name="gemini-2.5-flash", latency=0.05, jitter=0.2, rate_limit_ratio=0.0,
+                 response_chars=120, seed=None):
+        self._model_name = f"publishers/google/models/{model_name}"
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.response_chars = response_chars
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            rate_limited = self._random.random() < self.rate_limit_ratio
+            return self.calls, max(0.0, delay), rate_limited
+
+    def generate_content(self, prompt):
+        call_number, delay, rate_limited = self._next()
+        time.sleep(delay)
+        if rate_limited:
+            raise Exception("429 Resource exhausted. Please try again later. (fake)")
+        text = f"ベンチマーク投稿 #{call_number} " + "あ" * max(0, self.response_chars - 12)
+        # 日本語はおおよそ1文字1トークンとして数える
+        return FakeGenerateResponse(text, FakeUsageMetadata(len(prompt), len(text)))
+
+
+class FakeWorksheet:
+    """gspread の Worksheet の代わり（post_senders が使う操作と append_rows / get_all_values のみ）"""
+
+    def __init__(self, title="Sheet1", latency=0.02):
+        self.title = title
+        self.latency = latency
+        self.rows = []
+        self._lock = threading.Lock()
+
+    def append_row(self, values, value_input_option=None):
+        time.sleep(self.latency)
+        with self._lock:
+            self.rows.append(list(values))
+        return {'updates': {'updatedRows': 1}}
+
+    def append_rows(self, values, value_input_option=None):
+        time.sleep(self.latency)
+        with self._lock:
+            self.rows.extend(list(row) for row in values)
+        return {'updates': {'updatedRows': len(values)}}
+
+    def row_values(self, row):
+        time.sleep(self.latency)
+        with self._lock:
+            return list(self.rows[row - 1]) if len(self.rows) >= row else []
+
+    def clear(self):
+        time.sleep(self.latency)
+        with self._lock:
+            self.rows.clear()
+
+    def get_all_values(self):
+        time.sleep(self.latency)
+        with self._lock:
+            return [list(row) for row in self.rows]
+
+
+class FakeSpreadsheet:
+    """gspread の Spreadsheet の代わり（ワークシートは名前ごとに1つ）"""
+
+    def __init__(self, gspread_module, key):
+        self._gspread = gspread_module
+        self.key = key
+        self.worksheets = {}
+
+    @property
+    def sheet1(self):
+        return self.worksheet("Sheet1", create=True)
+
+    def worksheet(self, title, create=False):
+        with self._gspread.lock:
+            sheet = self.worksheets.get(title)
+            if sheet is None and create:
+                sheet = self.worksheets[title] = FakeWorksheet(title, self._gspread.latency)
+        if sheet is None:
+            raise self._gspread.WorksheetNotFound(title)
+        return sheet
+
+    def add_worksheet(self, title, rows=1000, cols=10):
+        return self.worksheet(title, create=True)
+
+
+class FakeGspreadClient:
+    def __init__(self, gspread_module):
+        self._gspread = gspread_module
+
+    def open_by_key(self, key):
+        return self._gspread.spreadsheet(key)
+
+    def open(self, title):
+        return self._gspread.spreadsheet(title)
+
+    def create(self, title):
+        return self._gspread.spreadsheet(title)
+
+
+class FakeGspread:
+    """gspread モジュールの代わり（authorize と例外クラスのみ）
+
+    post_senders.gspread をこのオブジェクトに置き換えると、送信処理はそのままに
+    スプレッドシートへの書き込みだけがメモリ上の FakeWorksheet に向く
+    """
+
+    class WorksheetNotFound(Exception):
+        pass
+
+    class SpreadsheetNotFound(Exception):
+        pass
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.spreadsheets = {}
+
+    def authorize(self, creds):
+        return FakeGspreadClient(self)
+
+    def spreadsheet(self, key):
+        with self.lock:
+            spreadsheet = self.spreadsheets.get(key)
+            if spreadsheet is None:
+                spreadsheet = self.spreadsheets[key] = FakeSpreadsheet(self, key)
+            return spreadsheet
+
+    def data_rows(self):
+        """ヘッダー行を除いた書き込み行数"""
+        with self.lock:
+            sheets = [sheet for spreadsheet in self.spreadsheets.values() for sheet in spreadsheet.worksheets.values()]
+        return sum(max(0, len(sheet.get_all_values()) - 1) for sheet in sheets)
+
+
+class FakeTweepyResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeTweepyClient:
+    """tweepy.Client の代わり（投稿・リツイート・いいね・引用のみ）"""
+
+    _ids = itertools.count(1_900_000_000_000_000_000)
+
+    def __init__(self, consumer_key="bench", access_token="bench", latency=0.03, error_ratio=0.0, seed=None):
+        self.consumer_key = consumer_key
+        self.access_token = access_token
+        self.latency = latency
+        self.error_ratio = error_ratio
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_ratio
+        time.sleep(self.latency)
+        if failed:
+            raise Exception("503 Service Unavailable (fake)")
+
+    def create_tweet(self, text=None, quote_tweet_id=None, media_ids=None):
+        self._call()
+        return FakeTweepyResponse({'id': str(next(self._ids)), 'text': text})
+
+    def retweet(self, tweet_id):
+        self._call()
+        return FakeTweepyResponse({'retweeted': True})
+
+    def unretweet(self, source_tweet_id):
+        self._call()
+        return FakeTweepyResponse({'retweeted': False})
+
+    def like(self, tweet_id):
+        self._call()
+        return FakeTweepyResponse({'liked': True})
+
+    def unlike(self, tweet_id):
+        self._call()
+        return FakeTweepyResponse({'liked': False})
+
+
+class _EndpointHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            payload = {}
+        status, body = server.handle_payload(self.path, payload)
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalEndpointServer(ThreadingHTTPServer):
+    """Cloud Functions（x-poster）・GAS Web App を模したローカル HTTP サーバー
+
+    POST /x-poster に {"status": "success", "tweet_id": ...}、POST /gas（GAS Web App のリツイート予約）に
+    {"status": "success", "data": {"trigger_id": ...}} を返す。
+    latency 秒待ってから応答し、rate_limit_ratio の割合で HTTP 429、error_ratio の割合で {"status": "error"} を返す。
+
+    使い方:
+        with LocalEndpointServer(latency=0.05) as server:
+            requests.post(server.url("x-poster"), json={...})
+    """
+
+    daemon_threads = True
+    _ids = itertools.count(1_800_000_000_000_000_000)
+
+    def __init__(self, latency=0.05, rate_limit_ratio=0.0, error_ratio=0.0, seed=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), _EndpointHandler)
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.error_ratio = error_ratio
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests_by_path = {}
+        self._thread = None
+
+    def url(self, path="x-poster"):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{path}"
+
+    def handle_payload(self, path, payload):
+        with self._lock:
+            self.requests_by_path[path] = self.requests_by_path.get(path, 0) + 1
+            roll = self._random.random()
+        time.sleep(self.latency)
+        if roll < self.rate_limit_ratio:
+            return 429, {"status": "error", "message": "Too Many Requests (fake)"}
+        if roll < self.rate_limit_ratio + self.error_ratio:
+            return 200, {"status": "error", "message": "fake error"}
+        if path == "/gas":
+            return 200, {"status": "success", "data": {"trigger_id": f"trigger-{next(self._ids)}"}}
+        return 200, {"status": "success", "tweet_id": str(next(self._ids)), "action": payload.get("action", "post")}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-endpoint", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
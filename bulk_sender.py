@@ -0,0 +1,113 @@
+# 一括送信エンジン
+# 承認済み投稿の一括送信を、送信先ごとの同時実行数制限付きで並列処理する
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# チャネルごとの同時実行数上限
+DEFAULT_CONCURRENCY_LIMITS = {
+    'google_sheets': 2,     # Sheets API 書き込みクォータ（60回/分/ユーザー）を考慮
+    'cloud_functions': 8,   # Cloud Functions (x-poster) はインスタンスが自動スケール
+    'x_api': 4,             # tweepy 直接呼び出し
+}
+
+# 送信先（destination）が使用するチャネル
+# send_to_x_api は Cloud Functions 経由で投稿するため cloud_functions を使う
+DESTINATION_CHANNELS = {
+    'google_sheets': ('google_sheets',),
+    'x_api': ('cloud_functions',),
+    'both': ('google_sheets', 'cloud_functions'),
+}
+
+
+_worker_state = threading.local()
+
+
+def in_send_worker():
+    """送信エンジンのワーカースレッド内で実行中か
+
+    ワーカーには Streamlit の実行コンテキストがないため、送信関数は画面表示や
+    ブラウザ認証を行わず、(成功, メッセージ) でエラーを返す
+    """
+    return getattr(_worker_state, 'active', False)
+
+
+class BulkSendEngine:
+    """送信先ごとのセマフォで流量を制御するスレッドプール送信エンジン"""
+
+    def __init__(self, send_func, concurrency_limits=None, max_workers=None):
+        """
+        Args:
+            send_func (callable): send_post_to_destination と同じシグネチャの送信関数
+            concurrency_limits (dict, optional): チャネル名 → 同時実行数
+            max_workers (int, optional): スレッドプールのワーカー数
+        """
+        self.send_func = send_func
+        self.concurrency_limits = dict(DEFAULT_CONCURRENCY_LIMITS)
+        if concurrency_limits:
+            self.concurrency_limits.update(concurrency_limits)
+        self.max_workers = max_workers or sum(self.concurrency_limits.values())
+        self._semaphores = {
+            channel: threading.BoundedSemaphore(max(1, limit))
+            for channel, limit in self.concurrency_limits.items()
+        }
+
+    def _channels_for(self, destination):
+        # デッドロック回避のため常に同じ順序で取得する
+        return sorted(DESTINATION_CHANNELS.get(destination, (destination,)))
+
+    def _send_one(self, job):
+        """1件送信（チャネルのセマフォを取得してから送信関数を呼ぶ）"""
+        _worker_state.active = True  # プールのスレッドはこのエンジン専用
+        acquired = []
+        started = time.perf_counter()
+        try:
+            for channel in self._channels_for(job['destination']):
+                semaphore = self._semaphores.get(channel)
+                if semaphore:
+                    semaphore.acquire()
+                    acquired.append(semaphore)
+            success, message = self.send_func(
+                job['cast_name'],
+                job['content'],
+                job['scheduled_datetime'],
+                job['destination'],
+                job.get('cast_id'),
+            )
+        except Exception as e:
+            success, message = False, f"送信エラー: {str(e)}"
+        finally:
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+        result = dict(job)
+        result.update({
+            'success': bool(success),
+            'message': message,
+            'elapsed': time.perf_counter() - started,
+        })
+        return result
+
+    def run(self, jobs, on_progress=None):
+        """ジョブを並列送信して結果のリストを返す
+
+        Args:
+            jobs (list[dict]): post_id, cast_name, content, scheduled_datetime, destination, cast_id を持つ辞書
+            on_progress (callable, optional): on_progress(完了件数, 総件数, 結果) — 呼び出し元スレッドで実行される
+
+        Returns:
+            list[dict]: jobs と同じ順序の送信結果
+        """
+        if not jobs:
+            return []
+
+        results = [None] * len(jobs)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as executor:
+            futures = {executor.submit(self._send_one, job): index for index, job in enumerate(jobs)}
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                results[futures[future]] = result
+                if on_progress:
+                    on_progress(done, len(jobs), result)
+        return results
@@ -26,6 +26,20 @@ class Config:
     # Vertex AI設定 (Production Environment)
     VERTEX_AI_LOCATION = os.environ.get('VERTEX_AI_LOCATION', "asia-northeast1")
     
+    # X API プラン（free / basic）
+    X_API_PLAN = os.environ.get('X_API_PLAN', 'free')
+    # API応答を受信する前からプランの既定枠で残り回数を見積もる（既定ではAPI応答のヘッダーのみを使う）
+    X_API_PLAN_DEFAULTS = os.environ.get('X_API_PLAN_DEFAULTS', 'false').lower() == 'true'
+    
+    # アプリ内でリツイート予約を実行時刻に実行する（常駐スケジューラーを使わない構成向け）
+    IN_APP_RETWEET_TIMER = os.environ.get('IN_APP_RETWEET_TIMER', 'false').lower() == 'true'
+    
+    # 起動時のウォームアップ（DB・Vertex AI・Sheetsトークン・X APIクライアントを先に準備）
+    PREWARM_ON_START = os.environ.get('PREWARM_ON_START', 'false').lower() == 'true'
+    
+    # Prometheus 形式のメトリクスを公開するポート（0 の場合は公開しない）
+    METRICS_PORT = int(os.environ.get('METRICS_PORT', '0') or 0)
+    
     # ログ設定 (Production Environment)
     SCHEDULE_LOG_PATH = os.environ.get('SCHEDULE_LOG_PATH', "schedule.log")
     RETWEET_LOG_PATH = os.environ.get('RETWEET_LOG_PATH', "retweet.log")
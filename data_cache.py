@@ -0,0 +1,143 @@
+# プロセス共通のデータキャッシュ
+# Streamlitはリクエストごとに app.py を再実行するため、再実行をまたいで保持したいキャッシュはここに置く
+
+import re
+import threading
+
+_MISSING = object()
+
+
+class KeyedCache:
+    """スレッドセーフなキー単位のキャッシュ（値が None の場合もキャッシュする）
+
+    キーごとの世代カウンターを無効化で進め、読み込み中に無効化されたキーの値は保存しない
+    （VersionedCache のバージョンと同じ考え方）。
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._generations = {}  # キー → 無効化の回数
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        """キャッシュがあれば返し、なければ loader() の結果を保存して返す"""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            generation = self._generations.setdefault(key, 0)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        with self._lock:
+            # 読み込み中に無効化された場合は古い値の可能性があるため保存しない（次回読み込み直す）
+            if self._generations.get(key) == generation:
+                self._data[key] = value
+        return value
+
+    def _bump(self, key):
+        """ロック内で呼ぶ"""
+        self._data.pop(key, None)
+        self._generations[key] = self._generations.get(key, 0) + 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._bump(key)
+
+    def invalidate_where(self, predicate):
+        """predicate(key) が真になるキーをまとめて削除（読み込み中のキーを含む）"""
+        with self._lock:
+            for key in [k for k in self._generations if predicate(k)]:
+                self._bump(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._generations):
+                self._bump(key)
+
+
+# キャスト別・アクション別の送信先設定（キー: (cast_id, action_type)）
+sheets_config_cache = KeyedCache()
+
+
+def invalidate_cast_sheets_config(cast_id):
+    """指定キャストの送信先設定キャッシュを全アクション分破棄"""
+    cast_id = int(cast_id)
+    sheets_config_cache.invalidate_where(lambda key: key[0] == cast_id)
+
+
+# アプリ設定（キー: APP_SETTINGS_KEY → {設定キー: 値}）
+app_settings_cache = KeyedCache()
+APP_SETTINGS_KEY = 'all'
+
+
+class VersionedCache:
+    """テーブルごとの変更カウンターで無効化するキャッシュ
+
+    値は読み込み時点の対象テーブルのバージョンと一緒に保存し、いずれかのテーブルの
+    カウンターが進んでいれば次回取得時に読み込み直す。
+    """
+
+    def __init__(self):
+        self._versions = {}  # テーブル名 → 変更カウンター
+        self._data = {}  # キー → (バージョンのタプル, 値)
+        self._lock = threading.Lock()
+
+    def _current_versions(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def get_or_load(self, key, tables, loader):
+        with self._lock:
+            versions = self._current_versions(tables)
+            cached = self._data.get(key)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+        # 読み込み中に更新された場合は古いバージョンで保存されるため、次回読み込み直される
+        value = loader()
+        with self._lock:
+            self._data[key] = (versions, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def bump(self, *tables):
+        """テーブルの変更カウンターを進める"""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def version(self, table):
+        with self._lock:
+            return self._versions.get(table, 0)
+
+
+# 参照用データ（キャスト・カテゴリ・グループ・シチュエーション・アドバイス・カスタム項目）
+reference_cache = VersionedCache()
+REFERENCE_TABLES = ('casts', 'situation_categories', 'groups', 'situations', 'advice_master', 'custom_fields')
+
+# ON DELETE CASCADE などで一緒に変更されるテーブル
+_DEPENDENT_TABLES = {'situation_categories': ('situations',)}
+
+_WRITE_PATTERN = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)\s+(\w+)",
+    re.IGNORECASE
+)
+_RENAME_PATTERN = re.compile(r"RENAME\s+TO\s+(\w+)", re.IGNORECASE)
+
+
+def bump_reference_tables_for_query(query):
+    """更新クエリが参照用テーブルを変更する場合に変更カウンターを進める"""
+    match = _WRITE_PATTERN.match(query)
+    if not match:
+        return
+    tables = {match.group(1).lower()}
+    rename = _RENAME_PATTERN.search(query)
+    if rename:
+        tables.add(rename.group(1).lower())
+    changed = set()
+    for table in tables:
+        if table in REFERENCE_TABLES:
+            changed.add(table)
+            changed.update(_DEPENDENT_TABLES.get(table, ()))
+    if changed:
+        reference_cache.bump(*sorted(changed))
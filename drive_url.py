@@ -0,0 +1,74 @@
+# Google Drive 画像URLの正規化
+# 共有URLを GAS / X から直接取得できる形式（uc?export=view&id=...）に変換する
+
+import re
+from functools import lru_cache
+
+DRIVE_HOSTS = ('drive.google.com', 'docs.google.com', 'drive.usercontent.google.com')
+DIRECT_URL_TEMPLATE = "https://drive.google.com/uc?export=view&id={file_id}"
+
+_FILE_ID = r'([a-zA-Z0-9_-]{10,})'
+
+# ファイルIDを抽出するパターン（上から順に判定）
+_DRIVE_PATTERNS = [
+    # https://drive.google.com/file/d/FILE_ID/view?usp=sharing, /edit, /preview, 末尾なし
+    re.compile(r'^https?://(?:drive|docs)\.google\.com/file/d/' + _FILE_ID + r'(?:[/?#]|$)'),
+    # https://drive.google.com/open?id=FILE_ID
+    re.compile(r'^https?://(?:drive|docs)\.google\.com/open\?(?:.*&)?id=' + _FILE_ID),
+    # https://drive.google.com/uc?id=FILE_ID, uc?export=view&id=FILE_ID, uc?export=download&id=FILE_ID
+    re.compile(r'^https?://(?:drive|docs)\.google\.com/uc\?(?:.*&)?id=' + _FILE_ID),
+    # https://drive.usercontent.google.com/download?id=FILE_ID&export=view
+    re.compile(r'^https?://drive\.usercontent\.google\.com/(?:download|u/\d+/uc|uc)\?(?:.*&)?id=' + _FILE_ID),
+]
+_HTTP_URL = re.compile(r'^https?://[^\s/$.?#][^\s]*$', re.IGNORECASE)
+_HOST = re.compile(r'^https?://([^/?#:]+)', re.IGNORECASE)
+
+
+def _host(url):
+    match = _HOST.match(url)
+    return match.group(1).lower() if match else ''
+
+
+def is_drive_url(url):
+    """Google Drive のURLかどうか"""
+    return bool(url) and _host(url.strip()) in DRIVE_HOSTS
+
+
+@lru_cache(maxsize=1024)
+def extract_drive_file_id(url):
+    """Google Drive URLからファイルIDを取り出す（取り出せない場合は None）"""
+    if not url:
+        return None
+    url = url.strip()
+    for pattern in _DRIVE_PATTERNS:
+        match = pattern.match(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+@lru_cache(maxsize=1024)
+def normalize_drive_url(url):
+    """Google Drive共有URLを直接アクセス可能なURLに変換（Drive以外・変換不可はそのまま返す）"""
+    if not url or not is_drive_url(url):
+        return url
+    file_id = extract_drive_file_id(url)
+    if file_id:
+        return DIRECT_URL_TEMPLATE.format(file_id=file_id)
+    return url
+
+
+def validate_image_url(url):
+    """画像URLを入力時に検証する
+
+    Returns:
+        tuple: (有効True/無効False, エラーメッセージまたは空文字)
+    """
+    if not url or not url.strip():
+        return False, "URLが入力されていません"
+    url = url.strip()
+    if not _HTTP_URL.match(url):
+        return False, "http:// または https:// で始まるURLを入力してください"
+    if is_drive_url(url) and not extract_drive_file_id(url):
+        return False, "Google DriveのファイルURLではありません（フォルダURLなどは使用できません）。ファイルの共有リンクを指定してください"
+    return True, ""
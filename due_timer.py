@@ -0,0 +1,98 @@
+# 期限付きアイテムのタイマー（最小ヒープ）
+# 実行時刻をヒープで管理し、次の期限まで待機して期限が来たキーを通知する（ポーリング不要）
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DueTimer(threading.Thread):
+    """キーごとの実行時刻を管理し、期限が来たキーを on_due(keys) で通知するデーモンスレッド
+
+    schedule() による登録・再登録、cancel() による削除はヒープに古いエントリを残したまま
+    世代番号で無効化する（取り出し時に読み飛ばす）。
+    """
+
+    def __init__(self, on_due, name="due-timer"):
+        super().__init__(name=name, daemon=True)
+        self._on_due = on_due
+        self._heap = []  # (実行時刻, 世代番号, キー)
+        self._entries = {}  # キー → (実行時刻, 世代番号)
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def schedule(self, key, due_ts):
+        """キーを登録（既に登録済みなら実行時刻を置き換える）"""
+        with self._cond:
+            entry = (due_ts, next(self._counter))
+            self._entries[key] = entry
+            heapq.heappush(self._heap, (entry[0], entry[1], key))
+            if self._heap[0][2] == key:
+                self._cond.notify()
+
+    def cancel(self, key):
+        with self._cond:
+            self._entries.pop(key, None)
+
+    def replace_all(self, items):
+        """登録内容を (キー, 実行時刻) の一覧で置き換える（DBとの再同期用）"""
+        with self._cond:
+            self._entries = {}
+            self._heap = []
+            for key, due_ts in items:
+                entry = (due_ts, next(self._counter))
+                self._entries[key] = entry
+                self._heap.append((entry[0], entry[1], key))
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._entries)
+
+    def next_due(self):
+        """次の実行時刻（登録がなければ None）"""
+        with self._cond:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _discard_stale(self):
+        while self._heap and self._entries.get(self._heap[0][2]) != (self._heap[0][0], self._heap[0][1]):
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now):
+        due_keys = []
+        while self._heap and self._heap[0][0] <= now:
+            due_ts, seq, key = heapq.heappop(self._heap)
+            if self._entries.get(key) == (due_ts, seq):
+                del self._entries[key]
+                due_keys.append(key)
+        return due_keys
+
+    def run(self):
+        while True:
+            with self._cond:
+                due_keys = []
+                while not self._stopped:
+                    self._discard_stale()
+                    now = time.time()
+                    due_keys = self._pop_due(now)
+                    if due_keys:
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+                if self._stopped:
+                    return
+            try:
+                self._on_due(due_keys)
+            except Exception as e:
+                logger.exception(f"タイマー通知エラー: {e}")
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
@@ -0,0 +1,113 @@
+# Vertex AI / Gemini モデルのプロセス共通レジストリ
+# vertexai.init と GenerativeModel の生成をプロセスで1回だけ行い、全セッションで共有する
+# モデルは (プロジェクト, リージョン, モデル名, 認証情報) ごとにキャッシュし、モデルの切り替えでは再初期化しない
+
+import os
+import threading
+import time
+
+from lazy_imports import load_module
+
+ADC_FILE = os.path.expanduser("~/.config/gcloud/application_default_credentials.json")
+
+
+def adc_identity():
+    """Application Default Credentials の識別子（認証ファイルの更新で変わる）"""
+    try:
+        return f"adc:{os.path.getmtime(ADC_FILE)}"
+    except OSError:
+        return "adc"
+
+
+def service_account_identity(credentials_info):
+    """サービスアカウント情報の識別子"""
+    return f"sa:{credentials_info.get('client_email', '')}:{credentials_info.get('private_key_id', '')}"
+
+
+def model_display_name(model):
+    """GenerativeModel のモデル名（'projects/.../models/gemini-2.5-flash' → 'gemini-2.5-flash'）"""
+    name = getattr(model, '_model_name', None) or getattr(model, 'model_name', None) or 'unknown'
+    return str(name).rsplit('/', 1)[-1]
+
+
+class GeminiModelRegistry:
+    """vertexai.init の状態と GenerativeModel をプロセス内で共有する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._init_key = None  # (プロジェクト, リージョン, 認証情報の識別子)
+        self._models = {}  # (プロジェクト, リージョン, モデル名, 認証情報の識別子) → GenerativeModel
+        self._timings = {}  # 初期化・モデル生成の所要秒数
+        self._model_class = None
+        self.api_version = None
+
+    def _get_model_class(self):
+        if self._model_class is None:
+            try:
+                # 新しいVertex AI SDK を試す
+                self._model_class = load_module("vertexai.generative_models").GenerativeModel
+                self.api_version = "stable"
+            except ImportError:
+                # フォールバック: 古いAPI
+                self._model_class = load_module("vertexai.preview.generative_models").GenerativeModel
+                self.api_version = "preview"
+        return self._model_class
+
+    def init(self, project, location, credentials=None, credentials_id=None):
+        """vertexai.init を実行（同じ設定で初期化済みの場合は何もしない）
+
+        Returns:
+            bool: 今回初期化した場合 True
+        """
+        key = (project, location, credentials_id or adc_identity())
+        with self._lock:
+            if self._init_key == key:
+                return False
+            started = time.perf_counter()
+            load_module("vertexai").init(project=project, location=location, credentials=credentials)
+            self._timings['vertexai.init'] = time.perf_counter() - started
+            self._init_key = key
+            return True
+
+    def is_initialized(self):
+        return self._init_key is not None
+
+    def get_model(self, model_name):
+        """初期化済みの設定でモデルを取得（未生成なら生成してキャッシュ）"""
+        with self._lock:
+            if self._init_key is None:
+                raise RuntimeError("Vertex AI が初期化されていません")
+            key = self._init_key[:2] + (model_name,) + self._init_key[2:]
+            model = self._models.get(key)
+            if model is None:
+                started = time.perf_counter()
+                model = self._get_model_class()(model_name)
+                self._timings[f"model:{model_name}"] = time.perf_counter() - started
+                self._models[key] = model
+            return model
+
+    def evict(self, model_name):
+        """指定モデルのキャッシュを破棄（次回取得時に再生成）"""
+        with self._lock:
+            for key in [key for key in self._models if key[2] == model_name]:
+                del self._models[key]
+
+    def reset(self):
+        """認証情報の変更時に初期化状態とモデルをすべて破棄"""
+        with self._lock:
+            self._init_key = None
+            self._models.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'initialized': self._init_key is not None,
+                'project': self._init_key[0] if self._init_key else None,
+                'location': self._init_key[1] if self._init_key else None,
+                'models': sorted({key[2] for key in self._models}),
+                'timings': dict(self._timings),
+            }
+
+
+# グローバルインスタンス
+gemini_models = GeminiModelRegistry()
@@ -0,0 +1,227 @@
+# Gemini のトークン使用量・コスト台帳
+# safe_generate_content の呼び出しごとに usage_metadata のトークン数・モデル・キャスト・ページ・所要時間を
+# generation_usage に記録し、日別の集計（generation_usage_daily）を同じトランザクションで更新する
+# 月間予算に近づいたバッチ生成は間隔を空け、予算に達したバッチ生成は止める
+
+import datetime
+import sqlite3
+
+JST = datetime.timezone(datetime.timedelta(hours=9))
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Vertex AI の料金（USD / 100万トークン、入力, 出力）。モデル名の前方一致で最も長いものを使う
+MODEL_PRICING_USD_PER_1M = {
+    'gemini-2.5-pro': (1.25, 10.00),
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.0-flash': (0.15, 0.60),
+    'gemini-1.5-pro': (1.25, 5.00),
+    'gemini-1.5-flash': (0.075, 0.30),
+}
+DEFAULT_PRICING_MODEL = 'gemini-2.5-flash'  # 料金表にないモデル（カスタム入力など）
+
+BUDGET_THROTTLE_SECONDS = 10  # 予算の警告ラインを超えたバッチ生成で、1件ごとに追加で待つ秒数
+
+USAGE_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS generation_usage (
+        id INTEGER PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        model TEXT NOT NULL,
+        cast_id INTEGER,
+        page TEXT,
+        outcome TEXT NOT NULL,  -- 'success', 'rate_limited', 'error'
+        prompt_tokens INTEGER DEFAULT 0,
+        response_tokens INTEGER DEFAULT 0,
+        total_tokens INTEGER DEFAULT 0,
+        latency_ms REAL,
+        cost_usd REAL DEFAULT 0
+    )
+"""
+USAGE_INDEX_QUERY = "CREATE INDEX IF NOT EXISTS idx_generation_usage_created_at ON generation_usage(created_at)"
+DAILY_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS generation_usage_daily (
+        day TEXT NOT NULL,
+        model TEXT NOT NULL,
+        cast_id INTEGER NOT NULL DEFAULT 0,  -- キャスト指定なしは 0
+        requests INTEGER DEFAULT 0,
+        errors INTEGER DEFAULT 0,
+        prompt_tokens INTEGER DEFAULT 0,
+        response_tokens INTEGER DEFAULT 0,
+        latency_ms REAL DEFAULT 0,
+        cost_usd REAL DEFAULT 0,
+        PRIMARY KEY (day, model, cast_id)
+    )
+"""
+
+
+class GenerationBudgetExceeded(Exception):
+    """月間予算に達したためバッチ生成を止める"""
+
+
+def _now():
+    return datetime.datetime.now(JST)
+
+
+def month_start(now=None):
+    now = now or _now()
+    return now.strftime('%Y-%m-01')
+
+
+def model_pricing(model_name):
+    """モデル名に対応する (入力, 出力) の USD / 100万トークン"""
+    matches = [name for name in MODEL_PRICING_USD_PER_1M if model_name.startswith(name)]
+    return MODEL_PRICING_USD_PER_1M[max(matches, key=len) if matches else DEFAULT_PRICING_MODEL]
+
+
+def estimate_cost(model_name, prompt_tokens, response_tokens):
+    input_price, output_price = model_pricing(model_name)
+    return (prompt_tokens * input_price + response_tokens * output_price) / 1_000_000
+
+
+def usage_tokens(usage_metadata):
+    """usage_metadata から (入力トークン数, 出力トークン数)
+
+    出力には思考トークン（thoughts_token_count、gemini-2.5 で出力単価で課金）を含める
+    """
+    if usage_metadata is None:
+        return 0, 0
+    return (getattr(usage_metadata, 'prompt_token_count', 0) or 0,
+            (getattr(usage_metadata, 'candidates_token_count', 0) or 0)
+            + (getattr(usage_metadata, 'thoughts_token_count', 0) or 0))
+
+
+class GenerationUsageLedger:
+    """generation_usage / generation_usage_daily テーブルへのアクセスをまとめたクラス"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def ensure_schema(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(USAGE_TABLE_QUERY)
+                conn.execute(USAGE_INDEX_QUERY)
+                conn.execute(DAILY_TABLE_QUERY)
+        finally:
+            conn.close()
+
+    def record(self, model_name, outcome, usage_metadata=None, cast_id=None, page=None, latency_ms=None):
+        """生成1回分を記録し、日別集計を更新（1トランザクション）
+
+        Returns:
+            float: 推定コスト（USD）
+        """
+        prompt_tokens, response_tokens = usage_tokens(usage_metadata)
+        cost = estimate_cost(model_name, prompt_tokens, response_tokens)
+        now = _now()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("""
+                    INSERT INTO generation_usage
+                    (created_at, model, cast_id, page, outcome, prompt_tokens, response_tokens, total_tokens, latency_ms, cost_usd)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (now.strftime(TIME_FORMAT), model_name, cast_id, page, outcome,
+                      prompt_tokens, response_tokens, prompt_tokens + response_tokens, latency_ms, cost))
+                conn.execute("""
+                    INSERT INTO generation_usage_daily
+                    (day, model, cast_id, requests, errors, prompt_tokens, response_tokens, latency_ms, cost_usd)
+                    VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)
+                    ON CONFLICT(day, model, cast_id) DO UPDATE SET
+                        requests = requests + 1,
+                        errors = errors + excluded.errors,
+                        prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                        response_tokens = response_tokens + excluded.response_tokens,
+                        latency_ms = latency_ms + excluded.latency_ms,
+                        cost_usd = cost_usd + excluded.cost_usd
+                """, (now.strftime('%Y-%m-%d'), model_name, cast_id or 0, 0 if outcome == 'success' else 1,
+                      prompt_tokens, response_tokens, latency_ms or 0, cost))
+        finally:
+            conn.close()
+        return cost
+
+    def monthly_cost(self, now=None):
+        """今月の推定コスト（USD）"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT COALESCE(SUM(cost_usd), 0) FROM generation_usage_daily WHERE day >= ?", (month_start(now),)
+            ).fetchone()
+            return row[0]
+        except sqlite3.OperationalError:
+            return 0.0  # テーブル未作成
+        finally:
+            conn.close()
+
+    def daily_rollups(self, days=30):
+        """日別の集計（新しい日から、全モデル・全キャストの合計）"""
+        since = (_now() - datetime.timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT day, SUM(requests) as requests, SUM(errors) as errors,
+                       SUM(prompt_tokens) as prompt_tokens, SUM(response_tokens) as response_tokens,
+                       SUM(latency_ms) / SUM(requests) as avg_latency_ms, SUM(cost_usd) as cost_usd
+                FROM generation_usage_daily
+                WHERE day >= ?
+                GROUP BY day
+                ORDER BY day DESC
+            """, (since,)).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def cost_per_approved_post(self, since=None):
+        """キャスト別の推定コストと承認済み投稿数（since 以降に生成された投稿・使用量）
+
+        Returns:
+            list: {'cast_id', 'name', 'requests', 'cost_usd', 'approved_posts', 'cost_per_approved_usd'}
+        """
+        since = since or month_start()
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT c.id as cast_id, c.name, COALESCE(u.requests, 0) as requests, COALESCE(u.cost_usd, 0) as cost_usd,
+                       COALESCE(p.approved_posts, 0) as approved_posts
+                FROM casts c
+                LEFT JOIN (
+                    SELECT cast_id, SUM(requests) as requests, SUM(cost_usd) as cost_usd
+                    FROM generation_usage_daily WHERE day >= ? GROUP BY cast_id
+                ) u ON u.cast_id = c.id
+                LEFT JOIN (
+                    SELECT cast_id, COUNT(*) as approved_posts
+                    FROM posts
+                    WHERE status = 'approved' AND COALESCE(generated_at, created_at) >= ?
+                    GROUP BY cast_id
+                ) p ON p.cast_id = c.id
+                WHERE u.requests IS NOT NULL OR p.approved_posts IS NOT NULL
+                ORDER BY cost_usd DESC
+            """, (since, since)).fetchall()
+        finally:
+            conn.close()
+        report = []
+        for row in rows:
+            item = dict(row)
+            item['cost_per_approved_usd'] = item['cost_usd'] / item['approved_posts'] if item['approved_posts'] else None
+            report.append(item)
+        return report
+
+    def budget_state(self, monthly_budget_usd, throttle_ratio=0.8):
+        """月間予算に対する状態
+
+        Returns:
+            tuple: ('ok' / 'throttle' / 'block', 今月の推定コスト)。予算 0 以下は無制限
+        """
+        spent = self.monthly_cost()
+        if monthly_budget_usd <= 0:
+            return 'ok', spent
+        if spent >= monthly_budget_usd:
+            return 'block', spent
+        if spent >= monthly_budget_usd * throttle_ratio:
+            return 'throttle', spent
+        return 'ok', spent
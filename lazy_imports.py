@@ -0,0 +1,51 @@
+# 重いSDKの遅延インポート
+# vertexai / gspread / pandas / tweepy などを最初に使われた時点でインポートし、
+# ログイン画面の表示（Streamlit Cloud のコールドスタート）を待たせないようにする
+
+import importlib
+import sys
+import threading
+import time
+
+_import_lock = threading.Lock()
+import_timings = {}  # モジュール名 → 初回インポートの所要秒数
+
+
+def load_module(module_name):
+    """モジュールをインポート（初回は所要時間を記録）"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    with _import_lock:
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        import_timings.setdefault(module_name, time.perf_counter() - started)
+    return module
+
+
+class LazyModule:
+    """最初の属性アクセスでインポートされるモジュールの代理オブジェクト"""
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._module = None
+
+    def _resolve(self):
+        if self._module is None:
+            self._module = load_module(self._module_name)
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._module_name} ({state})>"
+
+
+def lazy_import(module_name):
+    return LazyModule(module_name)
+
+
+def is_loaded(module_name):
+    return module_name in sys.modules
@@ -0,0 +1,197 @@
+# X 投稿用メディアの前処理
+# アップロード前にローカルで検証し、X の制限に収まるよう画像を縮小・再エンコードする
+# 縮小した画像は PREPARED_DIR に一時保存し、アップロード後に discard_prepared で削除する
+
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+from lazy_imports import load_module
+
+# X (Twitter) のメディア制限
+MAX_IMAGE_BYTES = 5 * 1024 * 1024      # 静止画 5MB
+MAX_GIF_BYTES = 15 * 1024 * 1024       # GIF 15MB
+MAX_VIDEO_BYTES = 512 * 1024 * 1024    # 動画 512MB
+MAX_IMAGE_SIDE = 4096                  # 長辺の上限（これを超える場合は縮小）
+MAX_MEDIA_PER_TWEET = 4
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+GIF_EXTENSIONS = ('.gif',)
+VIDEO_EXTENSIONS = ('.mp4',)
+ALLOWED_EXTENSIONS = IMAGE_EXTENSIONS + GIF_EXTENSIONS + VIDEO_EXTENSIONS
+
+PREPARED_DIR = os.path.join("temp_images", "prepared")
+PREPARED_MAX_AGE_SECONDS = 24 * 60 * 60  # これより古い縮小済みファイルは起動時に削除（異常終了時の取り残し）
+
+
+def _load_pil_image():
+    """Pillow の Image モジュールを最初に使う時点で読み込む（未インストールの場合は None）"""
+    try:
+        return load_module("PIL.Image")
+    except ImportError:
+        return None
+
+
+def content_hash(data):
+    """メディア内容のハッシュ（再アップロード防止のキャッシュキー）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _size_limit(ext):
+    if ext in GIF_EXTENSIONS:
+        return MAX_GIF_BYTES
+    if ext in VIDEO_EXTENSIONS:
+        return MAX_VIDEO_BYTES
+    return MAX_IMAGE_BYTES
+
+
+def _inspect(filename, data):
+    """検証結果を (有効か, メッセージ, 縮小が必要か) で返す"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        return False, f"対応していないファイル形式: {ext or '不明'}", False
+
+    limit = _size_limit(ext)
+    Image = _load_pil_image() if ext in IMAGE_EXTENSIONS else None
+    if Image is None:
+        # GIF・動画は再エンコードしない（PIL がない環境では静止画も同様）
+        if len(data) > limit:
+            return False, f"ファイルサイズが{limit // (1024 * 1024)}MBを超えています: {len(data) / (1024 * 1024):.1f}MB", False
+        return True, "OK", False
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+    except Exception as e:
+        return False, f"画像を読み込めません: {str(e)}", False
+
+    if len(data) > limit or max(width, height) > MAX_IMAGE_SIDE:
+        return True, f"X の制限に合わせて自動縮小されます（{width}x{height}, {len(data) / (1024 * 1024):.1f}MB）", True
+    return True, "OK", False
+
+
+def inspect_media(filename, data):
+    """ファイル名と内容からメディアを検証する（UIでの事前チェック用）
+
+    Returns:
+        tuple: (有効True/無効False, メッセージ)
+    """
+    valid, message, _ = _inspect(filename, data)
+    return valid, message
+
+
+def _encode_image(img, fmt, quality=None):
+    buffer = io.BytesIO()
+    params = {'optimize': True}
+    if quality is not None:
+        params['quality'] = quality
+    img.save(buffer, format=fmt, **params)
+    return buffer.getvalue()
+
+
+def _shrink_image(data):
+    """画像を MAX_IMAGE_SIDE / MAX_IMAGE_BYTES に収まるよう縮小・再エンコードする
+
+    Returns:
+        tuple: (バイト列, 拡張子)
+    """
+    Image = load_module("PIL.Image")
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        if max(img.size) > MAX_IMAGE_SIDE:
+            img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.LANCZOS)
+
+        # 透過画像はまずPNGのまま試す
+        if has_alpha:
+            encoded = _encode_image(img, 'PNG')
+            if len(encoded) <= MAX_IMAGE_BYTES:
+                return encoded, '.png'
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img.convert('RGBA'), mask=img.convert('RGBA').split()[-1])
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        # JPEG品質と解像度を段階的に落としてサイズに収める
+        while True:
+            for quality in (90, 80, 70, 60):
+                encoded = _encode_image(img, 'JPEG', quality)
+                if len(encoded) <= MAX_IMAGE_BYTES:
+                    return encoded, '.jpg'
+            img = img.resize((max(1, int(img.width * 0.75)), max(1, int(img.height * 0.75))), Image.LANCZOS)
+
+
+def file_hash(media_path):
+    """ファイル内容のハッシュを取得（ファイルがない場合は None）"""
+    if not os.path.exists(media_path):
+        return None
+    with open(media_path, 'rb') as f:
+        return content_hash(f.read())
+
+
+def prepare_media(media_path):
+    """アップロード用にメディアを検証・変換する
+
+    Returns:
+        tuple: (アップロードするファイルパス, メッセージ)。失敗時はパスが None
+    """
+    if not os.path.exists(media_path):
+        return None, f"ファイルが見つかりません: {media_path}"
+
+    with open(media_path, 'rb') as f:
+        data = f.read()
+
+    valid, message, needs_shrink = _inspect(media_path, data)
+    if not valid:
+        return None, message
+    if not needs_shrink:
+        return media_path, "OK"
+
+    try:
+        shrunk, new_ext = _shrink_image(data)
+    except Exception as e:
+        return None, f"画像の縮小に失敗しました: {str(e)}"
+
+    # 同じ画像を複数アカウントで同時にアップロードしても、他の呼び出しのファイルを削除しないよう呼び出しごとに作成
+    os.makedirs(PREPARED_DIR, exist_ok=True)
+    fd, prepared_path = tempfile.mkstemp(suffix=new_ext, prefix=f"{content_hash(shrunk)[:16]}_", dir=PREPARED_DIR)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(shrunk)
+    return prepared_path, f"縮小済み: {len(data) / (1024 * 1024):.1f}MB → {len(shrunk) / (1024 * 1024):.1f}MB"
+
+
+def discard_prepared(upload_path):
+    """prepare_media が作成した縮小済みファイルを削除する（元のファイルはそのまま）"""
+    if os.path.dirname(os.path.abspath(upload_path)) != os.path.abspath(PREPARED_DIR):
+        return
+    try:
+        os.remove(upload_path)
+    except OSError:
+        pass
+
+
+def prune_prepared_media(max_age_seconds=PREPARED_MAX_AGE_SECONDS):
+    """古い縮小済みファイルを削除する
+
+    Returns:
+        int: 削除したファイル数
+    """
+    try:
+        entries = list(os.scandir(PREPARED_DIR))
+    except OSError:
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
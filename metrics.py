@@ -0,0 +1,340 @@
+# Prometheus / OpenMetrics 互換のメトリクス
+# 生成リクエスト・トークン数・429、送信先別の送信結果、DBクエリの所要時間、リツイート予約の実行遅延を
+# テキスト形式（text/plain; version=0.0.4）で公開する。外部ライブラリは使わない。
+# 公開用の HTTP サーバーは run.py（--metrics-port）・retweet_scheduler.py（--metrics-port）から有効にする
+
+import datetime
+import functools
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from perf_timing import LATENCY_BUCKETS_MS, perf
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = tuple(ms / 1000 for ms in LATENCY_BUCKETS_MS)  # 秒
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 21600)  # 秒
+
+JST = datetime.timezone(datetime.timedelta(hours=9))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # ラベル値のタプル → 値
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ラベルは {self.labelnames} を指定してください（指定: {tuple(labels)}）")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError(f"{self.name}: カウンターは減らせません")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, upper in enumerate(self.buckets):
+                if value <= upper:
+                    state['buckets'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state['count'] if state else 0
+
+    def _samples(self):
+        lines = []
+        for key, state in sorted(self._values.items()):
+            for upper, bucket_count in zip(self.buckets, state['buckets']):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(upper))])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {state['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """メトリクスの登録とテキスト形式への出力"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collect_hooks = {}  # 名前 → 出力直前に呼び出す関数（DBから値を読むゲージ用）
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collect_hook(self, name, hook):
+        with self._lock:
+            self._collect_hooks[name] = hook
+
+    def render(self):
+        with self._lock:
+            hooks = list(self._collect_hooks.values())
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f"⚠️ メトリクス収集エラー: {e}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# グローバルインスタンス
+metrics = MetricsRegistry()
+
+generation_requests = metrics.counter(
+    "aicast_generation_requests_total", "Gemini generate_content calls by outcome (success / rate_limited / error)",
+    ("model", "outcome"))
+generation_tokens = metrics.counter(
+    "aicast_generation_tokens_total", "Gemini tokens reported in usage_metadata", ("model", "kind"))
+send_attempts = metrics.counter(
+    "aicast_send_attempts_total", "Send attempts by destination and outcome", ("destination", "outcome"))
+db_query_seconds = metrics.histogram(
+    "aicast_db_query_duration_seconds", "SQLite query latency", ("operation",))
+external_call_seconds = metrics.histogram(
+    "aicast_external_call_duration_seconds", "Gemini / HTTP call latency", ("operation", "category"))
+retweet_lag_seconds = metrics.histogram(
+    "aicast_retweet_schedule_lag_seconds", "Delay between scheduled_at and execution start of retweet_schedules",
+    buckets=LAG_BUCKETS)
+retweet_schedules = metrics.gauge(
+    "aicast_retweet_schedules", "retweet_schedules rows by status", ("status",))
+retweet_overdue_seconds = metrics.gauge(
+    "aicast_retweet_schedule_overdue_seconds", "Age of the oldest scheduled retweet past its scheduled_at (0 if none)")
+
+
+def is_rate_limit_error(error):
+    message = str(error)
+    return "429" in message or "Quota exceeded" in message
+
+
+def record_generation(model_name, outcome, usage_metadata=None):
+    """生成リクエストの結果とトークン数（usage_metadata）を記録"""
+    generation_requests.inc(model=model_name, outcome=outcome)
+    if usage_metadata is None:
+        return
+    # 出力には思考トークン（thoughts_token_count）を含める（出力単価で課金されるため）
+    for kind, attributes in (('prompt', ('prompt_token_count',)),
+                             ('response', ('candidates_token_count', 'thoughts_token_count'))):
+        tokens = sum(getattr(usage_metadata, attribute, None) or 0 for attribute in attributes)
+        if tokens:
+            generation_tokens.inc(tokens, model=model_name, kind=kind)
+
+
+def record_send(destination, success):
+    send_attempts.inc(destination=destination, outcome="success" if success else "failure")
+
+
+def counted_send(destination):
+    """(成功, メッセージ) を返す送信関数の結果を送信先別に数えるデコレーター"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                send_attempts.inc(destination=destination, outcome="error")
+                raise
+            record_send(destination, bool(result[0]))
+            return result
+        return wrapper
+    return decorator
+
+
+def observe_retweet_lag(scheduled_at):
+    """予約時刻（JST の '%Y-%m-%d %H:%M:%S'）から実行開始までの遅延を記録"""
+    try:
+        scheduled_ts = datetime.datetime.strptime(scheduled_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=JST).timestamp()
+    except (TypeError, ValueError):
+        return
+    retweet_lag_seconds.observe(max(0.0, time.time() - scheduled_ts))
+
+
+def _observe_operation(operation, category, page, elapsed_seconds, succeeded):
+    if category == "db":
+        db_query_seconds.observe(elapsed_seconds, operation=operation)
+    else:
+        external_call_seconds.observe(elapsed_seconds, operation=operation, category=category)
+
+
+def collect_retweet_schedules(db_path):
+    """retweet_schedules の状態別件数と、最も古い期限切れ予約の経過秒数を更新"""
+    now_str = datetime.datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) FROM retweet_schedules GROUP BY status").fetchall()
+        oldest = conn.execute(
+            "SELECT MIN(scheduled_at) FROM retweet_schedules WHERE status = 'scheduled' AND scheduled_at <= ?",
+            (now_str,)
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        return  # テーブル未作成
+    finally:
+        conn.close()
+    retweet_schedules.clear()
+    for status, count in rows:
+        retweet_schedules.set(count, status=status or "unknown")
+    overdue = 0.0
+    if oldest:
+        oldest_ts = datetime.datetime.strptime(oldest, '%Y-%m-%d %H:%M:%S').replace(tzinfo=JST).timestamp()
+        overdue = max(0.0, time.time() - oldest_ts)
+    retweet_overdue_seconds.set(overdue)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = metrics
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # スクレイプごとのアクセスログは出さない
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, db_path=None, host="0.0.0.0"):
+    """/metrics を返す HTTP サーバーをデーモンスレッドで起動（プロセスで1回のみ）
+
+    db_path を指定すると retweet_schedules の件数・期限切れ経過秒数をスクレイプ時に読み込む。
+    ポートが使用中の場合は None を返す。
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            print(f"⚠️ メトリクスサーバーを起動できません（ポート {port}）: {e}")
+            return None
+        perf.add_listener(_observe_operation)
+        if db_path:
+            metrics.add_collect_hook("retweet_schedules", lambda: collect_retweet_schedules(db_path))
+        _server = server
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"📈 メトリクスを公開しました: http://{host}:{_server.server_address[1]}/metrics")
+        return _server
+
+
+def stop_metrics_server():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+AIcast room オフラインベンチマーク
+
+外部サービス（Vertex AI / Google Sheets / Cloud Functions・GAS / X API）をローカルのフェイクに置き換え、
+データベースのコピーに対して代表的な処理を実行してスループットと所要時間（p50 / p90 / p99）を表示する。
+元のデータベースは変更しない。
+
+シナリオ:
+    generate   投稿案を100件生成（post_generation.safe_generate_content + フェイク Gemini、429 はアプリと同じく段階的に待って再試行）
+    send       承認済み投稿200件をアウトボックス経由で一括送信（post_senders の送信処理 + フェイク gspread + ローカル Cloud Functions）
+    gas        リツイート予約200件を GAS Web App に直接送信（post_senders.send_retweet_to_gas_direct + ローカル /gas）
+    retweet    リツイート予約500件をスケジューラーで実行（ローカル Cloud Functions）
+    x_batch    X API の一括リツイート500件（フェイク tweepy Client）
+    dashboard  キャスト500名のダッシュボード集計
+
+使い方:
+    python3 offline_benchmark.py
+    python3 offline_benchmark.py --scenario generate --scenario send --latency-ms 20
+    python3 offline_benchmark.py --save benchmark_baseline.json
+    python3 offline_benchmark.py --compare benchmark_baseline.json   # 劣化があれば終了コード 1
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import post_generation
+import post_senders
+from benchmark_fakes import FakeGenerativeModel, FakeGspread, FakeTweepyClient, LocalEndpointServer
+from config import Config
+from data_cache import sheets_config_cache
+from generation_usage import GenerationBudgetExceeded, GenerationUsageLedger
+from metrics import is_rate_limit_error
+from post_senders import PostSender
+from retweet_scheduler import RetweetScheduler
+from schedule_lease import ensure_lease_columns
+from send_outbox import OutboxDispatcher, SendOutbox
+from x_api_poster import XTwitterPoster
+
+JST = datetime.timezone(datetime.timedelta(hours=9))
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCENARIOS = ["generate", "send", "gas", "retweet", "x_batch", "dashboard"]
+DEFAULT_COUNTS = {"generate": 100, "send": 200, "gas": 200, "retweet": 500, "x_batch": 500, "dashboard": 500}
+
+GENERATION_MAX_RETRIES = 3  # app.py の自動生成と同じ再試行回数
+DEFAULT_TOLERANCE = 0.2
+BENCHMARK_SHEETS_CREDS = object()  # 一括送信と同じく解決済みの認証情報として渡す（フェイク gspread は中身を見ない）
+
+# GAS Web App の送信先設定（コピー元のデータベースにテーブルがない場合に作成）
+CAST_ACTION_SHEETS_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS cast_action_sheets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cast_id INTEGER NOT NULL,
+        action_type TEXT NOT NULL,
+        spreadsheet_id TEXT NOT NULL,
+        sheet_name TEXT NOT NULL,
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        gas_web_app_url TEXT,
+        FOREIGN KEY (cast_id) REFERENCES casts (id) ON DELETE CASCADE,
+        UNIQUE(cast_id, action_type)
+    )
+"""
+
+# ダッシュボードのキャスト別集計（app.py の「📊 ダッシュボード」と同じクエリ）
+DASHBOARD_TOTAL_QUERIES = [
+    "SELECT COUNT(*) as count FROM casts",
+    "SELECT COUNT(*) as count FROM posts",
+    "SELECT COUNT(*) as count FROM posts WHERE DATE(generated_at) = DATE('now')",
+    "SELECT COUNT(*) as count FROM posts WHERE sent_status = 'sent'",
+]
+DASHBOARD_CAST_QUERIES = [
+    "SELECT COUNT(*) as count FROM posts WHERE cast_id = ? AND status = 'draft'",
+    "SELECT COUNT(*) as count FROM posts WHERE cast_id = ? AND status = 'approved' AND (sent_status = 'not_sent' OR sent_status = 'scheduled' OR sent_status IS NULL)",
+    "SELECT COUNT(*) as count FROM posts WHERE cast_id = ? AND sent_status = 'sent'",
+    "SELECT COUNT(*) as count FROM posts WHERE cast_id = ? AND status = 'rejected'",
+]
+
+
+def now_jst_str():
+    return datetime.datetime.now(JST).strftime(TIME_FORMAT)
+
+
+def percentile(sorted_samples, q):
+    """最近傍順位法による分位点"""
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, int(round(q * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(name, samples, elapsed, errors=0, extra=None):
+    """シナリオの結果（所要時間はミリ秒、スループットは件/秒）"""
+    ordered = sorted(samples)
+    return {
+        'scenario': name,
+        'count': len(samples),
+        'errors': errors,
+        'elapsed_seconds': elapsed,
+        'throughput': len(samples) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p90_ms': percentile(ordered, 0.90) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': (ordered[-1] if ordered else 0.0) * 1000,
+        'extra': extra or {},
+    }
+
+
+# --- ベンチマーク用データベース ---
+
+def prepare_database(source_path, work_dir):
+    """元のデータベースを作業ディレクトリにコピーし、アプリが追加するテーブル・列を反映する"""
+    db_path = os.path.join(work_dir, "benchmark.db")
+    shutil.copyfile(source_path, db_path)
+    SendOutbox(db_path).ensure_schema()
+    GenerationUsageLedger(db_path).ensure_schema()
+    ensure_lease_columns(db_path)
+    sheets_config_cache.clear()  # 前のシナリオのコピーから読み込んだ送信先設定を使わない
+    return db_path
+
+
+def ensure_casts(db_path, count):
+    """キャストが count 名に満たない場合はベンチマーク用のキャストを追加し、先頭から count 名のIDを返す"""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            existing = conn.execute("SELECT COUNT(*) FROM casts").fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO casts (name, nickname) VALUES (?, ?)",
+                [(f"bench_cast_{index:05d}", f"ベンチ{index}") for index in range(existing, count)]
+            )
+        return [row[0] for row in conn.execute("SELECT id FROM casts ORDER BY id LIMIT ?", (count,))]
+    finally:
+        conn.close()
+
+
+def cast_names(db_path, cast_ids):
+    """キャストID → 名前"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT id, name FROM casts WHERE id IN ({','.join('?' * len(cast_ids))})", cast_ids)
+        return dict(rows.fetchall())
+    finally:
+        conn.close()
+
+
+def ensure_gas_config(db_path, cast_ids, gas_web_app_url):
+    """リツイート用の送信先設定を GAS Web App（ローカルサーバー）に向ける"""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute(CAST_ACTION_SHEETS_TABLE_QUERY)
+            conn.executemany("""
+                INSERT INTO cast_action_sheets (cast_id, action_type, spreadsheet_id, sheet_name, gas_web_app_url, is_active)
+                VALUES (?, 'retweet', 'benchmark', 'retweet', ?, 1)
+                ON CONFLICT(cast_id, action_type) DO UPDATE SET gas_web_app_url = excluded.gas_web_app_url, is_active = 1
+            """, [(cast_id, gas_web_app_url) for cast_id in cast_ids])
+    finally:
+        conn.close()
+
+
+def ensure_x_credentials(db_path, cast_ids):
+    """X API の認証情報がないキャストにダミーの認証情報を登録（フェイク Client・ローカルサーバー用）"""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.executemany("""
+                INSERT OR IGNORE INTO cast_x_credentials
+                (cast_id, api_key, api_secret, bearer_token, access_token, access_token_secret,
+                 twitter_username, twitter_user_id, is_active)
+                VALUES (?, 'bench', 'bench', 'bench', ?, 'bench', ?, ?, 1)
+            """, [(cast_id, f"bench-{cast_id}", f"bench_{cast_id}", str(cast_id)) for cast_id in cast_ids])
+            conn.execute(
+                f"UPDATE cast_x_credentials SET is_active = 1 WHERE cast_id IN ({','.join('?' * len(cast_ids))})", cast_ids
+            )
+    finally:
+        conn.close()
+
+
+def seed_posts(db_path, cast_ids, per_cast):
+    """ダッシュボード用に状態の異なる投稿を追加"""
+    statuses = [('draft', 'not_sent'), ('approved', 'not_sent'), ('approved', 'sent'), ('rejected', 'not_sent')]
+    now_str = now_jst_str()
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO posts (cast_id, created_at, content, theme, status, sent_status, generated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(cast_id, now_str, f"ベンチマーク投稿 {cast_id}-{index}", "benchmark", *statuses[index % len(statuses)], now_str)
+                 for cast_id in cast_ids for index in range(per_cast)]
+            )
+    finally:
+        conn.close()
+
+
+# --- シナリオ ---
+
+def run_generate(db_path, count, options):
+    """投稿案の生成（app.py の自動生成と同じく safe_generate_content で生成 → posts に保存。待機時間は短縮）"""
+    model = FakeGenerativeModel(latency=options.latency, rate_limit_ratio=options.rate_limit_ratio, seed=options.seed)
+    cast_ids = ensure_casts(db_path, 1)
+    samples, errors, rate_limited, budget_stopped = [], 0, 0, False
+    conn = sqlite3.connect(db_path)
+    rate_limit_pause = post_generation.RATE_LIMIT_PAUSE_SECONDS
+    post_generation.RATE_LIMIT_PAUSE_SECONDS = options.retry_delay
+    started = time.perf_counter()
+    try:
+        for index in range(count):
+            cast_id = cast_ids[index % len(cast_ids)]
+            prompt = f"# ペルソナ\nベンチマーク\n\n# シチュエーション\n{index}\n\n# ルール\nSNS投稿を**140文字以内**で生成。"
+            item_started = time.perf_counter()
+            for retry in range(GENERATION_MAX_RETRIES):
+                try:
+                    response = post_generation.safe_generate_content(
+                        model, prompt, db_path, delay_seconds=options.generate_delay, cast_id=cast_id, batch=True,
+                        budget_usd=options.budget_usd, page="benchmark"
+                    )
+                except GenerationBudgetExceeded:
+                    budget_stopped = True
+                    break
+                except Exception as e:
+                    if is_rate_limit_error(e):
+                        rate_limited += 1
+                        if retry < GENERATION_MAX_RETRIES - 1:
+                            time.sleep(options.retry_delay * (retry + 1))
+                            continue
+                    errors += 1
+                    break
+                with conn:
+                    conn.execute(
+                        "INSERT INTO posts (cast_id, created_at, content, theme, generated_at) VALUES (?, ?, ?, ?, ?)",
+                        (cast_id, now_jst_str(), response.text, "benchmark", now_jst_str())
+                    )
+                break
+            samples.append(time.perf_counter() - item_started)
+            if budget_stopped:
+                break
+    finally:
+        post_generation.RATE_LIMIT_PAUSE_SECONDS = rate_limit_pause
+        conn.close()
+    return summarize("generate", samples, time.perf_counter() - started, errors,
+                     {'rate_limited': rate_limited, 'budget_stopped': budget_stopped})
+
+
+def run_send(db_path, count, options, server):
+    """承認済み投稿の一括送信（アウトボックスに積み、ディスパッチャーが PostSender.send_post_to_destination で送信）"""
+    cast_ids = ensure_casts(db_path, 10)
+    ensure_x_credentials(db_path, cast_ids)
+    names = cast_names(db_path, cast_ids)
+    destinations = ["google_sheets", "x_api", "both"]
+    now_str = now_jst_str()
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            post_ids = []
+            for index in range(count):
+                cursor = conn.execute(
+                    "INSERT INTO posts (cast_id, created_at, content, theme, status, generated_at) VALUES (?, ?, ?, ?, 'approved', ?)",
+                    (cast_ids[index % len(cast_ids)], now_str, f"ベンチマーク送信 {index}", "benchmark", now_str)
+                )
+                post_ids.append(cursor.lastrowid)
+    finally:
+        conn.close()
+    jobs = [{
+        'post_id': post_id,
+        'cast_id': cast_ids[index % len(cast_ids)],
+        'cast_name': names[cast_ids[index % len(cast_ids)]],
+        'content': f"ベンチマーク送信 {index}",
+        'scheduled_datetime': now_str,
+        'destination': destinations[index % len(destinations)],
+    } for index, post_id in enumerate(post_ids)]
+
+    sender = PostSender(db_path, function_url=server.url("x-poster"))
+    send_post = functools.partial(sender.send_post_to_destination, sheets_creds=BENCHMARK_SHEETS_CREDS)
+    samples = []
+    samples_lock = threading.Lock()
+
+    def send(*args, **kwargs):
+        item_started = time.perf_counter()
+        try:
+            return send_post(*args, **kwargs)
+        finally:
+            with samples_lock:
+                samples.append(time.perf_counter() - item_started)
+
+    fake_gspread = FakeGspread(latency=options.latency)
+    real_gspread = post_senders.gspread
+    post_senders.gspread = fake_gspread
+    try:
+        outbox = SendOutbox(db_path)
+        started = time.perf_counter()
+        outbox.enqueue_posts(jobs)
+        dispatcher = OutboxDispatcher(outbox, send, batch_size=options.batch_size)
+        while dispatcher.dispatch_once():
+            pass
+        elapsed = time.perf_counter() - started
+    finally:
+        post_senders.gspread = real_gspread
+    counts = outbox.get_status_counts()
+    return summarize("send", samples, elapsed, count - counts.get('sent', 0),
+                     {'sheet_rows': fake_gspread.data_rows(), 'outbox': counts})
+
+
+def run_gas(db_path, count, options, server):
+    """リツイート予約を GAS Web App に直接送信（予約画面と同じく1件ずつ send_retweet_to_gas_direct を呼ぶ）"""
+    cast_ids = ensure_casts(db_path, 10)
+    ensure_gas_config(db_path, cast_ids, server.url("gas"))
+    sender = PostSender(db_path)
+    scheduled = datetime.datetime.now(JST) + datetime.timedelta(hours=1)
+    samples, errors = [], 0
+    started = time.perf_counter()
+    for index in range(count):
+        item_started = time.perf_counter()
+        success, _ = sender.send_retweet_to_gas_direct(
+            cast_ids[index % len(cast_ids)], str(1_700_000_000_000_000_000 + index),
+            "ベンチマーク引用" if index % 5 == 0 else None, scheduled
+        )
+        samples.append(time.perf_counter() - item_started)
+        if not success:
+            errors += 1
+    return summarize("gas", samples, time.perf_counter() - started, errors)
+
+
+class _TimedRetweetScheduler(RetweetScheduler):
+    """1件ごとの実行時間を記録するスケジューラー"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.samples = []
+        self._samples_lock = threading.Lock()
+
+    def _run_one(self, retweet):
+        item_started = time.perf_counter()
+        result = super()._run_one(retweet)
+        with self._samples_lock:
+            self.samples.append(time.perf_counter() - item_started)
+        return result
+
+
+def run_retweet(db_path, count, options, server):
+    """期限切れのリツイート予約をスケジューラー（リース・ワーカープール）で実行"""
+    cast_ids = ensure_casts(db_path, 20)
+    ensure_x_credentials(db_path, cast_ids)
+    due = (datetime.datetime.now(JST) - datetime.timedelta(minutes=1)).strftime(TIME_FORMAT)
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO retweet_schedules (cast_id, tweet_id, comment, scheduled_at, status, created_at) VALUES (?, ?, ?, ?, 'scheduled', ?)",
+                [(cast_ids[index % len(cast_ids)], str(1_700_000_000_000_000_000 + index),
+                  "ベンチマーク引用" if index % 5 == 0 else None, due, due) for index in range(count)]
+            )
+    finally:
+        conn.close()
+
+    scheduler = _TimedRetweetScheduler(db_path, function_url=server.url("x-poster"), workers=options.workers,
+                                       batch_size=options.batch_size)
+    started = time.perf_counter()
+    try:
+        completed, failed = scheduler.run_once()
+    finally:
+        scheduler.close()
+    return summarize("retweet", scheduler.samples, time.perf_counter() - started, failed, {'completed': completed})
+
+
+class _FakeClientXPoster(XTwitterPoster):
+    """tweepy Client の代わりに FakeTweepyClient を使い、プランのレート制限を適用しない"""
+
+    def __init__(self, db_path, latency, error_ratio=0.0, seed=None):
+        super().__init__(db_path)
+        self._fake_latency = latency
+        self._fake_error_ratio = error_ratio
+        self._fake_seed = seed
+
+    def _build_client(self, api_key, api_secret, bearer_token, access_token, access_token_secret, cast_id=None):
+        return FakeTweepyClient(api_key, access_token, latency=self._fake_latency,
+                                error_ratio=self._fake_error_ratio, seed=self._fake_seed)
+
+    def _acquire_rate_limit(self, cast_id, endpoint):
+        return None
+
+
+def run_x_batch(db_path, count, options):
+    """X API の一括リツイート（アカウント間は並列、同一アカウント内は順番）"""
+    cast_ids = ensure_casts(db_path, 20)
+    ensure_x_credentials(db_path, cast_ids)
+    poster = _FakeClientXPoster(db_path, options.latency, seed=options.seed)
+    actions = [{'action': 'retweet', 'cast_id': cast_ids[index % len(cast_ids)],
+                'params': {'tweet_id': str(1_700_000_000_000_000_000 + index)}} for index in range(count)]
+    started = time.perf_counter()
+    results = poster.run_batch(actions, max_workers=options.workers)
+    elapsed = time.perf_counter() - started
+    return summarize("x_batch", [result['elapsed'] for result in results], elapsed,
+                     sum(1 for result in results if not result['success']))
+
+
+def run_dashboard(db_path, count, options):
+    """キャスト count 名のダッシュボード集計（app.py と同じくクエリごとに接続）"""
+    cast_ids = ensure_casts(db_path, count)
+    seed_posts(db_path, cast_ids, options.posts_per_cast)
+
+    def query(sql, params=()):
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys = ON;")
+            return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(options.renders):
+        render_started = time.perf_counter()
+        for sql in DASHBOARD_TOTAL_QUERIES:
+            query(sql)
+        for cast_id in cast_ids:
+            for sql in DASHBOARD_CAST_QUERIES:
+                query(sql, (cast_id,))
+        samples.append(time.perf_counter() - render_started)
+    queries = options.renders * (len(DASHBOARD_TOTAL_QUERIES) + len(cast_ids) * len(DASHBOARD_CAST_QUERIES))
+    elapsed = time.perf_counter() - started
+    return summarize("dashboard", samples, elapsed, extra={'casts': len(cast_ids), 'queries_per_second': queries / elapsed})
+
+
+# --- 結果の表示・比較 ---
+
+def format_results(results):
+    lines = [f"{'scenario':<12} {'count':>6} {'errors':>6} {'sec':>8} {'per_sec':>9} {'p50_ms':>9} {'p90_ms':>9} {'p99_ms':>9} {'max_ms':>9}"]
+    for result in results:
+        lines.append(
+            f"{result['scenario']:<12} {result['count']:>6} {result['errors']:>6} {result['elapsed_seconds']:>8.2f} "
+            f"{result['throughput']:>9.1f} {result['p50_ms']:>9.1f} {result['p90_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+            f"{result['max_ms']:>9.1f}"
+        )
+        if result['extra']:
+            lines.append(f"{'':<12} {json.dumps(result['extra'], ensure_ascii=False, default=str)}")
+    return "\n".join(lines)
+
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """基準結果と比べて、スループットの低下・p90 の増加が tolerance を超えたシナリオを返す"""
+    baseline_by_name = {result['scenario']: result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline_by_name.get(result['scenario'])
+        if not base:
+            continue
+        if base['throughput'] and result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{result['scenario']}: スループット {base['throughput']:.1f} → {result['throughput']:.1f} 件/秒")
+        if base['p90_ms'] and result['p90_ms'] > base['p90_ms'] * (1 + tolerance):
+            regressions.append(f"{result['scenario']}: p90 {base['p90_ms']:.1f} → {result['p90_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIcast room オフラインベンチマーク")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="実行するシナリオ（複数指定可、省略時はすべて）")
+    parser.add_argument("--db", default=Config.DATABASE_PATH, help="コピー元のSQLiteデータベース（変更しない）")
+    parser.add_argument("--count", type=int, help="件数（省略時はシナリオごとの既定値）")
+    parser.add_argument("--latency-ms", type=float, default=50, help="フェイクの外部サービスの応答時間（ミリ秒）")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.05, help="フェイク Gemini / Cloud Functions が 429 を返す割合")
+    parser.add_argument("--retry-delay", type=float, default=0.01, help="429 発生時の待機・再試行の待機秒数（アプリは5秒・10秒）")
+    parser.add_argument("--generate-delay", type=float, default=0.0, help="生成前の待機秒数（アプリは1秒）")
+    parser.add_argument("--budget-usd", type=float, default=0.0, help="Gemini の月間予算（0は無制限、予算到達で生成を止める）")
+    parser.add_argument("--workers", type=int, default=8, help="リツイート・X API 一括実行の同時実行数")
+    parser.add_argument("--batch-size", type=int, default=50, help="アウトボックス・予約の1回の取得件数")
+    parser.add_argument("--posts-per-cast", type=int, default=8, help="ダッシュボード用に追加するキャストごとの投稿数")
+    parser.add_argument("--renders", type=int, default=3, help="ダッシュボードの集計回数")
+    parser.add_argument("--seed", type=int, default=42, help="乱数シード（429 の発生位置を固定）")
+    parser.add_argument("--save", help="結果をJSONで保存")
+    parser.add_argument("--compare", help="基準となる結果JSON（劣化があれば終了コード 1）")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="劣化とみなす変化の割合")
+    args = parser.parse_args()
+    args.latency = args.latency_ms / 1000
+
+    scenarios = args.scenario or SCENARIOS
+    results = []
+    with tempfile.TemporaryDirectory(prefix="aicast-bench-") as work_dir, \
+            LocalEndpointServer(latency=args.latency, rate_limit_ratio=args.rate_limit_ratio, seed=args.seed) as server:
+        for name in scenarios:
+            # シナリオごとに元のデータベースから作り直し、前のシナリオの書き込みの影響を受けないようにする
+            db_path = prepare_database(args.db, work_dir)
+            count = args.count or DEFAULT_COUNTS[name]
+            print(f"⏱️ {name}（{count}件）を実行中...")
+            if name == "generate":
+                results.append(run_generate(db_path, count, args))
+            elif name == "send":
+                results.append(run_send(db_path, count, args, server))
+            elif name == "gas":
+                results.append(run_gas(db_path, count, args, server))
+            elif name == "retweet":
+                results.append(run_retweet(db_path, count, args, server))
+            elif name == "x_batch":
+                results.append(run_x_batch(db_path, count, args))
+            elif name == "dashboard":
+                results.append(run_dashboard(db_path, count, args))
+        endpoint_requests = dict(server.requests_by_path)
+
+    print()
+    print(format_results(results))
+    print(f"\nローカルエンドポイントへのリクエスト: {endpoint_requests}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+        print(f"💾 結果を保存しました: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ 基準（{args.compare}）から劣化しています:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"\n✅ 基準（{args.compare}）からの劣化はありません（許容 {args.tolerance:.0%}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# ホットパスの処理時間計測
+# execute_query / safe_generate_content / send_to_google_sheets / Cloud Functions / X API の所要時間を
+# 操作・ページごとのヒストグラム（プロセス共通）と、再実行ごとの内訳（DB・AI・HTTP・描画）に記録する
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+CATEGORY_LABELS = {'db': 'DB', 'ai': 'AI', 'http': 'HTTP'}
+
+# ヒストグラムのバケット上限（ミリ秒）
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+DEFAULT_PAGE = "(共通)"  # ページ決定前・バックグラウンドスレッドでの計測
+
+
+class LatencyHistogram:
+    """所要時間（ミリ秒）のバケット別件数・合計・最大"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # 最後は上限超え
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms, succeeded=True):
+        self.bucket_counts[bisect.bisect_left(self.buckets, elapsed_ms)] += 1
+        self.count += 1
+        if not succeeded:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, q):
+        """バケットから求めた q 分位点の上限（ミリ秒、最大値を超えない）"""
+        if not self.count:
+            return 0.0
+        threshold = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            seen += bucket_count
+            if seen >= threshold:
+                return min(float(self.buckets[index]), self.max_ms) if index < len(self.buckets) else self.max_ms
+        return self.max_ms
+
+
+class RerunProfile:
+    """1回の再実行（スクリプト実行）内の計測結果"""
+
+    def __init__(self, page=DEFAULT_PAGE):
+        self.page = page
+        self.started = time.perf_counter()
+        self.category_ms = dict.fromkeys(CATEGORY_LABELS, 0.0)
+        self.operations = {}  # 操作名 → [件数, ミリ秒]
+
+    def add(self, operation, category, exclusive_ms, elapsed_ms):
+        self.category_ms[category] = self.category_ms.get(category, 0.0) + exclusive_ms
+        stats = self.operations.setdefault(operation, [0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed_ms
+
+    def summary(self):
+        """DB・AI・HTTP と残り（描画・その他）の内訳（ミリ秒）"""
+        total_ms = (time.perf_counter() - self.started) * 1000
+        summary = {'page': self.page, 'total_ms': total_ms}
+        summary.update({f"{category}_ms": ms for category, ms in self.category_ms.items()})
+        summary['render_ms'] = max(0.0, total_ms - sum(self.category_ms.values()))
+        summary['operations'] = sorted(
+            ({'operation': operation, 'count': count, 'ms': ms} for operation, (count, ms) in self.operations.items()),
+            key=lambda item: item['ms'], reverse=True
+        )
+        return summary
+
+
+class TimingRegistry:
+    """操作・ページごとのヒストグラムと、スレッドごとの再実行プロファイルを管理する
+
+    計測の入れ子（send_to_google_sheets の中の execute_query など）は、再実行の内訳では
+    子の時間を親から差し引いて二重に数えない。ヒストグラムには各操作の所要時間をそのまま記録する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (操作名, 分類, ページ) → LatencyHistogram
+        self._local = threading.local()
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """計測ごとに listener(operation, category, page, elapsed_seconds, succeeded) を呼び出す"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def begin_rerun(self, page=DEFAULT_PAGE):
+        """このスレッドで新しい再実行の計測を開始"""
+        self._local.profile = RerunProfile(page)
+        self._local.stack = []
+        return self._local.profile
+
+    def set_page(self, page):
+        """以降の計測を記録するページを設定"""
+        profile = getattr(self._local, 'profile', None)
+        if profile is not None:
+            profile.page = page
+
+    def current_profile(self):
+        return getattr(self._local, 'profile', None)
+
+    def current_page(self):
+        profile = self.current_profile()
+        return profile.page if profile is not None else DEFAULT_PAGE
+
+    def record(self, operation, category, elapsed_seconds, succeeded=True, exclusive_seconds=None):
+        page = self.current_page()
+        elapsed_ms = elapsed_seconds * 1000
+        with self._lock:
+            histogram = self._histograms.get((operation, category, page))
+            if histogram is None:
+                histogram = self._histograms[(operation, category, page)] = LatencyHistogram()
+            histogram.observe(elapsed_ms, succeeded)
+            listeners = list(self._listeners)
+        profile = self.current_profile()
+        if profile is not None:
+            exclusive_ms = elapsed_ms if exclusive_seconds is None else exclusive_seconds * 1000
+            profile.add(operation, category, exclusive_ms, elapsed_ms)
+        for listener in listeners:
+            listener(operation, category, page, elapsed_seconds, succeeded)
+
+    @contextmanager
+    def timing(self, operation, category):
+        """with ブロックの所要時間を記録（例外が発生した場合は失敗として記録）"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)  # 子の計測時間の合計
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.record(operation, category, elapsed, succeeded, exclusive_seconds=elapsed - children)
+
+    def timed(self, operation, category):
+        """関数の所要時間を記録するデコレーター"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timing(operation, category):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """操作・ページ別の統計（件数・エラー数・平均/p50/p95/最大ミリ秒）"""
+        with self._lock:
+            return [{
+                'operation': operation,
+                'category': category,
+                'page': page,
+                'count': histogram.count,
+                'errors': histogram.errors,
+                'avg_ms': histogram.total_ms / histogram.count if histogram.count else 0.0,
+                'p50_ms': histogram.percentile(0.5),
+                'p95_ms': histogram.percentile(0.95),
+                'max_ms': histogram.max_ms,
+            } for (operation, category, page), histogram in sorted(self._histograms.items())]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+# グローバルインスタンス
+perf = TimingRegistry()
+timing = perf.timing
+timed = perf.timed
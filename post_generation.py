@@ -0,0 +1,76 @@
+# 投稿文の生成
+# Gemini 呼び出しのレート制限対策（待機）・使用量台帳への記録・月間予算の確認をまとめる
+# Streamlit に依存しないため、app.py とオフラインベンチマークから同じ処理で生成する
+
+import sqlite3
+import time
+
+from gemini_models import model_display_name
+from generation_usage import BUDGET_THROTTLE_SECONDS, GenerationBudgetExceeded, GenerationUsageLedger
+from metrics import is_rate_limit_error, record_generation
+
+RATE_LIMIT_PAUSE_SECONDS = 5  # 429 発生時、呼び出し元の再試行に戻る前に待つ秒数
+
+
+def check_generation_budget(db_path, budget_usd, throttle_ratio=0.8):
+    """今月の Gemini 推定コストと予算の状態
+
+    Returns:
+        tuple: ('ok' / 'throttle' / 'block', 今月の推定コスト(USD), 月間予算(USD))
+    """
+    state, spent = GenerationUsageLedger(db_path).budget_state(budget_usd, throttle_ratio)
+    return state, spent, budget_usd
+
+
+def record_generation_usage(db_path, model_name, outcome, usage_metadata, cast_id, page, started):
+    """使用量台帳に記録（記録の失敗で生成処理を止めない）"""
+    try:
+        GenerationUsageLedger(db_path).record(
+            model_name, outcome, usage_metadata, cast_id=cast_id, page=page,
+            latency_ms=(time.perf_counter() - started) * 1000
+        )
+    except sqlite3.Error as e:
+        print(f"⚠️ 使用量の記録に失敗しました: {e}")
+
+
+def safe_generate_content(model, prompt, db_path, delay_seconds=1.0, cast_id=None, batch=False,
+                          budget_usd=0.0, throttle_ratio=0.8, page=None, on_rate_limited=None):
+    """レート制限対策を含む安全なコンテンツ生成
+
+    Args:
+        db_path (str): 使用量台帳のデータベース
+        cast_id (int, optional): 使用量台帳に記録するキャストID
+        batch (bool): 一括生成の場合 True（月間予算の警告ラインで間隔を空け、予算到達で GenerationBudgetExceeded）
+        budget_usd (float): Gemini の月間予算（0 以下は無制限）
+        throttle_ratio (float): 予算のこの割合を超えたらバッチ生成の間隔を空ける
+        page (str, optional): 使用量台帳に記録するページ名
+        on_rate_limited (callable, optional): 429 発生時の通知（画面表示など）
+    """
+    if batch:
+        state, spent, budget = check_generation_budget(db_path, budget_usd, throttle_ratio)
+        if state == 'block':
+            raise GenerationBudgetExceeded(f"Gemini の月間予算（${budget:.2f}）に達したため一括生成を停止しました（今月の推定コスト: ${spent:.2f}）")
+        if state == 'throttle':
+            delay_seconds += BUDGET_THROTTLE_SECONDS
+    model_name = model_display_name(model)
+    # レート制限回避のため少し待機
+    time.sleep(delay_seconds)
+    started = time.perf_counter()
+    try:
+        response = model.generate_content(prompt)
+        usage_metadata = getattr(response, 'usage_metadata', None)
+        record_generation(model_name, "success", usage_metadata)
+        record_generation_usage(db_path, model_name, "success", usage_metadata, cast_id, page, started)
+        return response
+    except Exception as e:
+        if is_rate_limit_error(e):
+            record_generation(model_name, "rate_limited")
+            record_generation_usage(db_path, model_name, "rate_limited", None, cast_id, page, started)
+            if on_rate_limited:
+                on_rate_limited()
+            time.sleep(RATE_LIMIT_PAUSE_SECONDS)
+            raise e
+        else:
+            record_generation(model_name, "error")
+            record_generation_usage(db_path, model_name, "error", None, cast_id, page, started)
+            raise e
@@ -0,0 +1,456 @@
+# 投稿・リツイート予約の送信
+# Google Sheets（gspread）・Cloud Functions（x-poster）・GAS Web App への送信処理をまとめ、
+# app.py・送信アウトボックス・オフラインベンチマークから同じ処理で送信する
+# Streamlit に依存しないため、エラーは画面に表示せず (成功, メッセージ) で返す
+
+import os
+import pickle
+import sqlite3
+import threading
+
+import requests
+
+from bulk_sender import in_send_worker
+from config import Config
+from data_cache import sheets_config_cache
+from drive_url import normalize_drive_url
+from lazy_imports import lazy_import
+from metrics import counted_send
+from perf_timing import timed
+
+gspread = lazy_import("gspread")
+
+SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+SHEETS_CREDENTIALS_PATH = "credentials/credentials.json"
+SHEETS_TOKEN_PATH = "credentials/token.pickle"
+DEFAULT_SPREADSHEET_ID = "1VPSyQOp0p2U9bPHghP4JZiyePsev2Uoq3nVbbC26VAo"  # デフォルトスプレッドシート
+POST_SHEET_HEADERS = ["datetime", "content", "name", "image_url1", "image_url2", "image_url3", "image_url4"]
+REQUEST_TIMEOUT_SECONDS = 30
+
+# 共通トークンファイル（credentials/token.pickle）の読み込み・更新・保存を直列化する
+sheets_token_lock = threading.Lock()
+
+# シートごとのヘッダー確認・初期化を直列化する（並列送信で sheet.clear() が競合しないように）
+_sheet_header_locks = {}
+_sheet_header_locks_guard = threading.Lock()
+
+
+def _sheet_header_lock(spreadsheet_key, sheet_name):
+    with _sheet_header_locks_guard:
+        return _sheet_header_locks.setdefault((spreadsheet_key, sheet_name), threading.Lock())
+
+
+def setup_google_sheets_oauth_simple():
+    """シンプル版Google Sheets OAuth認証（共通認証ファイル使用）
+
+    並列送信の前に呼び出し元スレッドで1回解決し、結果を send_to_google_sheets(creds=...) に渡す。
+    送信ワーカーのスレッドからはブラウザ認証を行わない
+    """
+    with sheets_token_lock:
+        return _setup_google_sheets_oauth_simple()
+
+
+def _setup_google_sheets_oauth_simple():
+    try:
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        creds = None
+
+        # 既存のトークンを確認
+        if os.path.exists(SHEETS_TOKEN_PATH):
+            with open(SHEETS_TOKEN_PATH, 'rb') as token:
+                creds = pickle.load(token)
+
+                # 辞書形式の場合はCredentialsオブジェクトに変換
+                if isinstance(creds, dict):
+                    from google.oauth2.credentials import Credentials
+                    creds = Credentials(
+                        token=creds.get('access_token'),
+                        refresh_token=creds.get('refresh_token'),
+                        token_uri=creds.get('token_uri'),
+                        client_id=creds.get('client_id'),
+                        client_secret=creds.get('client_secret'),
+                        scopes=creds.get('scopes', SHEETS_SCOPES)
+                    )
+
+        # 認証が必要な場合
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                if not os.path.exists(SHEETS_CREDENTIALS_PATH):
+                    return None, f"共通認証ファイルが見つかりません: {SHEETS_CREDENTIALS_PATH}"
+                if in_send_worker():
+                    return None, "Google Sheets の認証が必要です。画面から送信して認証を完了してください"
+
+                # シンプル版：自動ブラウザ認証
+                flow = InstalledAppFlow.from_client_secrets_file(SHEETS_CREDENTIALS_PATH, SHEETS_SCOPES)
+                creds = flow.run_local_server(port=0)
+
+            # トークンを保存
+            os.makedirs(os.path.dirname(SHEETS_TOKEN_PATH), exist_ok=True)
+            with open(SHEETS_TOKEN_PATH, 'wb') as token:
+                pickle.dump(creds, token)
+
+        return creds, "認証成功"
+    except Exception as e:
+        return None, f"OAuth認証エラー: {str(e)}"
+
+
+def _open_post_sheet(client, cast_config, spreadsheet_id, sheet_name):
+    """投稿用シートを開き、ヘッダー行を確認・作成する
+
+    同じシートへの並列送信ではシートの作成とヘッダー確認（sheet.clear() を含む）を1件ずつ行う
+
+    Returns:
+        tuple: (シート, エラーメッセージ)。失敗時はシートが None
+    """
+    with _sheet_header_lock(spreadsheet_id, sheet_name):
+        # スプレッドシートを開く
+        try:
+            if cast_config and cast_config['spreadsheet_id']:
+                # スプレッドシートIDで直接開く
+                spreadsheet = client.open_by_key(cast_config['spreadsheet_id'])
+                try:
+                    sheet = spreadsheet.worksheet(sheet_name)
+                except gspread.WorksheetNotFound:
+                    # シートが存在しない場合は作成
+                    sheet = spreadsheet.add_worksheet(title=sheet_name, rows=1000, cols=10)
+                    sheet.append_row(["datetime", "content", "name"])
+            else:
+                # デフォルト動作：名前でスプレッドシートを開く
+                try:
+                    sheet = client.open(spreadsheet_id).sheet1
+                except gspread.SpreadsheetNotFound:
+                    # スプレッドシートが存在しない場合は作成
+                    spreadsheet = client.create(spreadsheet_id)
+                    sheet = spreadsheet.sheet1
+                    # ヘッダー行を追加
+                    sheet.append_row(["datetime", "content", "name"])
+        except Exception as e:
+            return None, f"スプレッドシートアクセスエラー: {str(e)}"
+
+        # ヘッダーが存在しない場合は作成
+        try:
+            headers = sheet.row_values(1)
+            if not headers or len(headers) < len(POST_SHEET_HEADERS):
+                sheet.clear()
+                sheet.append_row(POST_SHEET_HEADERS)
+        except Exception:
+            # シートが空の場合
+            sheet.append_row(POST_SHEET_HEADERS)
+        return sheet, None
+
+
+class CloudFunctionsPoster:
+    """Cloud Functions経由のX投稿クライアント"""
+
+    def __init__(self, function_url=None):
+        self.function_url = function_url or os.environ.get('CLOUD_FUNCTIONS_URL')
+
+    @timed("cloud_functions.post_tweet", "http")
+    def post_tweet(self, account_id, text, image_url=None):
+        """Cloud Functions経由でX投稿"""
+        if not self.function_url:
+            return {"status": "error", "message": "Cloud Functions URL not configured"}
+
+        payload = {
+            "account_id": account_id,
+            "text": text,
+            "image_url": image_url
+        }
+
+        try:
+            response = requests.post(
+                self.function_url,
+                json=payload,
+                headers={'Content-Type': 'application/json'},
+                timeout=REQUEST_TIMEOUT_SECONDS
+            )
+
+            return response.json()
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+
+class PostSender:
+    """投稿・リツイート予約を送信先（Google Sheets / Cloud Functions / GAS）へ送る
+
+    送信関数は送信エンジンのワーカースレッドからも呼ばれるため、Streamlit の画面表示は行わない
+    """
+
+    def __init__(self, db_path=Config.DATABASE_PATH, function_url=None):
+        """
+        Args:
+            db_path (str): SQLiteデータベースのパス
+            function_url (str, optional): Cloud Functions（x-poster）のURL（省略時は Config の値）
+        """
+        self.db_path = db_path
+        self.function_url = function_url
+
+    def _fetch_one(self, query, params=()):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.row_factory = sqlite3.Row
+            return conn.execute(query, params).fetchone()
+        finally:
+            conn.close()
+
+    # --- 送信先の設定 ---
+
+    def get_cast_sheets_config(self, cast_id, action_type='post'):
+        """キャストのGoogle Sheets設定を取得（アクション別対応・プロセス内キャッシュ）"""
+        if cast_id is None:
+            return None
+        try:
+            config = sheets_config_cache.get_or_load(
+                (int(cast_id), action_type),
+                lambda: self._load_cast_sheets_config(cast_id, action_type)
+            )
+        except sqlite3.Error as e:
+            # 読み込みに失敗した場合はキャッシュせず次回再取得
+            print(f"⚠️ Google Sheets設定の取得エラー: {e}")
+            return None
+        return dict(config) if config else None
+
+    def _load_cast_sheets_config(self, cast_id, action_type='post'):
+        """キャストのGoogle Sheets設定をデータベースから読み込む"""
+        # 新しいテーブルから設定を取得（gas_web_app_url含む）
+        result = self._fetch_one(
+            "SELECT id, cast_id, action_type, spreadsheet_id, sheet_name, gas_web_app_url, is_active, created_at, updated_at FROM cast_action_sheets WHERE cast_id = ? AND action_type = ? AND is_active = 1",
+            (cast_id, action_type)
+        )
+        if result:
+            return dict(result)
+
+        # 新しいテーブルにない場合は、既存テーブルから取得（互換性）
+        if action_type == 'post':
+            result_old = self._fetch_one(
+                "SELECT id, cast_id, spreadsheet_id, sheet_name, is_active, created_at, updated_at FROM cast_sheets_config WHERE cast_id = ? AND is_active = 1",
+                (cast_id,)
+            )
+            if result_old:
+                config = dict(result_old)
+                config['action_type'] = 'post'  # アクションタイプを追加
+                config['gas_web_app_url'] = None  # 既存テーブルにはGAS URLはない
+                return config
+
+        return None
+
+    def get_cast_name(self, cast_id):
+        """キャストIDから名前を取得"""
+        try:
+            result = self._fetch_one("SELECT name FROM casts WHERE id = ?", (cast_id,))
+            if result:
+                return result['name']
+        except sqlite3.Error as e:
+            print(f"キャスト名取得エラー: {e}")
+        return f"Cast_{cast_id}"  # フォールバック
+
+    def get_account_id_for_cast(self, cast_name):
+        """キャスト名からX APIアカウントIDを取得"""
+        try:
+            result = self._fetch_one("""
+                SELECT cxc.twitter_username
+                FROM cast_x_credentials cxc
+                JOIN casts c ON c.id = cxc.cast_id
+                WHERE c.name = ?
+            """, (cast_name,))
+        except sqlite3.Error as e:
+            print(f"❌ アカウントID取得エラー: {e}")
+            return None
+        return result['twitter_username'] if result else None
+
+    # --- 投稿の送信 ---
+
+    @timed("send_to_google_sheets", "http")
+    @counted_send("google_sheets")
+    def send_to_google_sheets(self, cast_name, post_content, scheduled_datetime, cast_id=None, action_type='post', image_urls=None, creds=None):
+        """Google Sheetsにデータを送信する（アクション別シート対応・Google Drive URL対応）
+
+        Args:
+            creds: 解決済みの OAuth 認証情報（並列送信時に指定。省略時はここで認証する）
+        """
+        try:
+            # キャスト別・アクション別スプレッドシート設定をチェック
+            cast_config = None
+            if cast_id:
+                cast_config = self.get_cast_sheets_config(cast_id, action_type)
+
+            if cast_config:
+                # キャスト別スプレッドシート設定を使用
+                spreadsheet_id = cast_config['spreadsheet_id']
+                sheet_name = cast_config['sheet_name'] or 'Sheet1'
+            else:
+                # デフォルト設定を使用
+                spreadsheet_id = DEFAULT_SPREADSHEET_ID
+                sheet_name = "Sheet1"
+
+            # シンプル版OAuth認証を実行（共通認証ファイル使用）
+            if creds is None:
+                creds, auth_message = setup_google_sheets_oauth_simple()
+                if not creds:
+                    return False, auth_message
+
+            client = gspread.authorize(creds)
+
+            sheet, error_message = _open_post_sheet(client, cast_config, spreadsheet_id, sheet_name)
+            if sheet is None:
+                return False, error_message
+
+            # データを追加（日時, 投稿内容, name, 画像URL1-4 の順）
+            formatted_datetime = scheduled_datetime.strftime('%Y-%m-%d %H:%M:%S')
+
+            # 画像URLを4列分に分割（最大4枚対応・Google Drive URL変換）
+            image_url_columns = ['', '', '', '']  # 空の4列を準備
+            if image_urls:
+                for i, url in enumerate(image_urls[:4]):  # 最大4枚まで
+                    if url:
+                        # Google Drive URLを直接アクセス可能な形式に変換
+                        image_url_columns[i] = normalize_drive_url(url)
+
+            # データ行を追加
+            row_data = [formatted_datetime, post_content, cast_name] + image_url_columns
+            sheet.append_row(row_data)
+
+            if cast_config:
+                return True, f"キャスト専用Google Sheetsに送信しました。(スプレッドシートID: {cast_config['spreadsheet_id'][:10]}...)"
+            else:
+                return True, "デフォルトGoogle Sheetsに送信しました。"
+
+        except Exception as e:
+            return False, f"Google Sheets送信エラー: {str(e)}"
+
+    @counted_send("x_api")
+    def send_to_x_api(self, cast_name, post_content, scheduled_datetime=None, cast_id=None):
+        """Cloud Functions経由でX (Twitter) APIに投稿を送信する"""
+        try:
+            # Cloud Functions投稿クライアントを初期化
+            cloud_poster = CloudFunctionsPoster(self.function_url or Config.get_cloud_functions_url())
+
+            # キャストIDに基づいてアカウントIDを決定
+            account_id = self.get_account_id_for_cast(cast_name)
+            if not account_id:
+                return False, f"❌ キャスト '{cast_name}' のX APIアカウント設定が見つかりません"
+
+            # Cloud Functions経由で投稿
+            result = cloud_poster.post_tweet(account_id, post_content)
+
+            if result.get("status") == "success":
+                tweet_id = result.get("tweet_id", "")
+                return True, f"✅ X (Twitter) に投稿しました！ Tweet ID: {tweet_id}"
+            else:
+                error_msg = result.get("message", "投稿に失敗しました")
+                return False, f"❌ X API投稿エラー: {error_msg}"
+
+        except Exception as e:
+            return False, f"❌ Cloud Functions X API送信エラー: {str(e)}"
+
+    def send_post_to_destination(self, cast_name, post_content, scheduled_datetime, destination, cast_id=None, sheets_creds=None):
+        """投稿を指定した送信先に送信する統合関数（キャスト別設定対応）
+
+        Args:
+            sheets_creds: 解決済みの Google Sheets 認証情報（並列送信時に指定）
+        """
+        if destination == "google_sheets":
+            return self.send_to_google_sheets(cast_name, post_content, scheduled_datetime, cast_id, creds=sheets_creds)
+        elif destination == "x_api":
+            return self.send_to_x_api(cast_name, post_content, scheduled_datetime, cast_id)
+        elif destination == "both":
+            # 両方に送信
+            sheets_success, sheets_message = self.send_to_google_sheets(cast_name, post_content, scheduled_datetime, cast_id, creds=sheets_creds)
+            x_success, x_message = self.send_to_x_api(cast_name, post_content, scheduled_datetime, cast_id)
+
+            if sheets_success and x_success:
+                return True, "Google Sheets と X (Twitter) 両方に送信しました！"
+            elif sheets_success:
+                return True, f"Google Sheets に送信しました。X投稿エラー: {x_message}"
+            elif x_success:
+                return True, f"X (Twitter) に投稿しました。Sheets送信エラー: {sheets_message}"
+            else:
+                return False, f"両方の送信に失敗: Sheets({sheets_message}), X({x_message})"
+        else:
+            return False, "不明な送信先です"
+
+    # --- リツイート予約の送信 ---
+
+    def send_retweet_to_google_sheets(self, cast_id, tweet_id, comment, scheduled_datetime):
+        """リツイート予約をGoogle Sheetsに送信"""
+        try:
+            # リツイート用の設定を取得
+            config = self.get_cast_sheets_config(cast_id, 'retweet')
+            if not config:
+                return False, "リツイート用Google Sheets設定が見つかりません"
+
+            # 認証
+            creds, auth_message = setup_google_sheets_oauth_simple()
+            if not creds:
+                return False, auth_message
+
+            client = gspread.authorize(creds)
+
+            # スプレッドシートを開く
+            try:
+                spreadsheet = client.open_by_key(config['spreadsheet_id'])
+                try:
+                    sheet = spreadsheet.worksheet(config['sheet_name'])
+                except gspread.WorksheetNotFound:
+                    # シートが存在しない場合は作成
+                    sheet = spreadsheet.add_worksheet(title=config['sheet_name'], rows=1000, cols=10)
+                    # ヘッダー行を追加（GASのretweetMain関数に合わせる）
+                    sheet.append_row(["実行日時", "ツイートID", "コメント", "ステータス", "実行完了日時"])
+            except Exception as e:
+                return False, f"スプレッドシートアクセスエラー: {str(e)}"
+
+            # データを追加（GASの形式に合わせる）
+            formatted_datetime = scheduled_datetime.strftime('%Y-%m-%d %H:%M:%S')
+            sheet.append_row([formatted_datetime, tweet_id, comment or '', '', ''])
+
+            return True, f"リツイート予約をGoogle Sheetsに送信しました。(ID: {tweet_id})"
+
+        except Exception as e:
+            return False, f"リツイート予約送信エラー: {str(e)}"
+
+    @timed("gas.schedule_retweet", "http")
+    def send_retweet_to_gas_direct(self, cast_id, tweet_id, comment, scheduled_datetime):
+        """GAS Direct API経由でリツイート予約を送信（スプレッドシート不要）"""
+        try:
+            # GAS Web AppのURLを設定から取得
+            config = self.get_cast_sheets_config(cast_id, 'retweet')
+            if not config:
+                return False, "リツイート用Google Sheets設定が見つかりません"
+
+            # GAS Web App URLを取得（新しい設定項目として想定）
+            gas_web_app_url = config.get('gas_web_app_url')
+            if not gas_web_app_url:
+                return False, "GAS Web App URLが設定されていません。設定で 'gas_web_app_url' を追加してください。"
+
+            # リクエストペイロード
+            payload = {
+                "action": "schedule_retweet",
+                "tweet_id": tweet_id,
+                "comment": comment if comment and comment.strip() else "",
+                "scheduled_at": scheduled_datetime.isoformat(),
+                "cast_name": self.get_cast_name(cast_id)
+            }
+
+            # GAS Web Appに直接POST
+            response = requests.post(
+                gas_web_app_url,
+                json=payload,
+                headers={'Content-Type': 'application/json'},
+                timeout=REQUEST_TIMEOUT_SECONDS
+            )
+
+            if response.status_code == 200:
+                result = response.json()
+                if result.get('status') == 'success':
+                    return True, f"GAS直接予約が完了しました。(ID: {tweet_id}, トリガーID: {result['data'].get('trigger_id', 'N/A')})"
+                else:
+                    return False, f"GAS応答エラー: {result.get('message', 'Unknown error')}"
+            else:
+                return False, f"GAS接続エラー: HTTP {response.status_code} - {response.text}"
+
+        except Exception as e:
+            return False, f"GAS Direct API送信エラー: {str(e)}"
@@ -0,0 +1,181 @@
+# 起動時のウォームアップ
+# DB の準備、Vertex AI の初期化、Google Sheets の OAuth トークン更新、X API クライアントの作成を
+# 並列スレッドで先に済ませ、デプロイ直後の最初の操作が遅くならないようにする
+# Streamlit プロセス内ではログイン後に1回だけ開始する（PREWARM_ON_START=true）
+# run.py（--prewarm）は別プロセスのため、ファイル上で完結する処理（スキーマ・トークン更新）のみ行う
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from lazy_imports import load_module
+from post_senders import SHEETS_TOKEN_PATH, sheets_token_lock
+
+DEFAULT_GEMINI_MODEL = "gemini-2.5-flash"
+VERTEX_AI_LOCATION = "us-central1"  # app.py と同じ Vertex AI の基本地域
+
+
+def default_project_id():
+    """app.py と同じ順序で GCP プロジェクトIDを決定"""
+    return os.environ.get("GCP_PROJECT") or os.environ.get("DEVSHELL_PROJECT_ID", "aicast-472807")
+
+
+_prewarm_thread = None
+_prewarm_results = []
+_prewarm_lock = threading.Lock()
+
+
+def warm_database(db_path=Config.DATABASE_PATH):
+    """スキーマの追加分を反映し、よく使うテーブルを読み込んでおく"""
+    from schedule_lease import ensure_lease_columns
+    from send_outbox import SendOutbox
+
+    if not os.path.exists(db_path):
+        return "データベースが未作成のためスキップ（初回アクセス時に作成）"
+    SendOutbox(db_path).ensure_schema()
+    ensure_lease_columns(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ('casts', 'posts')}
+    finally:
+        conn.close()
+    return f"キャスト {counts['casts']}件 / 投稿 {counts['posts']}件"
+
+
+def warm_vertex_ai(project=None, location=VERTEX_AI_LOCATION, model_name=DEFAULT_GEMINI_MODEL,
+                   credentials_info=None):
+    """vertexai.init と既定モデルの作成（プロセス共通レジストリに登録）"""
+    from gemini_models import gemini_models, service_account_identity
+
+    project = project or default_project_id()
+    if credentials_info:
+        service_account = load_module("google.oauth2.service_account")
+        credentials = service_account.Credentials.from_service_account_info(credentials_info)
+        gemini_models.init(project, location, credentials, service_account_identity(credentials_info))
+    else:
+        gemini_models.init(project, location)
+    gemini_models.get_model(model_name)
+    return f"{model_name} ({gemini_models.api_version})"
+
+
+def warm_sheets_token(token_path=SHEETS_TOKEN_PATH):
+    """保存済みの Google Sheets OAuth トークンが期限切れなら更新する（ブラウザ認証は行わない）"""
+    load_module("gspread")
+    with sheets_token_lock:  # 送信処理のトークン更新と同時に書き込まない
+        return _refresh_sheets_token(token_path)
+
+
+def _refresh_sheets_token(token_path):
+    if not os.path.exists(token_path):
+        return "トークン未保存のためスキップ"
+    with open(token_path, 'rb') as token:
+        creds = pickle.load(token)
+    if isinstance(creds, dict):
+        return "辞書形式のトークンのためスキップ"
+    if creds.valid:
+        return "トークン有効"
+    if not (creds.expired and creds.refresh_token):
+        return "リフレッシュトークンがないためスキップ"
+    creds.refresh(load_module("google.auth.transport.requests").Request())
+    with open(token_path, 'wb') as token:
+        pickle.dump(creds, token)
+    return "トークンを更新しました"
+
+
+def warm_x_clients(db_path=Config.DATABASE_PATH):
+    """有効な X API 認証情報を持つキャストのクライアントを作成しておく"""
+    from x_api_poster import x_poster
+
+    if not os.path.exists(db_path):
+        return "データベースが未作成のためスキップ"
+    conn = sqlite3.connect(db_path)
+    try:
+        cast_ids = [row[0] for row in conn.execute("SELECT cast_id FROM cast_x_credentials WHERE is_active = 1")]
+    except sqlite3.Error:
+        cast_ids = []
+    finally:
+        conn.close()
+    built = sum(1 for cast_id in cast_ids if x_poster.get_cast_client(cast_id) is not None)
+    return f"{built}件のクライアントを作成"
+
+
+def disk_tasks(db_path=Config.DATABASE_PATH):
+    """ファイル上で完結するウォームアップ（別プロセスの起動スクリプトから実行しても効果が残る）"""
+    return {
+        'database': lambda: warm_database(db_path),
+        'sheets_token': warm_sheets_token,
+    }
+
+
+def default_tasks(db_path=Config.DATABASE_PATH, credentials_info=None):
+    """ウォームアップ処理の一覧（名前 → 関数）
+
+    Vertex AI・X API クライアントはプロセス内のレジストリに登録されるため、
+    Streamlit プロセスで実行した場合のみ効果がある
+    """
+    tasks = disk_tasks(db_path)
+    tasks.update({
+        'vertex_ai': lambda: warm_vertex_ai(credentials_info=credentials_info),
+        'x_clients': lambda: warm_x_clients(db_path),
+    })
+    return {name: tasks[name] for name in ('database', 'vertex_ai', 'sheets_token', 'x_clients')}
+
+
+def run_prewarm(tasks=None, max_workers=4):
+    """ウォームアップ処理を並列実行し、処理ごとの所要時間を返す
+
+    Returns:
+        list: {'component', 'success', 'elapsed', 'message'} のリスト（tasks の順）
+    """
+    tasks = tasks or default_tasks()
+
+    def run_task(item):
+        name, task = item
+        started = time.perf_counter()
+        try:
+            message = task()
+            success = True
+        except Exception as e:
+            message = f"{type(e).__name__}: {str(e)}"
+            success = False
+        return {'component': name, 'success': success, 'elapsed': time.perf_counter() - started, 'message': message}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks))), thread_name_prefix="prewarm") as executor:
+        return list(executor.map(run_task, tasks.items()))
+
+
+def format_prewarm_results(results):
+    lines = []
+    for result in results:
+        mark = "✅" if result['success'] else "⚠️"
+        lines.append(f"{mark} {result['component']:<14} {result['elapsed'] * 1000:8.1f} ms  {result['message']}")
+    return "\n".join(lines)
+
+
+def start_prewarm(tasks=None):
+    """バックグラウンドでウォームアップを開始（プロセスで1回のみ）"""
+    global _prewarm_thread
+
+    def run():
+        started = time.perf_counter()
+        results = run_prewarm(tasks)
+        with _prewarm_lock:
+            _prewarm_results[:] = results
+        print(f"🔥 ウォームアップ完了 ({(time.perf_counter() - started) * 1000:.1f} ms)\n{format_prewarm_results(results)}")
+
+    with _prewarm_lock:
+        if _prewarm_thread is not None:
+            return _prewarm_thread
+        _prewarm_thread = threading.Thread(target=run, name="prewarm", daemon=True)
+        _prewarm_thread.start()
+        return _prewarm_thread
+
+
+def get_prewarm_results():
+    """バックグラウンドのウォームアップ結果（未完了の場合は空）"""
+    with _prewarm_lock:
+        return list(_prewarm_results)
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+AIcast room リツイート予約スケジューラー（常駐プロセス）
+
+retweet_schedules の実行時刻を過ぎた予約をリース付きで確保し、Cloud Functions 経由で
+リツイート / 引用ツイートを実行する。ブラウザ操作や Cloud Functions のポーリングに依存しない。
+複数台で同時に起動しても同じ予約を二重に実行しない（リース切れの予約は他のプロセスが再実行する）。
+
+常駐実行では予約を起動時にメモリ上のタイマー（最小ヒープ）へ読み込み、実行時刻ちょうどに実行する。
+予約の追加・変更・削除は PRAGMA data_version（他の接続のコミット）の変化で検知し、その時だけ実行待ち予約の
+件数・最大ID・実行時刻の合計を比べる。予約以外のテーブルの更新では読み込み直さない。
+X API のレート制限（429 応答）で実行できなかった予約は失敗にせず、応答ヘッダーのリセット時刻に予約し直す。
+同じアカウントの制限中の予約は Cloud Functions を呼ばずにリセット時刻へ回す。
+
+使い方:
+    python3 retweet_scheduler.py              # 常駐実行
+    python3 retweet_scheduler.py --once       # 期限切れの予約を1回だけ処理して終了
+    python3 retweet_scheduler.py --metrics-port 9103  # /metrics を公開
+"""
+import argparse
+import datetime
+import logging
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from config import Config
+from due_timer import DueTimer
+from metrics import observe_retweet_lag, record_send, start_metrics_server
+from schedule_lease import (
+    LEASE_SECONDS, claim_due_retweets, claim_retweet, ensure_lease_columns, finish_retweets,
+    load_scheduled_retweets, make_lease_owner, reschedule_retweets, scheduled_retweets_fingerprint,
+)
+from x_rate_limit import RateLimitTracker
+
+JST = datetime.timezone(datetime.timedelta(hours=9))
+
+DEFAULT_POLL_SECONDS = 1  # 予約の変更確認（PRAGMA data_version）の間隔
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 20
+REQUEST_TIMEOUT = 30
+
+logger = logging.getLogger("retweet_scheduler")
+
+# プロセス内で共有するレート制限（アプリ内タイマーと「今すぐ実行」で同じ 429 の記録を使う）
+shared_rate_limits = RateLimitTracker()
+
+
+def now_jst_str():
+    return datetime.datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _rate_limit_key(retweet):
+    """レート制限の (アカウント, エンドポイント)。引用ツイートは投稿の枠を使う"""
+    endpoint = 'create_tweet' if (retweet.get('comment') or '').strip() else 'retweet'
+    return retweet.get('twitter_username'), endpoint
+
+
+def execute_retweet(retweet, function_url, rate_limits=None, observe_lag=True):
+    """Cloud Functions 経由でリツイート / 引用ツイートを実行
+
+    Args:
+        rate_limits (RateLimitTracker, optional): 429 応答を記録し、制限中のアカウントは呼び出さない
+        observe_lag (bool): 予約時刻からの遅延を記録する（手動の「今すぐ実行」では False）
+
+    Returns:
+        tuple: (成功True/失敗False, 結果ツイートIDまたはエラーメッセージ)
+    """
+    if rate_limits is not None:
+        blocked = rate_limits.blocked_message(*_rate_limit_key(retweet))
+        if blocked:
+            return False, blocked
+    if observe_lag:
+        observe_retweet_lag(retweet.get('scheduled_at'))
+    success, detail = _post_retweet(retweet, function_url, rate_limits)
+    record_send("retweet", success)
+    return success, detail
+
+
+def retry_at_for(retweet, rate_limits):
+    """レート制限中なら再実行できる時刻（JST文字列）。制限中でなければ None"""
+    if rate_limits is None:
+        return None
+    return rate_limits.next_available_at(*_rate_limit_key(retweet))
+
+
+def settle_retweets(db_path, owner, results, rate_limits):
+    """実行結果を書き戻す（レート制限で失敗した予約は再実行可能時刻に予約し直す）
+
+    Args:
+        results (list): (予約, 成功True/失敗False, 結果ツイートIDまたはエラーメッセージ, 実行時刻) のリスト
+
+    Returns:
+        tuple: (成功件数, 失敗件数, 予約し直した (予約ID, 再実行時刻) のリスト)
+    """
+    finished, retries = [], []
+    for retweet, success, detail, executed_at in results:
+        retry_at = None if success else retry_at_for(retweet, rate_limits)
+        if retry_at:
+            retries.append((retweet['id'], retry_at, detail))
+        else:
+            finished.append((retweet['id'], success, detail, executed_at))
+    completed, failed = finish_retweets(db_path, owner, finished) if finished else (0, 0)
+    reschedule_retweets(db_path, owner, retries)
+    return completed, failed, [(retweet_id, retry_at) for retweet_id, retry_at, _ in retries]
+
+
+def _post_retweet(retweet, function_url, rate_limits=None):
+    account_id = retweet.get('twitter_username')
+    if not account_id:
+        return False, f"キャスト '{retweet.get('cast_name') or retweet['cast_id']}' のX APIアカウント設定が見つかりません"
+
+    comment = (retweet.get('comment') or '').strip()
+    payload = {
+        "action": "quote_tweet" if comment else "retweet",
+        "account_id": account_id,
+        "tweet_id": retweet['tweet_id'],
+    }
+    if comment:
+        payload["comment"] = comment
+
+    try:
+        response = requests.post(function_url, json=payload, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        return False, f"実行エラー: {str(e)}"
+
+    if response.status_code == 429 and rate_limits is not None:
+        # Cloud Functions が転送した x-rate-limit-* ヘッダーがあればそのリセット時刻、なければ15分後まで止める
+        rate_limits.record_headers(*_rate_limit_key(retweet), response.headers, status_code=429)
+    if response.status_code != 200:
+        return False, f"HTTP {response.status_code}: {response.text}"
+    result = response.json()
+    if result.get('status') == 'success':
+        return True, result.get('tweet_id', '')
+    return False, result.get('message', '不明なエラー')
+
+
+def parse_jst_timestamp(value):
+    """JST の日時文字列（'%Y-%m-%d %H:%M:%S'）を UNIX 時刻に変換"""
+    return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=JST).timestamp()
+
+
+class RetweetTimer:
+    """実行待ちの予約をタイマーに保持し、実行時刻になった予約を確保して実行する"""
+
+    def __init__(self, db_path=Config.DATABASE_PATH, function_url=None, workers=DEFAULT_WORKERS,
+                 owner=None, executor=None, rate_limits=None):
+        self.db_path = db_path
+        self.function_url = function_url or Config.get_cloud_functions_url()
+        self.owner = owner or make_lease_owner("timer")
+        self.rate_limits = rate_limits or shared_rate_limits
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="retweet-timer")
+        self._timer = DueTimer(self._on_due, name="retweet-timer")
+
+    def start(self):
+        self.sync()
+        self._timer.start()
+        return self
+
+    def is_alive(self):
+        return self._timer.is_alive()
+
+    def __len__(self):
+        return len(self._timer)
+
+    def sync(self):
+        """DB の実行待ち予約でタイマーを読み込み直す"""
+        items = []
+        for retweet_id, scheduled_at in load_scheduled_retweets(self.db_path):
+            try:
+                items.append((retweet_id, parse_jst_timestamp(scheduled_at)))
+            except (TypeError, ValueError):
+                logger.warning(f"予約ID {retweet_id} の実行時刻を解釈できません: {scheduled_at}")
+        self._timer.replace_all(items)
+        return len(items)
+
+    def schedule(self, retweet_id, scheduled_at):
+        """予約の追加・再スケジュールをタイマーに反映（scheduled_at は JST の日時文字列）"""
+        self._timer.schedule(retweet_id, parse_jst_timestamp(scheduled_at))
+
+    def cancel(self, retweet_id):
+        self._timer.cancel(retweet_id)
+
+    def _on_due(self, retweet_ids):
+        for retweet_id in retweet_ids:
+            self._executor.submit(self._fire, retweet_id)
+
+    def _fire(self, retweet_id):
+        try:
+            retweet = claim_retweet(self.db_path, retweet_id, self.owner, statuses=('scheduled',), due_only=True)
+            if retweet is None:
+                return  # 他の実行者が確保済み・削除済み・再スケジュール済み
+            success, detail = execute_retweet(retweet, self.function_url, self.rate_limits)
+            _, _, retries = settle_retweets(self.db_path, self.owner, [(retweet, success, detail, now_jst_str())],
+                                            self.rate_limits)
+            if retries:
+                self.schedule(retweet_id, retries[0][1])
+                logger.info(f"⏳ 予約ID {retweet_id} ({retweet.get('cast_name')}) はレート制限中のため {retries[0][1]} に再予約しました")
+            elif success:
+                logger.info(f"✅ 予約ID {retweet_id} ({retweet.get('cast_name')}) 実行完了 {detail}")
+            else:
+                logger.warning(f"❌ 予約ID {retweet_id} ({retweet.get('cast_name')}) 実行失敗: {detail}")
+        except Exception as e:
+            logger.exception(f"予約ID {retweet_id} の実行エラー: {e}")
+
+    def stop(self):
+        self._timer.stop()
+        if self._own_executor:
+            self._executor.shutdown(wait=True)
+
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def start_retweet_timer(db_path, **kwargs):
+    """プロセス内のリツイート予約タイマーを起動（起動済みならそれを返す）"""
+    global _timer
+    with _timer_lock:
+        if _timer is not None and _timer.is_alive():
+            return _timer
+        ensure_lease_columns(db_path)
+        _timer = RetweetTimer(db_path, **kwargs).start()
+        return _timer
+
+
+def get_retweet_timer():
+    """起動済みのリツイート予約タイマー（未起動なら None）"""
+    return _timer
+
+
+class RetweetScheduler:
+    """期限切れのリツイート予約を定期的に取得し、ワーカープールで実行する"""
+
+    def __init__(self, db_path=Config.DATABASE_PATH, function_url=None, workers=DEFAULT_WORKERS,
+                 batch_size=DEFAULT_BATCH_SIZE, poll_seconds=DEFAULT_POLL_SECONDS):
+        self.db_path = db_path
+        self.function_url = function_url or Config.get_cloud_functions_url()
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.poll_seconds = poll_seconds
+        self.owner = make_lease_owner("scheduler")
+        self.rate_limits = RateLimitTracker()  # Cloud Functions の 429 応答から記録（アカウント別）
+        self._stop_event = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="retweet")
+
+    def _run_one(self, retweet):
+        success, detail = execute_retweet(retweet, self.function_url, self.rate_limits)
+        return retweet, success, detail, now_jst_str()
+
+    def _claim_and_run(self):
+        claimed = claim_due_retweets(self.db_path, self.owner, self.batch_size)
+        if not claimed:
+            return [], 0, 0, {}
+        results = list(self._executor.map(self._run_one, claimed))
+        completed, failed, retries = settle_retweets(self.db_path, self.owner, results, self.rate_limits)
+        return results, completed, failed, dict(retries)
+
+    def run_once(self):
+        """期限切れの予約を処理する（なくなるまでバッチ単位で繰り返す）
+
+        Returns:
+            tuple: (成功件数, 失敗件数)
+        """
+        total_completed = total_failed = 0
+        while not self._stop_event.is_set():
+            results, completed, failed, retries = self._claim_and_run()
+            if not results:
+                break
+            total_completed += completed
+            total_failed += failed
+            for retweet, success, detail, _ in results:
+                if retweet['id'] in retries:
+                    logger.info(f"⏳ 予約ID {retweet['id']} ({retweet.get('cast_name')}) はレート制限中のため {retries[retweet['id']]} に再予約しました")
+                elif success:
+                    logger.info(f"✅ 予約ID {retweet['id']} ({retweet.get('cast_name')}) 実行完了 {detail}")
+                else:
+                    logger.warning(f"❌ 予約ID {retweet['id']} ({retweet.get('cast_name')}) 実行失敗: {detail}")
+            if len(results) < self.batch_size:
+                break
+        return total_completed, total_failed
+
+    def serve_forever(self):
+        ensure_lease_columns(self.db_path)
+        # 起動時に期限切れの予約（リース切れの実行中を含む）を処理してからタイマーへ切り替える
+        try:
+            self.run_once()
+        except Exception as e:
+            logger.exception(f"スケジューラー処理エラー: {e}")
+
+        timer = RetweetTimer(self.db_path, self.function_url, owner=self.owner, executor=self._executor,
+                             rate_limits=self.rate_limits).start()
+        logger.info(f"🚀 リツイート予約スケジューラーを開始しました（予約 {len(timer)} 件, ワーカー: {self.workers}）")
+
+        # data_version はどのテーブルへのコミットでも変わるため、変化した時は実行待ち予約の指標を比べ、
+        # 予約が変わった時だけ読み込み直す（投稿の編集などでは全件を読み込まない）
+        watch_conn = sqlite3.connect(self.db_path)
+        last_version = watch_conn.execute("PRAGMA data_version").fetchone()[0]
+        last_fingerprint = scheduled_retweets_fingerprint(watch_conn)
+        last_sweep = time.monotonic()
+        try:
+            while not self._stop_event.wait(self.poll_seconds):
+                try:
+                    version = watch_conn.execute("PRAGMA data_version").fetchone()[0]
+                    if version != last_version:
+                        last_version = version
+                        fingerprint = scheduled_retweets_fingerprint(watch_conn)
+                        if fingerprint != last_fingerprint:
+                            last_fingerprint = fingerprint
+                            timer.sync()
+                    if time.monotonic() - last_sweep >= LEASE_SECONDS:
+                        last_sweep = time.monotonic()
+                        self.run_once()  # リース切れの予約を回収
+                except Exception as e:
+                    logger.exception(f"スケジューラー処理エラー: {e}")
+        finally:
+            watch_conn.close()
+            timer.stop()
+            self.close()
+        logger.info("🛑 リツイート予約スケジューラーを停止しました")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIcast room リツイート予約スケジューラー")
+    parser.add_argument("--db", default=Config.DATABASE_PATH, help="SQLiteデータベースのパス")
+    parser.add_argument("--interval", type=int, default=DEFAULT_POLL_SECONDS, help="予約の変更確認の間隔（秒）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="同時実行数")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="1回に取得する予約数")
+    parser.add_argument("--once", action="store_true", help="期限切れの予約を1回だけ処理して終了")
+    parser.add_argument("--metrics-port", type=int, default=Config.METRICS_PORT,
+                        help="Prometheus 形式のメトリクスを公開するポート（0 の場合は公開しない）")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout), logging.FileHandler(Config.RETWEET_LOG_PATH, encoding="utf-8")]
+    )
+
+    scheduler = RetweetScheduler(
+        db_path=args.db,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        poll_seconds=args.interval
+    )
+
+    if args.once:
+        ensure_lease_columns(args.db)
+        completed, failed = scheduler.run_once()
+        scheduler.close()
+        print(f"✅ 完了: 成功 {completed} 件 / 失敗 {failed} 件")
+        return
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port, args.db)
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    try:
+        scheduler.serve_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        print("\n🛑 スケジューラーを停止します...")
+
+
+if __name__ == "__main__":
+    main()
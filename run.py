@@ -2,6 +2,7 @@
 """
 AIcast room アプリケーション起動スクリプト（Python版）
 """
+import argparse
 import os
 import sys
 import subprocess
@@ -31,7 +32,30 @@ def find_streamlit_process():
         pass
     return None
 
+def prewarm_before_start():
+    """起動前のウォームアップ（処理ごとの所要時間を表示）
+    
+    このプロセスは Streamlit を別プロセスで起動するため、ここではファイル上で完結する
+    DBスキーマの反映と Sheets トークンの更新のみ行う。Vertex AI・X API クライアントは
+    Streamlit プロセスでログイン後にバックグラウンドで準備する
+    """
+    from prewarm import disk_tasks, format_prewarm_results, run_prewarm
+    
+    print("🔥 ウォームアップ中（DBスキーマ・Sheetsトークン）...")
+    started = time.perf_counter()
+    results = run_prewarm(disk_tasks())
+    print(format_prewarm_results(results))
+    print(f"🔥 ウォームアップ完了 ({(time.perf_counter() - started) * 1000:.1f} ms)")
+    
+    # Streamlitプロセス側ではログイン後にプロセス共通のクライアント・モデルを準備
+    os.environ["PREWARM_ON_START"] = "true"
+
 def main():
+    parser = argparse.ArgumentParser(description="AIcast room アプリケーション起動")
+    parser.add_argument("--prewarm", action="store_true", help="起動前にDBスキーマ・Sheetsトークンを準備し、ログイン後にVertex AI・X APIを準備する")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Prometheus 形式のメトリクスを公開するポート")
+    args = parser.parse_args()
+    
     print("🚀 AIcast room アプリケーションを起動中...")
     
     # ポート8502の使用状況をチェック
@@ -89,6 +113,14 @@ def main():
         print("💡 アプリは起動しますが、AI機能は認証後に利用可能になります")
         print("   認証方法: アプリの「システム設定」→「Google Cloud認証」で設定可能")
     
+    if args.prewarm:
+        prewarm_before_start()
+    
+    if args.metrics_port:
+        # メトリクスは Streamlit プロセス内で集計するため、公開用サーバーもそのプロセスで起動する
+        os.environ["METRICS_PORT"] = str(args.metrics_port)
+        print(f"📈 メトリクス: http://localhost:{args.metrics_port}/metrics（最初のアクセスで公開開始。ログイン前から取得できます）")
+    
     # Streamlitアプリケーションを起動
     print(f"🚀 ポート {port} でアプリケーションを起動します...")
     try:
@@ -0,0 +1,328 @@
+# 予約実行のクレーム（確保）とリース
+# リツイート予約・投稿の送信を実行する前に、1つの UPDATE 文で「実行中」にしてリース（有効期限）を付ける。
+# 複数のオペレーターやスケジューラーが同じ行を二重に実行しないようにし、
+# 実行中のプロセスが落ちた場合はリース切れの行を他の実行者が再取得できる
+
+import datetime
+import os
+import socket
+import sqlite3
+import uuid
+
+JST = datetime.timezone(datetime.timedelta(hours=9))
+
+LEASE_SECONDS = 300  # 実行中のまま応答がない場合に再取得可能になるまでの秒数
+
+
+def _now():
+    return datetime.datetime.now(JST)
+
+
+def _format(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def make_lease_owner(prefix):
+    """リース所有者の識別子（ホスト名・PID・ランダム値）"""
+    return f"{prefix}:{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def ensure_lease_columns(db_path):
+    """リース用の列を追加（テーブルが存在しない場合は何もしない）"""
+    columns = {
+        'retweet_schedules': [('lease_until', 'TEXT'), ('lease_owner', 'TEXT')],
+        'posts': [('lease_until', 'TEXT')],
+    }
+    conn = _connect(db_path)
+    try:
+        for table, table_columns in columns.items():
+            existing = [row['name'] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if not existing:
+                continue
+            for column, definition in table_columns:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# --- リツイート予約 ---
+
+def _attach_accounts(conn, retweets):
+    """確保した予約にキャスト名と X アカウント名（cast_name, twitter_username）を付ける"""
+    cast_ids = sorted({retweet['cast_id'] for retweet in retweets})
+    placeholders = ",".join("?" * len(cast_ids))
+    accounts = {row['id']: row for row in conn.execute(f"""
+        SELECT c.id, c.name, cxc.twitter_username
+        FROM casts c
+        LEFT JOIN cast_x_credentials cxc ON cxc.cast_id = c.id
+        WHERE c.id IN ({placeholders})
+    """, cast_ids)}
+    for retweet in retweets:
+        account = accounts.get(retweet['cast_id'])
+        retweet['cast_name'] = account['name'] if account else None
+        retweet['twitter_username'] = account['twitter_username'] if account else None
+    return retweets
+
+
+def load_scheduled_retweets(db_path):
+    """実行待ちの予約の (予約ID, 実行時刻) 一覧（タイマーへの読み込み用）"""
+    conn = _connect(db_path)
+    try:
+        return [(row['id'], row['scheduled_at']) for row in conn.execute(
+            "SELECT id, scheduled_at FROM retweet_schedules WHERE status = 'scheduled'"
+        )]
+    finally:
+        conn.close()
+
+
+def scheduled_retweets_fingerprint(conn):
+    """実行待ちの予約の (件数, 最大ID, 実行時刻の合計) ― 追加・削除・再スケジュールで変わる軽い指標
+
+    conn は呼び出し側で保持している接続（常駐スケジューラーの監視用）
+    """
+    return tuple(conn.execute("""
+        SELECT COUNT(*), COALESCE(MAX(id), 0), TOTAL(julianday(scheduled_at))
+        FROM retweet_schedules WHERE status = 'scheduled'
+    """).fetchone())
+
+
+def claim_due_retweets(db_path, owner, limit, lease_seconds=LEASE_SECONDS):
+    """実行時刻を過ぎた予約とリース切れの実行中予約をまとめて確保する
+
+    Returns:
+        list: 確保した予約（cast_name, twitter_username を含む）
+    """
+    now = _now()
+    now_str = _format(now)
+    lease_str = _format(now + datetime.timedelta(seconds=lease_seconds))
+    conn = _connect(db_path)
+    try:
+        with conn:
+            claimed = conn.execute("""
+                UPDATE retweet_schedules
+                SET status = 'running', lease_until = ?, lease_owner = ?
+                WHERE id IN (
+                    SELECT id FROM retweet_schedules
+                    WHERE (status = 'scheduled' AND scheduled_at <= ?)
+                       OR (status = 'running' AND (lease_until IS NULL OR lease_until < ?))
+                    ORDER BY scheduled_at
+                    LIMIT ?
+                )
+                AND (status = 'scheduled' OR (status = 'running' AND (lease_until IS NULL OR lease_until < ?)))
+                RETURNING id, cast_id, tweet_id, comment, scheduled_at
+            """, (lease_str, owner, now_str, now_str, limit, now_str)).fetchall()
+        if not claimed:
+            return []
+        retweets = _attach_accounts(conn, [dict(row) for row in claimed])
+        return sorted(retweets, key=lambda retweet: retweet['scheduled_at'])
+    finally:
+        conn.close()
+
+
+def claim_retweet(db_path, retweet_id, owner, statuses=('scheduled', 'failed'), lease_seconds=LEASE_SECONDS,
+                  due_only=False):
+    """指定した予約を1件確保する（due_only=True の場合は実行時刻を過ぎた予約のみ）
+
+    Returns:
+        dict: 確保した予約（cast_name, twitter_username を含む）。他の実行者が実行中・実行済みの場合は None
+    """
+    now = _now()
+    now_str = _format(now)
+    lease_str = _format(now + datetime.timedelta(seconds=lease_seconds))
+    placeholders = ",".join("?" * len(statuses))
+    due_condition = "AND scheduled_at <= ?" if due_only else ""
+    due_params = (now_str,) if due_only else ()
+    conn = _connect(db_path)
+    try:
+        with conn:
+            row = conn.execute(f"""
+                UPDATE retweet_schedules
+                SET status = 'running', lease_until = ?, lease_owner = ?
+                WHERE id = ?
+                  AND (status IN ({placeholders})
+                       OR (status = 'running' AND (lease_until IS NULL OR lease_until < ?)))
+                  {due_condition}
+                RETURNING id, cast_id, tweet_id, comment, scheduled_at
+            """, (lease_str, owner, retweet_id, *statuses, now_str, *due_params)).fetchone()
+            if row is None:
+                return None
+        return _attach_accounts(conn, [dict(row)])[0]
+    finally:
+        conn.close()
+
+
+def finish_retweets(db_path, owner, results):
+    """実行結果をまとめて書き戻す（自分のリースが有効な行のみ更新）
+
+    Args:
+        results (list): (予約ID, 成功True/失敗False, 結果ツイートIDまたはエラーメッセージ, 実行時刻) のリスト。
+            失敗時に実行時刻が None の場合は executed_at を変更しない
+
+    Returns:
+        tuple: (成功として反映した件数, 失敗として反映した件数)
+    """
+    completed = [(executed_at, detail, retweet_id, owner) for retweet_id, success, detail, executed_at in results if success]
+    failed = [(executed_at, detail, retweet_id, owner) for retweet_id, success, detail, executed_at in results if not success]
+    conn = _connect(db_path)
+    try:
+        with conn:
+            completed_count = conn.executemany("""
+                UPDATE retweet_schedules
+                SET status = 'completed', executed_at = ?, result_tweet_id = ?, error_message = NULL,
+                    lease_until = NULL, lease_owner = NULL
+                WHERE id = ? AND status = 'running' AND lease_owner = ?
+            """, completed).rowcount
+            failed_count = conn.executemany("""
+                UPDATE retweet_schedules
+                SET status = 'failed', executed_at = COALESCE(?, executed_at), error_message = ?,
+                    lease_until = NULL, lease_owner = NULL
+                WHERE id = ? AND status = 'running' AND lease_owner = ?
+            """, failed).rowcount
+        return max(completed_count, 0), max(failed_count, 0)
+    finally:
+        conn.close()
+
+
+def reschedule_retweets(db_path, owner, retries):
+    """レート制限で実行できなかった予約を再実行可能時刻に予約し直す（自分のリースが有効な行のみ更新）
+
+    Args:
+        retries (list): (予約ID, 再実行時刻（JST文字列）, 理由) のリスト
+
+    Returns:
+        int: 予約し直した件数
+    """
+    if not retries:
+        return 0
+    conn = _connect(db_path)
+    try:
+        with conn:
+            rescheduled = conn.executemany("""
+                UPDATE retweet_schedules
+                SET status = 'scheduled', scheduled_at = ?, error_message = ?,
+                    lease_until = NULL, lease_owner = NULL
+                WHERE id = ? AND status = 'running' AND lease_owner = ?
+            """, [(retry_at, reason, retweet_id, owner) for retweet_id, retry_at, reason in retries]).rowcount
+        return max(rescheduled, 0)
+    finally:
+        conn.close()
+
+
+def reschedule_failed_retweet(db_path, retweet_id, scheduled_at):
+    """失敗した予約を指定時刻に予約し直す（他の実行者が実行中の予約・実行済みの予約は変更しない）
+
+    Returns:
+        bool: 予約し直した場合 True
+    """
+    conn = _connect(db_path)
+    try:
+        with conn:
+            updated = conn.execute("""
+                UPDATE retweet_schedules
+                SET scheduled_at = ?, status = 'scheduled', error_message = NULL, executed_at = NULL,
+                    lease_until = NULL, lease_owner = NULL
+                WHERE id = ? AND status = 'failed'
+            """, (scheduled_at, retweet_id)).rowcount
+        return updated > 0
+    finally:
+        conn.close()
+
+
+# --- 投稿の送信 ---
+
+def claim_posts(db_path, post_ids, lease_seconds=LEASE_SECONDS):
+    """送信する投稿を 'sending' にして確保する（未送信・予約中・リース切れの送信中のみ）
+
+    Returns:
+        set: 確保できた投稿ID
+    """
+    if not post_ids:
+        return set()
+    now = _now()
+    now_str = _format(now)
+    lease_str = _format(now + datetime.timedelta(seconds=lease_seconds))
+    placeholders = ",".join("?" * len(post_ids))
+    conn = _connect(db_path)
+    try:
+        with conn:
+            rows = conn.execute(f"""
+                UPDATE posts
+                SET sent_status = 'sending', lease_until = ?
+                WHERE id IN ({placeholders})
+                  AND (sent_status IS NULL OR sent_status IN ('not_sent', 'scheduled')
+                       OR (sent_status = 'sending' AND (lease_until IS NULL OR lease_until < ?)))
+                RETURNING id
+            """, (lease_str, *post_ids, now_str)).fetchall()
+        return {row['id'] for row in rows}
+    finally:
+        conn.close()
+
+
+def renew_post_leases(db_path, post_ids, lease_seconds=LEASE_SECONDS):
+    """送信中の投稿のリースを延長する（一括送信で1件完了するごとに、未完了の投稿に対して呼ぶ）
+
+    Returns:
+        int: 延長した件数
+    """
+    if not post_ids:
+        return 0
+    lease_str = _format(_now() + datetime.timedelta(seconds=lease_seconds))
+    placeholders = ",".join("?" * len(post_ids))
+    conn = _connect(db_path)
+    try:
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE posts SET lease_until = ? WHERE id IN ({placeholders}) AND sent_status = 'sending'",
+                (lease_str, *post_ids)
+            )
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def _expired_post_lease_condition(cast_id):
+    condition = "sent_status = 'sending' AND (lease_until IS NULL OR lease_until < ?)"
+    params = [_format(_now())]
+    if cast_id is not None:
+        condition += " AND cast_id = ?"
+        params.append(cast_id)
+    return condition, params
+
+
+def count_expired_post_leases(db_path, cast_id=None):
+    """送信中のまま期限切れになった投稿の件数（送信中にプロセスが停止したもの）"""
+    condition, params = _expired_post_lease_condition(cast_id)
+    conn = _connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM posts WHERE {condition}", params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def release_expired_post_leases(db_path, cast_id=None):
+    """送信中のまま期限切れになった投稿を未送信に戻す
+
+    送信中の投稿は一括送信の進行中にリースが延長されるため、期限切れは送信したプロセスが停止したことを示す。
+    画面の再実行ごとには呼ばず、オペレーターの操作で実行する。
+
+    Returns:
+        int: 戻した件数
+    """
+    condition, params = _expired_post_lease_condition(cast_id)
+    conn = _connect(db_path)
+    try:
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE posts SET sent_status = 'not_sent', lease_until = NULL WHERE {condition}", params
+            )
+        return cursor.rowcount
+    finally:
+        conn.close()
@@ -0,0 +1,355 @@
+# 送信アウトボックス
+# 投稿の状態変更と送信依頼を同一トランザクションで記録し、
+# バックグラウンドのディスパッチャーが少なくとも1回（at-least-once）送信する
+#
+# 冪等キー（idempotency_key）はキュー登録時の二重登録を防ぐためのもので、送信先
+# （Google Sheets / GAS / Cloud Functions）には渡らない。送信が成功してから完了を記録するまでに
+# プロセスが停止した場合は、リース切れ後に同じ投稿が再送され、送信先で重複することがある
+
+import datetime
+import logging
+import sqlite3
+import threading
+
+from bulk_sender import BulkSendEngine
+
+logger = logging.getLogger("send_outbox")
+
+JST = datetime.timezone(datetime.timedelta(hours=9))
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+OUTBOX_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS send_outbox (
+        id INTEGER PRIMARY KEY,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        post_id INTEGER,
+        cast_id INTEGER,
+        cast_name TEXT,
+        content TEXT NOT NULL,
+        destination TEXT NOT NULL,
+        scheduled_datetime TEXT,
+        status TEXT DEFAULT 'pending',  -- 'pending', 'sending', 'sent', 'dead'
+        attempts INTEGER DEFAULT 0,
+        max_attempts INTEGER DEFAULT 5,
+        next_attempt_at TEXT,
+        lease_until TEXT,
+        last_error TEXT,
+        created_at TEXT,
+        updated_at TEXT,
+        sent_at TEXT,
+        FOREIGN KEY(post_id) REFERENCES posts(id) ON DELETE CASCADE
+    )
+"""
+OUTBOX_INDEX_QUERY = "CREATE INDEX IF NOT EXISTS idx_send_outbox_status_next ON send_outbox(status, next_attempt_at)"
+
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30      # 30秒, 60秒, 120秒 ... と指数的に延ばす
+RETRY_MAX_SECONDS = 30 * 60
+LEASE_SECONDS = 5 * 60       # 送信中にプロセスが落ちた場合、この時間後に再送対象へ戻す
+LEASE_EXPIRED_MESSAGE = "送信中にリースが切れました（送信処理が完了しませんでした）"
+
+
+def _now():
+    return datetime.datetime.now(JST)
+
+
+def _format(dt):
+    return dt.strftime(TIME_FORMAT)
+
+
+def make_idempotency_key(post_id, destination):
+    """同じ投稿を同じ送信先へ二重に積まないためのキー（送信先での重複排除には使われない）"""
+    return f"post-{post_id}-{destination}"
+
+
+class SendOutbox:
+    """send_outbox テーブルへのアクセスをまとめたクラス"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    def ensure_schema(self):
+        """アウトボックステーブルを作成"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(OUTBOX_TABLE_QUERY)
+                conn.execute(OUTBOX_INDEX_QUERY)
+        finally:
+            conn.close()
+
+    def enqueue_posts(self, jobs, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """投稿を送信待ちに変更し、アウトボックスに積む（1トランザクション）
+
+        未送信・予約中の投稿のみ対象（schedule_lease.claim_posts と同じ条件）。直接送信で確保済みの
+        送信中・送信済みの投稿は積まない。既に送信待ち・送信済みのキーは無視し、デッドレター済みのキーは再投入する。
+
+        Args:
+            jobs (list[dict]): post_id, cast_name, content, scheduled_datetime, destination, cast_id を持つ辞書
+
+        Returns:
+            int: 新たに送信待ちになった件数
+        """
+        now_str = _format(_now())
+        enqueued = 0
+        queued_post_ids = set()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for job in jobs:
+                    scheduled = job.get('scheduled_datetime')
+                    scheduled_str = _format(scheduled) if isinstance(scheduled, datetime.datetime) else scheduled
+                    conn.execute("SAVEPOINT enqueue_post")
+                    # 先に投稿を送信待ちへ変更し、変更できた投稿だけを積む（同じ呼び出しで積んだ投稿の別送信先は対象）
+                    if job['post_id'] not in queued_post_ids:
+                        flipped = conn.execute("""
+                            UPDATE posts SET sent_status = 'queued'
+                            WHERE id = ? AND (sent_status IS NULL OR sent_status IN ('not_sent', 'scheduled'))
+                            RETURNING id
+                        """, (job['post_id'],)).fetchone()
+                        if flipped is None:
+                            conn.execute("RELEASE enqueue_post")
+                            continue
+                    cursor = conn.execute("""
+                        INSERT INTO send_outbox
+                        (idempotency_key, post_id, cast_id, cast_name, content, destination, scheduled_datetime,
+                         status, attempts, max_attempts, next_attempt_at, created_at, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?, ?, ?)
+                        ON CONFLICT(idempotency_key) DO UPDATE SET
+                            content = excluded.content,
+                            scheduled_datetime = excluded.scheduled_datetime,
+                            status = 'pending', attempts = 0, last_error = NULL, lease_until = NULL,
+                            next_attempt_at = excluded.next_attempt_at, updated_at = excluded.updated_at
+                        WHERE send_outbox.status = 'dead'
+                    """, (make_idempotency_key(job['post_id'], job['destination']), job['post_id'], job.get('cast_id'),
+                          job['cast_name'], job['content'], job['destination'], scheduled_str,
+                          max_attempts, now_str, now_str, now_str))
+                    if cursor.rowcount:
+                        queued_post_ids.add(job['post_id'])
+                        enqueued += 1
+                    else:
+                        conn.execute("ROLLBACK TO enqueue_post")  # 既に積まれているキーなら投稿の状態も戻す
+                    conn.execute("RELEASE enqueue_post")
+        finally:
+            conn.close()
+        return enqueued
+
+    def claim_batch(self, limit=20):
+        """送信対象の行をリースを付けて確保する
+
+        pending で再送時刻を過ぎた行と、リース切れの sending 行（送信中にプロセスが落ちたもの）が対象。
+        リース切れの行は1回分の試行として数え、再送上限に達していればデッドレターにして返さない。
+        """
+        now = _now()
+        now_str = _format(now)
+        lease_str = _format(now + datetime.timedelta(seconds=LEASE_SECONDS))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute("""
+                    SELECT * FROM send_outbox
+                    WHERE (status = 'pending' AND (next_attempt_at IS NULL OR next_attempt_at <= ?))
+                       OR (status = 'sending' AND lease_until < ?)
+                    ORDER BY next_attempt_at, id
+                    LIMIT ?
+                """, (now_str, now_str, limit)).fetchall()
+                claimed = []
+                for row in rows:
+                    row = dict(row)
+                    if row['status'] == 'sending':
+                        row['attempts'] += 1
+                        if row['attempts'] >= row['max_attempts']:
+                            self._dead_letter(conn, row, row['attempts'], LEASE_EXPIRED_MESSAGE, now_str)
+                            continue
+                    conn.execute(
+                        "UPDATE send_outbox SET status = 'sending', attempts = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                        (row['attempts'], lease_str, now_str, row['id'])
+                    )
+                    claimed.append(row)
+            return claimed
+        finally:
+            conn.close()
+
+    def complete(self, results):
+        """送信結果をまとめて反映（投稿状態・送信履歴・アウトボックスを1トランザクションで更新）"""
+        now = _now()
+        now_str = _format(now)
+        conn = self._connect()
+        try:
+            with conn:
+                for result in results:
+                    if result['success']:
+                        conn.execute(
+                            "UPDATE send_outbox SET status = 'sent', sent_at = ?, lease_until = NULL, last_error = NULL, updated_at = ? WHERE id = ?",
+                            (now_str, now_str, result['outbox_id'])
+                        )
+                        conn.execute("UPDATE posts SET sent_status = 'sent', sent_at = ? WHERE id = ?", (now_str, result['post_id']))
+                        conn.execute(
+                            "INSERT INTO send_history (post_id, destination, sent_at, scheduled_datetime, status) VALUES (?, ?, ?, ?, ?)",
+                            (result['post_id'], result['destination'], now_str, result['scheduled_datetime'], 'completed')
+                        )
+                        continue
+
+                    attempts = result['attempts'] + 1
+                    if attempts >= result['max_attempts']:
+                        self._dead_letter(conn, {
+                            'id': result['outbox_id'], 'post_id': result['post_id'],
+                            'destination': result['destination'], 'scheduled_datetime': result['scheduled_datetime'],
+                        }, attempts, result['message'], now_str)
+                    else:
+                        delay = min(RETRY_BASE_SECONDS * (2 ** (attempts - 1)), RETRY_MAX_SECONDS)
+                        conn.execute(
+                            "UPDATE send_outbox SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                            (attempts, result['message'], _format(now + datetime.timedelta(seconds=delay)), now_str, result['outbox_id'])
+                        )
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _dead_letter(conn, row, attempts, message, now_str):
+        """デッドレター：投稿を未送信に戻して失敗履歴を残す（呼び出し側のトランザクション内で実行）"""
+        conn.execute(
+            "UPDATE send_outbox SET status = 'dead', attempts = ?, last_error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+            (attempts, message, now_str, row['id'])
+        )
+        conn.execute("UPDATE posts SET sent_status = 'not_sent' WHERE id = ? AND sent_status = 'queued'", (row['post_id'],))
+        conn.execute(
+            "INSERT INTO send_history (post_id, destination, sent_at, scheduled_datetime, status, error_message) VALUES (?, ?, ?, ?, ?, ?)",
+            (row['post_id'], row['destination'], now_str, row['scheduled_datetime'], 'failed', message)
+        )
+
+    def get_status_counts(self, cast_id=None):
+        """ステータス別の件数を取得"""
+        conn = self._connect()
+        try:
+            if cast_id is None:
+                rows = conn.execute("SELECT status, COUNT(*) as count FROM send_outbox GROUP BY status").fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT status, COUNT(*) as count FROM send_outbox WHERE cast_id = ? GROUP BY status", (cast_id,)
+                ).fetchall()
+            return {row['status']: row['count'] for row in rows}
+        finally:
+            conn.close()
+
+    def get_dead_letters(self, cast_id=None, limit=50):
+        """デッドレター（再送上限に達した送信）を取得"""
+        conn = self._connect()
+        try:
+            query = "SELECT * FROM send_outbox WHERE status = 'dead'"
+            params = []
+            if cast_id is not None:
+                query += " AND cast_id = ?"
+                params.append(cast_id)
+            query += " ORDER BY updated_at DESC LIMIT ?"
+            params.append(limit)
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+        finally:
+            conn.close()
+
+    def requeue_dead(self, outbox_ids):
+        """デッドレターを再投入"""
+        now_str = _format(_now())
+        conn = self._connect()
+        try:
+            with conn:
+                for outbox_id in outbox_ids:
+                    cursor = conn.execute(
+                        "UPDATE send_outbox SET status = 'pending', attempts = 0, last_error = NULL, next_attempt_at = ?, updated_at = ? WHERE id = ? AND status = 'dead'",
+                        (now_str, now_str, outbox_id)
+                    )
+                    if cursor.rowcount:
+                        conn.execute(
+                            "UPDATE posts SET sent_status = 'queued' WHERE id = (SELECT post_id FROM send_outbox WHERE id = ?)",
+                            (outbox_id,)
+                        )
+        finally:
+            conn.close()
+
+
+class OutboxDispatcher(threading.Thread):
+    """アウトボックスを定期的に取り出して送信するデーモンスレッド"""
+
+    def __init__(self, outbox, send_func, poll_interval=5.0, batch_size=20, concurrency_limits=None):
+        super().__init__(name="send-outbox-dispatcher", daemon=True)
+        self.outbox = outbox
+        self.send_func = send_func
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.concurrency_limits = concurrency_limits
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def wake(self):
+        """ポーリング間隔を待たずに次の取り出しを行う"""
+        self._wake_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def dispatch_once(self):
+        """1バッチ分を送信して処理件数を返す"""
+        rows = self.outbox.claim_batch(self.batch_size)
+        if not rows:
+            return 0
+
+        jobs = []
+        for row in rows:
+            scheduled = row['scheduled_datetime']
+            jobs.append({
+                'outbox_id': row['id'],
+                'post_id': row['post_id'],
+                'cast_name': row['cast_name'],
+                'content': row['content'],
+                'scheduled_datetime': datetime.datetime.strptime(scheduled, TIME_FORMAT) if scheduled else _now(),
+                'destination': row['destination'],
+                'cast_id': row['cast_id'],
+                'attempts': row['attempts'],
+                'max_attempts': row['max_attempts'],
+            })
+
+        results = BulkSendEngine(self.send_func, self.concurrency_limits).run(jobs)
+        for result in results:
+            result['scheduled_datetime'] = _format(result['scheduled_datetime'])
+        self.outbox.complete(results)
+        return len(results)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                processed = self.dispatch_once()
+            except Exception as e:
+                logger.exception(f"アウトボックス送信エラー: {e}")
+                processed = 0
+            if processed:
+                continue  # 積み残しがあればすぐ次のバッチへ
+            self._wake_event.wait(self.poll_interval)
+            self._wake_event.clear()
+
+
+# プロセス共通のディスパッチャー（Streamlitの再実行をまたいで1つだけ起動する）
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def start_outbox_dispatcher(db_path, send_func, **kwargs):
+    """ディスパッチャーを起動（起動済みなら送信関数だけ差し替えて返す）"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is not None and _dispatcher.is_alive():
+            _dispatcher.send_func = send_func
+            return _dispatcher
+        outbox = SendOutbox(db_path)
+        outbox.ensure_schema()
+        _dispatcher = OutboxDispatcher(outbox, send_func, **kwargs)
+        _dispatcher.start()
+        return _dispatcher
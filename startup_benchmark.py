@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+AIcast room 起動時間ベンチマーク
+
+各SDKのインポート時間を `python -X importtime` で計測し、ログイン画面の表示までに
+読み込まれるモジュール（auth_system / config）とアプリ用モジュールが重いSDKを
+読み込んでいないかを確認する。計測はそれぞれ新しいプロセスで行う。
+
+使い方:
+    python3 startup_benchmark.py
+    python3 startup_benchmark.py --repeat 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "streamlit",
+    "pandas",
+    "vertexai",
+    "gspread",
+    "google.oauth2.service_account",
+    "tweepy",
+    "requests",
+    "PIL",
+]
+
+# ログイン画面の表示までに読み込むモジュール
+LOGIN_MODULES = ["auth_system", "config", "lazy_imports"]
+
+# ログイン後にアプリが読み込むモジュール（app.py 以外）
+APP_MODULES = [
+    "x_api_poster", "bulk_sender", "send_outbox", "schedule_lease", "data_cache",
+    "drive_url", "media_pipeline", "retweet_scheduler", "post_senders", "post_generation",
+]
+
+# 最初に使う時点まで読み込みを遅らせるSDK
+DEFERRED_MODULES = ["pandas", "vertexai", "gspread", "google.oauth2.service_account", "tweepy", "PIL"]
+
+
+def measure_import(module_name):
+    """新しいプロセスでモジュールをインポートし、累積インポート時間（ミリ秒）を返す
+
+    Returns:
+        float: 所要時間（ミリ秒）。インストールされていない場合は None
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    # 指定モジュールと親パッケージ（-c から直接インポートされた行）の累積時間を合計
+    packages = {".".join(module_name.split(".")[:depth]) for depth in range(1, module_name.count(".") + 2)}
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2]
+        if name.startswith("  "):
+            continue  # 他のモジュールから読み込まれた行
+        if name.strip() in packages:
+            cumulative_us += int(parts[1])
+    return cumulative_us / 1000
+
+
+def loaded_heavy_modules(module_names):
+    """モジュールをインポートした後に読み込まれている重いSDKの一覧"""
+    imports = "; ".join(f"import {name}" for name in module_names)
+    check = (
+        "import sys; "
+        f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", f"{imports}; {check}"], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "不明なエラー"
+    output = result.stdout.strip().splitlines()
+    loaded = output[-1] if output else ""
+    return [name for name in loaded.split(",") if name], None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIcast room 起動時間ベンチマーク")
+    parser.add_argument("--repeat", type=int, default=3, help="各モジュールの計測回数（中央値を表示）")
+    args = parser.parse_args()
+
+    print("📦 SDK別インポート時間（-X importtime, 中央値）")
+    for module_name in HEAVY_MODULES:
+        samples = [measure_import(module_name) for _ in range(max(1, args.repeat))]
+        if any(sample is None for sample in samples):
+            print(f"  {module_name:<32} 未インストール")
+            continue
+        print(f"  {module_name:<32} {statistics.median(samples):8.1f} ms")
+
+    for label, module_names in (("ログイン画面", LOGIN_MODULES), ("アプリ用モジュール", APP_MODULES)):
+        loaded, error = loaded_heavy_modules(module_names)
+        if error:
+            print(f"\n⚠️ {label}: 読み込みに失敗しました（{error}）")
+        elif loaded:
+            print(f"\n❌ {label}: 重いSDKを読み込んでいます: {', '.join(loaded)}")
+        else:
+            print(f"\n✅ {label}: 重いSDKを読み込まずに表示できます")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+AIcast room 大規模データベース生成ツール
+
+同梱の casting_office.db をコピーし（シチュエーション・アドバイス・設定などはそのまま）、
+本番相当の件数のキャスト・投稿・チューニング履歴・送信履歴・リツイート予約を追加する。
+インデックスやベンチマーク（offline_benchmark.py --db）の検証に使う。元のデータベースは変更しない。
+
+使い方:
+    python3 synthetic_db.py --out /tmp/aicast_large.db                           # キャスト2,000名・投稿100万件
+    python3 synthetic_db.py --out /tmp/aicast_small.db --casts 200 --posts-per-cast 50
+    python3 offline_benchmark.py --db /tmp/aicast_large.db --scenario dashboard --posts-per-cast 0
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import time
+
+from config import Config
+from generation_usage import GenerationUsageLedger
+from schedule_lease import ensure_lease_columns
+from send_outbox import SendOutbox
+
+JST = datetime.timezone(datetime.timedelta(hours=9))
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+CHUNK_SIZE = 20000  # executemany 1回あたりの行数
+
+# app.py の init_db が作成するインデックス（生成後のデータベースをアプリ起動後と同じ状態にする）
+APP_INDEX_QUERIES = [
+    "CREATE INDEX IF NOT EXISTS idx_posts_cast_status_created ON posts(cast_id, status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_send_history_post_id ON send_history(post_id)",
+]
+
+# 投稿の (status, sent_status) と割合。本番データの分布（送信済みの承認投稿が多く、下書きと却下が続く）に合わせる
+POST_STATES = [
+    (('draft', 'not_sent'), 0.22),
+    (('approved', 'not_sent'), 0.06),
+    (('approved', 'scheduled'), 0.04),
+    (('approved', 'sent'), 0.42),
+    (('approved', 'failed'), 0.03),
+    (('approved', None), 0.01),
+    (('rejected', 'not_sent'), 0.18),
+    (('rejected', 'sent'), 0.03),
+    (('draft', 'approved'), 0.01),
+]
+EVALUATIONS = ['未評価', '◎', '◯', '△', '×']
+DESTINATIONS = ['google_sheets', 'x_api']
+SEND_ERRORS = [
+    'Google Sheets認証ファイルが見つかりません。credentials/service-account-key.jsonを配置してください。',
+    'APIError: [429]: Quota exceeded for quota metric',
+    'HTTP 503: Service Unavailable',
+    '429 Too Many Requests',
+]
+RETWEET_ERRORS = ['HTTP 429: Too Many Requests', 'ツイートが見つかりません', 'HTTP 500: Internal Server Error']
+
+FAMILY_NAMES = ['佐藤', '鈴木', '高橋', '田中', '伊藤', '渡辺', '山本', '中村', '小林', '加藤', '星野', '谷澤', '沢尻', '桜井']
+GIVEN_NAMES = ['あおい', 'ひなた', 'さくら', 'みれい', 'しおり', 'まみ', 'ゆい', 'りん', 'かのん', 'めい', 'ねね', 'あかり']
+PERSONALITIES = ['物静かで穏やかな聞き上手', '明るく元気なムードメーカー', 'クールで少し毒舌', '甘えん坊で寂しがり屋']
+SPEECH_STYLES = ['です・ます調の丁寧な言葉遣い', 'タメ口でフランク', '関西弁', 'ゆるい語尾（〜だよぉ）']
+THEMES = ['お気に入りの喫茶店で読書中', '雨の日の出勤前', '新作コスメを試した', '週末の焼肉', '推しのライブ帰り',
+          '新しいガジェットを買った', '同伴前のカフェ', '休日の散歩']
+FRAGMENTS = ['窓際の席で、雨の音をBGMに読書中。', '今日も一日おつかれさま☕️', '新しいリップ、思ったより色が映える💄',
+             '焼肉はタン塩から派です🥩', 'お店で待ってるね✨', 'ちょっと寝不足…でも頑張る！', '週末はどこ行こうかな🚃',
+             '#AIcast', 'みんなの好きな季節はいつ？', '今夜もよろしくお願いします🌙']
+ADVICE = ['もっと可愛く', 'もっと大人っぽく', '絵文字を増やして', '短くして', '晴れた日で', '季節感を出して']
+
+
+def _format(dt):
+    return dt.strftime(TIME_FORMAT)
+
+
+class SyntheticDataGenerator:
+    """コピーしたデータベースにキャスト・投稿・履歴を追加する
+
+    Args:
+        db_path (str): 書き込み先のデータベース（コピー済み）
+        casts (int): 追加するキャスト数
+        posts_per_cast (int): キャストあたりの平均投稿数（0.5〜1.5倍でばらつかせる）
+        days (int): 投稿の作成日時を分布させる日数（今日まで）
+        seed (int): 乱数シード（同じ引数なら同じデータ）
+    """
+
+    def __init__(self, db_path, casts=2000, posts_per_cast=500, days=365, credential_ratio=0.6,
+                 tuning_ratio=0.3, retweets_per_cast=20, seed=42):
+        self.db_path = db_path
+        self.casts = casts
+        self.posts_per_cast = posts_per_cast
+        self.days = days
+        self.credential_ratio = credential_ratio
+        self.tuning_ratio = tuning_ratio
+        self.retweets_per_cast = retweets_per_cast
+        self._random = random.Random(seed)
+        self.now = datetime.datetime.now(JST).replace(microsecond=0)
+        self.counts = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        # 生成中はジャーナル・同期を止めて書き込みを速くする（失敗したら作り直す前提）
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        return conn
+
+    def _insert(self, conn, table, columns, rows):
+        """rows（ジェネレーター可）を CHUNK_SIZE 件ずつ挿入して件数を返す"""
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        total = 0
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= CHUNK_SIZE:
+                conn.executemany(query, chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            conn.executemany(query, chunk)
+            total += len(chunk)
+        conn.commit()
+        self.counts[table] = self.counts.get(table, 0) + total
+        return total
+
+    def _random_time(self, start, end):
+        span = max(1, int((end - start).total_seconds()))
+        return start + datetime.timedelta(seconds=self._random.randrange(span))
+
+    def _content(self):
+        return "".join(self._random.sample(FRAGMENTS, self._random.randint(2, 4)))
+
+    def generate(self):
+        conn = self._connect()
+        try:
+            categories = [row[0] for row in conn.execute("SELECT name FROM situation_categories")] or ['日常']
+            group_ids = [row[0] for row in conn.execute("SELECT id FROM groups")]
+            cast_ids = self._step("casts / cast_x_credentials / cast_groups",
+                                  lambda: self._generate_casts(conn, categories, group_ids))
+            self._step("posts / tuning_history / send_history",
+                       lambda: self._generate_posts(conn, cast_ids))
+            self._step("retweet_schedules", lambda: self._generate_retweets(conn, cast_ids))
+            self._step("インデックス・統計情報", lambda: self._finish(conn))
+        finally:
+            conn.close()
+        return self.counts
+
+    def _step(self, label, func):
+        started = time.perf_counter()
+        print(f"⏳ {label} を生成中...")
+        result = func()
+        print(f"   {time.perf_counter() - started:.1f}秒")
+        return result
+
+    def _generate_casts(self, conn, categories, group_ids):
+        start_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM casts").fetchone()[0] + 1
+        cast_ids = list(range(start_id, start_id + self.casts))
+
+        def cast_rows():
+            for cast_id in cast_ids:
+                name = f"{self._random.choice(FAMILY_NAMES)} {self._random.choice(GIVEN_NAMES)} {cast_id}"
+                allowed = self._random.sample(categories, self._random.randint(1, min(5, len(categories))))
+                yield (cast_id, name, name.split()[1], f"{self._random.randint(19, 32)}歳",
+                       self._random.choice(PERSONALITIES), self._random.choice(SPEECH_STYLES),
+                       self._random.choice(['私', 'あたし', 'うち']), ",".join(allowed))
+
+        self._insert(conn, "casts",
+                     ["id", "name", "nickname", "age", "personality", "speech_style", "first_person", "allowed_categories"],
+                     cast_rows())
+
+        credential_casts = [cast_id for cast_id in cast_ids if self._random.random() < self.credential_ratio]
+        self._insert(conn, "cast_x_credentials",
+                     ["cast_id", "api_key", "api_secret", "bearer_token", "access_token", "access_token_secret",
+                      "twitter_username", "twitter_user_id", "is_active", "created_at", "updated_at"],
+                     ((cast_id, f"synthetic-key-{cast_id}", "synthetic", "synthetic", f"synthetic-token-{cast_id}",
+                       "synthetic", f"synthetic_{cast_id}", str(1_000_000 + cast_id),
+                       0 if self._random.random() < 0.05 else 1, _format(self.now), _format(self.now))
+                      for cast_id in credential_casts))
+
+        if group_ids:
+            self._insert(conn, "cast_groups", ["cast_id", "group_id"],
+                         ((cast_id, group_id) for cast_id in cast_ids
+                          for group_id in self._random.sample(group_ids, self._random.randint(0, min(2, len(group_ids))))))
+        return cast_ids
+
+    def _generate_posts(self, conn, cast_ids):
+        """投稿と、投稿に紐づくチューニング履歴・送信履歴を生成（IDを先に決めて参照をつなぐ）"""
+        next_post_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM posts").fetchone()[0] + 1
+        period_start = self.now - datetime.timedelta(days=self.days)
+        states = [state for state, _ in POST_STATES]
+        weights = [weight for _, weight in POST_STATES]
+        tuning_rows = []
+        send_rows = []
+        post_columns = ["id", "cast_id", "created_at", "content", "theme", "evaluation", "advice", "status",
+                        "posted_at", "sent_status", "sent_at", "generated_at", "scheduled_at"]
+
+        def post_rows():
+            nonlocal next_post_id
+            for cast_id in cast_ids:
+                count = int(self.posts_per_cast * self._random.uniform(0.5, 1.5))
+                for state_index in self._random.choices(range(len(states)), weights, k=count):
+                    status, sent_status = states[state_index]
+                    post_id = next_post_id
+                    next_post_id += 1
+                    created = self._random_time(period_start, self.now)
+                    sent_at = scheduled_at = None
+                    if sent_status == 'scheduled':
+                        scheduled_at = _format(self._random_time(self.now, self.now + datetime.timedelta(days=14)))
+                    elif sent_status in ('sent', 'failed'):
+                        sent = self._random_time(created, min(self.now, created + datetime.timedelta(days=3)))
+                        sent_at = _format(sent) if sent_status == 'sent' else None
+                        send_rows.extend(self._send_history(post_id, sent, sent_status == 'sent'))
+                    advice = None
+                    if self._random.random() < self.tuning_ratio:
+                        advice = self._tuning_chain(post_id, created, tuning_rows)
+                    yield (post_id, cast_id, _format(created), self._content(), self._random.choice(THEMES),
+                           self._random.choice(EVALUATIONS), advice, status,
+                           sent_at, sent_status, sent_at, _format(created), scheduled_at)
+                    # 履歴はメモリに溜めすぎないよう投稿と同じ単位で書き出す
+                    if len(tuning_rows) >= CHUNK_SIZE:
+                        self._insert(conn, "tuning_history", ["post_id", "timestamp", "previous_content", "advice_used"],
+                                     tuning_rows)
+                        tuning_rows.clear()
+                    if len(send_rows) >= CHUNK_SIZE:
+                        self._insert(conn, "send_history",
+                                     ["post_id", "destination", "sent_at", "scheduled_datetime", "status", "error_message"],
+                                     send_rows)
+                        send_rows.clear()
+
+        self._insert(conn, "posts", post_columns, post_rows())
+        self._insert(conn, "tuning_history", ["post_id", "timestamp", "previous_content", "advice_used"], tuning_rows)
+        self._insert(conn, "send_history",
+                     ["post_id", "destination", "sent_at", "scheduled_datetime", "status", "error_message"], send_rows)
+
+    def _tuning_chain(self, post_id, created, tuning_rows):
+        """1投稿あたり1〜5回の書き直し履歴を追加し、最後に使ったアドバイスを返す"""
+        timestamp = created
+        advice_used = None
+        for _ in range(self._random.randint(1, 5)):
+            timestamp += datetime.timedelta(seconds=self._random.randint(10, 3600))
+            advice_used = ", ".join(self._random.sample(ADVICE, self._random.randint(1, 2)))
+            tuning_rows.append((post_id, _format(timestamp), self._content(), advice_used))
+        return advice_used
+
+    def _send_history(self, post_id, sent, succeeded):
+        """送信履歴（失敗した送信先の再送を含む）"""
+        rows = []
+        scheduled = _format(sent.replace(minute=0, second=0))
+        for destination in self._random.sample(DESTINATIONS, self._random.randint(1, 2)):
+            attempt = sent
+            for _ in range(self._random.choices([0, 1, 2], [0.8, 0.15, 0.05])[0]):
+                rows.append((post_id, destination, _format(attempt), scheduled, 'failed', self._random.choice(SEND_ERRORS)))
+                attempt += datetime.timedelta(minutes=self._random.randint(1, 30))
+            if succeeded:
+                rows.append((post_id, destination, _format(attempt), scheduled, 'completed', None))
+            else:
+                rows.append((post_id, destination, _format(attempt), scheduled, 'failed', self._random.choice(SEND_ERRORS)))
+        return rows
+
+    def _generate_retweets(self, conn, cast_ids):
+        """完了・失敗した過去の予約、期限切れの未実行予約、今後の予約"""
+        period_start = self.now - datetime.timedelta(days=self.days)
+
+        def retweet_rows():
+            for cast_id in cast_ids:
+                for _ in range(int(self.retweets_per_cast * self._random.uniform(0.5, 1.5))):
+                    roll = self._random.random()
+                    comment = self._random.choice(FRAGMENTS) if self._random.random() < 0.2 else None
+                    tweet_id = str(self._random.randrange(1_600_000_000_000_000_000, 1_900_000_000_000_000_000))
+                    if roll < 0.75:
+                        scheduled = self._random_time(period_start, self.now)
+                        executed = scheduled + datetime.timedelta(seconds=self._random.randint(0, 120))
+                        failed = self._random.random() < 0.08
+                        yield (cast_id, tweet_id, comment, _format(scheduled), 'failed' if failed else 'completed',
+                               _format(scheduled - datetime.timedelta(hours=1)), _format(executed),
+                               None if failed or not comment else str(self._random.randrange(10**18, 2 * 10**18)),
+                               self._random.choice(RETWEET_ERRORS) if failed else None)
+                    else:
+                        # 0.75〜0.8 は期限切れのまま残った予約（スケジューラー停止中など）
+                        if roll < 0.8:
+                            scheduled = self._random_time(self.now - datetime.timedelta(hours=6), self.now)
+                        else:
+                            scheduled = self._random_time(self.now, self.now + datetime.timedelta(days=30))
+                        yield (cast_id, tweet_id, comment, _format(scheduled), 'scheduled',
+                               _format(self.now - datetime.timedelta(days=1)), None, None, None)
+
+        self._insert(conn, "retweet_schedules",
+                     ["cast_id", "tweet_id", "comment", "scheduled_at", "status", "created_at", "executed_at",
+                      "result_tweet_id", "error_message"],
+                     retweet_rows())
+
+    def _finish(self, conn):
+        for query in APP_INDEX_QUERIES:
+            conn.execute(query)
+        conn.execute("ANALYZE")
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIcast room 大規模データベース生成ツール")
+    parser.add_argument("--out", required=True, help="生成するデータベースのパス")
+    parser.add_argument("--source", default=Config.DATABASE_PATH, help="コピー元のデータベース（変更しない）")
+    parser.add_argument("--casts", type=int, default=2000, help="追加するキャスト数")
+    parser.add_argument("--posts-per-cast", type=int, default=500, help="キャストあたりの平均投稿数")
+    parser.add_argument("--days", type=int, default=365, help="投稿を分布させる日数")
+    parser.add_argument("--credential-ratio", type=float, default=0.6, help="X API の認証情報を登録するキャストの割合")
+    parser.add_argument("--tuning-ratio", type=float, default=0.3, help="チューニング履歴を持つ投稿の割合")
+    parser.add_argument("--retweets-per-cast", type=int, default=20, help="キャストあたりの平均リツイート予約数")
+    parser.add_argument("--seed", type=int, default=42, help="乱数シード")
+    parser.add_argument("--force", action="store_true", help="出力先が存在する場合は上書きする")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.out) == os.path.abspath(args.source):
+        sys.exit("❌ 出力先にコピー元と同じデータベースは指定できません")
+    if os.path.exists(args.out) and not args.force:
+        sys.exit(f"❌ {args.out} は既に存在します（上書きする場合は --force）")
+
+    shutil.copyfile(args.source, args.out)
+    # アプリ・スケジューラーが追加するテーブルと列も作っておく
+    SendOutbox(args.out).ensure_schema()
+    GenerationUsageLedger(args.out).ensure_schema()
+    ensure_lease_columns(args.out)
+
+    started = time.perf_counter()
+    generator = SyntheticDataGenerator(
+        args.out, casts=args.casts, posts_per_cast=args.posts_per_cast, days=args.days,
+        credential_ratio=args.credential_ratio, tuning_ratio=args.tuning_ratio,
+        retweets_per_cast=args.retweets_per_cast, seed=args.seed
+    )
+    counts = generator.generate()
+
+    print(f"\n✅ {args.out} を生成しました（{time.perf_counter() - started:.1f}秒、"
+          f"{os.path.getsize(args.out) / 1024 / 1024:.0f} MB）")
+    for table, count in counts.items():
+        print(f"  {table:<20} +{count:,}")
+
+
+if __name__ == "__main__":
+    main()
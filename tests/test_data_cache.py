@@ -0,0 +1,52 @@
+# プロセス共通キャッシュ（KeyedCache）のテスト
+# 読み込み中に無効化されたキーは古い値を保存せず、次回の取得で読み込み直すことを確認する
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_cache import KeyedCache  # noqa: E402
+
+
+class KeyedCacheTest(unittest.TestCase):
+    def load_while(self, cache, key, invalidate):
+        """loader の実行中に invalidate() を呼び、get_or_load の戻り値を返す"""
+        loading = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def loader():
+            loading.set()
+            release.wait(5)
+            return 'stale'
+
+        thread = threading.Thread(target=lambda: results.append(cache.get_or_load(key, loader)))
+        thread.start()
+        loading.wait(5)
+        invalidate()
+        release.set()
+        thread.join(5)
+        return results[0]
+
+    def test_invalidate_during_load_is_not_lost(self):
+        cache = KeyedCache()
+        self.assertEqual(self.load_while(cache, 'all', lambda: cache.invalidate('all')), 'stale')
+        self.assertEqual(cache.get_or_load('all', lambda: 'fresh'), 'fresh')
+        self.assertEqual(cache.get_or_load('all', lambda: 'unused'), 'fresh')
+
+    def test_invalidate_where_during_load_is_not_lost(self):
+        cache = KeyedCache()
+        self.load_while(cache, (1, 'post'), lambda: cache.invalidate_where(lambda key: key[0] == 1))
+        self.assertEqual(cache.get_or_load((1, 'post'), lambda: 'fresh'), 'fresh')
+
+    def test_caches_none(self):
+        cache = KeyedCache()
+        self.assertIsNone(cache.get_or_load('key', lambda: None))
+        self.assertIsNone(cache.get_or_load('key', lambda: 'unused'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+# Gemini 使用量台帳（GenerationUsageLedger）のテスト
+# 思考トークン（thoughts_token_count）が出力トークンとしてコスト・月間予算・承認投稿あたりのコストに含まれることを確認する
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_fakes import FakeUsageMetadata  # noqa: E402
+from generation_usage import GenerationUsageLedger, estimate_cost, usage_tokens  # noqa: E402
+
+MODEL = 'gemini-2.5-flash'
+
+
+class GenerationUsageLedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "test.db")
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.executescript("""
+                CREATE TABLE casts (id INTEGER PRIMARY KEY, name TEXT);
+                CREATE TABLE posts (id INTEGER PRIMARY KEY, cast_id INTEGER, status TEXT, created_at TEXT, generated_at TEXT);
+                INSERT INTO casts (id, name) VALUES (1, 'cast1');
+                INSERT INTO posts (cast_id, status, created_at) VALUES (1, 'approved', '2999-01-01 00:00:00');
+            """)
+        conn.close()
+        self.ledger = GenerationUsageLedger(self.db_path)
+        self.ledger.ensure_schema()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_thoughts_tokens_count_as_output(self):
+        usage = FakeUsageMetadata(1000, 200, thoughts_token_count=3000)
+        self.assertEqual(usage_tokens(usage), (1000, 3200))
+
+        cost = self.ledger.record(MODEL, 'success', usage, cast_id=1, page='test', latency_ms=10)
+
+        self.assertAlmostEqual(cost, estimate_cost(MODEL, 1000, 3200))
+        self.assertGreater(cost, estimate_cost(MODEL, 1000, 200))
+        self.assertEqual(self.ledger.daily_rollups()[0]['response_tokens'], 3200)
+        self.assertAlmostEqual(self.ledger.monthly_cost(), cost)
+        report = self.ledger.cost_per_approved_post(since='2000-01-01')
+        self.assertAlmostEqual(report[0]['cost_per_approved_usd'], cost)
+
+    def test_budget_includes_thoughts_tokens(self):
+        # 思考トークンを除くと予算内、含めると予算到達
+        usage = FakeUsageMetadata(0, 0, thoughts_token_count=1_000_000)
+        self.ledger.record(MODEL, 'success', usage)
+        budget = estimate_cost(MODEL, 0, 1_000_000)
+
+        self.assertEqual(self.ledger.budget_state(budget)[0], 'block')
+
+    def test_missing_thoughts_tokens(self):
+        self.assertEqual(usage_tokens(FakeUsageMetadata(10, 5)), (10, 5))
+        self.assertEqual(usage_tokens(None), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+# レート制限トラッカーの既定枠とリツイート予約の再予約のテスト
+# 既定ではAPI応答を受け取るまで呼び出しを止めないこと、429 応答を受けた予約が失敗にならず
+# リセット時刻に予約し直され、同じアカウントの後続の予約は Cloud Functions を呼ばずに回されることを確認する
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retweet_scheduler import RetweetScheduler, parse_jst_timestamp  # noqa: E402
+from schedule_lease import ensure_lease_columns  # noqa: E402
+from x_rate_limit import RateLimitTracker  # noqa: E402
+
+RESET_AFTER_SECONDS = 600
+LIMITED_ACCOUNT = "limited"
+
+
+class MockCloudFunction(ThreadingHTTPServer):
+    """LIMITED_ACCOUNT のリクエストには 429 を返すモック"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _MockCloudFunctionHandler)
+        self.payloads = []
+        self.reset_at = int(time.time()) + RESET_AFTER_SECONDS
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+class _MockCloudFunctionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        self.server.payloads.append(payload)
+        if payload["account_id"] == LIMITED_ACCOUNT:
+            self._respond(429, {"status": "error", "message": "Too Many Requests"}, {
+                "x-rate-limit-limit": "1",
+                "x-rate-limit-remaining": "0",
+                "x-rate-limit-reset": str(self.server.reset_at),
+            })
+        else:
+            self._respond(200, {"status": "success", "tweet_id": "1"}, {})
+
+    def _respond(self, status, body, headers):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RateLimitTrackerDefaultsTest(unittest.TestCase):
+    def test_no_plan_limits_before_headers(self):
+        tracker = RateLimitTracker('free')
+        for _ in range(3):
+            self.assertIsNone(tracker.blocked_message(1, 'retweet'))
+            tracker.record_call(1, 'retweet')
+        self.assertEqual(tracker.snapshot(), [])
+
+    def test_plan_limits_when_enabled(self):
+        tracker = RateLimitTracker('free', use_plan_defaults=True)
+        self.assertIsNone(tracker.blocked_message(1, 'retweet'))
+        tracker.record_call(1, 'retweet')
+        self.assertIn("API使用制限中", tracker.blocked_message(1, 'retweet'))
+        self.assertIn("利用できません", tracker.blocked_message(1, 'like'))
+
+
+class RetweetRescheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "test.db")
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.executescript(f"""
+                CREATE TABLE casts (id INTEGER PRIMARY KEY, name TEXT);
+                CREATE TABLE cast_x_credentials (cast_id INTEGER UNIQUE, twitter_username TEXT);
+                CREATE TABLE retweet_schedules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, cast_id INTEGER, tweet_id TEXT, comment TEXT,
+                    scheduled_at DATETIME, status TEXT DEFAULT 'pending', created_at TIMESTAMP,
+                    executed_at TEXT, result_tweet_id TEXT, error_message TEXT
+                );
+                INSERT INTO casts (id, name) VALUES (1, 'ok'), (2, 'limited');
+                INSERT INTO cast_x_credentials (cast_id, twitter_username) VALUES (1, 'ok'), (2, '{LIMITED_ACCOUNT}');
+                INSERT INTO retweet_schedules (cast_id, tweet_id, scheduled_at, status) VALUES
+                    (1, '100', '2020-01-01 00:00:00', 'scheduled'),
+                    (2, '101', '2020-01-01 00:00:01', 'scheduled'),
+                    (2, '102', '2020-01-01 00:00:02', 'scheduled');
+            """)
+        conn.close()
+        ensure_lease_columns(self.db_path)
+
+        self.server = MockCloudFunction()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def test_rate_limited_retweets_are_rescheduled_at_reset(self):
+        scheduler = RetweetScheduler(self.db_path, function_url=self.server.url, workers=1)
+        try:
+            completed, failed = scheduler.run_once()
+        finally:
+            scheduler.close()
+
+        self.assertEqual((completed, failed), (1, 0))
+        # 429 を受けた後、同じアカウントの予約は呼び出さずに再予約する
+        self.assertEqual([payload["tweet_id"] for payload in self.server.payloads], ["100", "101"])
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute("SELECT id, status, scheduled_at, lease_owner FROM retweet_schedules ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        self.assertEqual(rows[0][1], 'completed')
+        for _, status, scheduled_at, lease_owner in rows[1:]:
+            self.assertEqual(status, 'scheduled')
+            self.assertIsNone(lease_owner)
+            self.assertAlmostEqual(parse_jst_timestamp(scheduled_at), self.server.reset_at, delta=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
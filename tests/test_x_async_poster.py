@@ -0,0 +1,234 @@
+# X API 非同期実行モード（AsyncFanout / XTwitterPoster.run_batch_async）のテスト
+# http.server のモック X API に対して実行し、アカウント間の並行実行・アカウント内の順番実行と
+# すべてのレスポンスの x-rate-limit-* ヘッダーがレート制限トラッカーに反映されることを確認する
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from x_async_poster import AsyncFanout, async_available  # noqa: E402
+
+TWITTER_HOST = "https://api.twitter.com"
+RESPONSE_DELAY = 0.2
+RATE_LIMIT_WINDOW = 900
+
+CREDENTIALS_TABLE_QUERY = """
+    CREATE TABLE cast_x_credentials (
+        id INTEGER PRIMARY KEY, cast_id INTEGER UNIQUE, api_key TEXT, api_secret TEXT, bearer_token TEXT,
+        access_token TEXT, access_token_secret TEXT, twitter_username TEXT, twitter_user_id TEXT,
+        is_active INTEGER DEFAULT 1, created_at TEXT DEFAULT CURRENT_TIMESTAMP, updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class MockXAPI(ThreadingHTTPServer):
+    """POST /2/users/:id/retweets と /2/users/:id/likes に応答するモック（ユーザーごとの残り回数付き）"""
+
+    daemon_threads = True
+
+    def __init__(self, limits):
+        super().__init__(("127.0.0.1", 0), _MockXAPIHandler)
+        self.limits = limits  # ユーザーID → 15分枠の回数
+        self.remaining = dict(limits)
+        self.requests = []  # (ユーザーID, エンドポイント, 受信時刻)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.reset_at = int(time.time()) + RATE_LIMIT_WINDOW
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _MockXAPIHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        match = re.match(r"^/2/users/(\d+)/(retweets|likes)$", self.path)
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not match:
+            self._respond(404, {"title": "Not Found"}, {})
+            return
+        user_id, endpoint = match.groups()
+        with server.lock:
+            server.requests.append((user_id, endpoint, time.monotonic()))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(RESPONSE_DELAY)
+        with server.lock:
+            server.in_flight -= 1
+            remaining = server.remaining.get(user_id, 0)
+            limited = remaining <= 0
+            if not limited:
+                remaining -= 1
+                server.remaining[user_id] = remaining
+        headers = {
+            "x-rate-limit-limit": str(server.limits.get(user_id, 0)),
+            "x-rate-limit-remaining": str(remaining),
+            "x-rate-limit-reset": str(server.reset_at),
+        }
+        if limited:
+            self._respond(429, {"title": "Too Many Requests", "detail": "Too Many Requests", "status": 429}, headers)
+        elif endpoint == "retweets":
+            self._respond(200, {"data": {"retweeted": True}}, headers)
+        else:
+            self._respond(200, {"data": {"liked": True}}, headers)
+
+    def _respond(self, status, body, headers):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _LocalSession:
+    """aiohttp.ClientSession の代理（api.twitter.com 宛てのURLをモックサーバーに置き換える）"""
+
+    def __init__(self, session, base_url):
+        self._session = session
+        self._base_url = base_url
+
+    def request(self, method, url, **kwargs):
+        return self._session.request(method, str(url).replace(TWITTER_HOST, self._base_url), **kwargs)
+
+    async def __aenter__(self):
+        await self._session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.__aexit__(*exc)
+
+
+class LocalAsyncFanout(AsyncFanout):
+    """api.twitter.com 宛てのリクエストをモックサーバーに向ける"""
+
+    def __init__(self, poster, base_url, max_concurrency=16):
+        super().__init__(poster, max_concurrency)
+        self.base_url = base_url
+
+    def _make_session(self, trace_configs):
+        return _LocalSession(super()._make_session(trace_configs), self.base_url)
+
+
+@unittest.skipUnless(async_available(), 'tweepy[async]（aiohttp）が必要です')
+class AsyncFanoutTest(unittest.TestCase):
+    USER_LIMITS = {"1001": 5, "1002": 5, "1003": 2, "1004": 0}
+
+    def setUp(self):
+        from x_api_poster import XTwitterPoster
+        from x_rate_limit import RateLimitTracker
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmpdir.name, "test.db")
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute(CREDENTIALS_TABLE_QUERY)
+            for cast_id, user_id in enumerate(self.USER_LIMITS, start=1):
+                # OAuth 1.0a のアクセストークンは「ユーザーID-...」形式（tweepy がユーザーIDを取り出す）
+                conn.execute("""
+                    INSERT INTO cast_x_credentials
+                    (cast_id, api_key, api_secret, bearer_token, access_token, access_token_secret, twitter_username, twitter_user_id)
+                    VALUES (?, 'key', 'secret', 'bearer', ?, 'token-secret', ?, ?)
+                """, (cast_id, f"{user_id}-token", f"user{user_id}", user_id))
+        conn.close()
+
+        self.server = MockXAPI(self.USER_LIMITS)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.poster = XTwitterPoster(db_path)
+        self.poster.rate_limits = RateLimitTracker('basic')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def run_fanout(self, actions):
+        import asyncio
+        return asyncio.run(LocalAsyncFanout(self.poster, self.server.base_url).run(actions))
+
+    def retweets(self, cast_id, count):
+        return [{'action': 'retweet', 'cast_id': cast_id, 'params': {'tweet_id': str(9000 + index)}}
+                for index in range(count)]
+
+    def header_state(self, cast_id, endpoint='retweet'):
+        rows = [row for row in self.poster.get_rate_limit_status(cast_id) if row['endpoint'] == endpoint]
+        return rows[0] if rows else None
+
+    def test_accounts_run_concurrently_and_actions_in_order(self):
+        actions = self.retweets(1, 2) + self.retweets(2, 2)
+        started = time.perf_counter()
+        results = self.run_fanout(actions)
+        elapsed = time.perf_counter() - started
+
+        self.assertTrue(all(result['success'] for result in results), results)
+        self.assertEqual([result['cast_id'] for result in results], [1, 1, 2, 2])
+        self.assertEqual(self.server.max_in_flight, 2)
+        # 2アカウント × 2件を並行実行するので、直列（4件分）より短い
+        self.assertLess(elapsed, RESPONSE_DELAY * 4)
+        for user_id in ("1001", "1002"):
+            times = [received for user, _, received in self.server.requests if user == user_id]
+            self.assertEqual(len(times), 2)
+            self.assertGreaterEqual(times[1] - times[0], RESPONSE_DELAY * 0.9)
+
+    def test_headers_from_successful_responses_are_recorded(self):
+        results = self.run_fanout(self.retweets(1, 2))
+
+        self.assertTrue(all(result['success'] for result in results))
+        state = self.header_state(1)
+        self.assertEqual(state['source'], 'header')
+        self.assertEqual(state['limit'], 5)
+        self.assertEqual(state['remaining'], 3)
+
+    def test_exhausted_quota_from_headers_blocks_without_request(self):
+        results = self.run_fanout(self.retweets(3, 3))
+
+        self.assertEqual([result['success'] for result in results], [True, True, False])
+        self.assertIn("API使用制限中", results[2]['message'])
+        self.assertEqual(sum(1 for user, _, _ in self.server.requests if user == "1003"), 2)
+        self.assertEqual(self.header_state(3)['remaining'], 0)
+
+    def test_rate_limited_response_is_recorded(self):
+        results = self.run_fanout(self.retweets(4, 2))
+
+        self.assertFalse(results[0]['success'])
+        self.assertIn("API使用制限に達しました", results[0]['message'])
+        self.assertFalse(results[1]['success'])
+        self.assertIn("API使用制限中", results[1]['message'])
+        self.assertEqual(sum(1 for user, _, _ in self.server.requests if user == "1004"), 1)
+        self.assertEqual(self.header_state(4)['remaining'], 0)
+
+    def test_free_plan_likes_are_not_sent(self):
+        from x_api_poster import LIKE_FREE_PLAN_MESSAGE, UNLIKE_FREE_PLAN_MESSAGE
+        from x_rate_limit import RateLimitTracker
+
+        self.poster.rate_limits = RateLimitTracker('free')
+        results = self.run_fanout([
+            {'action': 'like', 'cast_id': 1, 'params': {'tweet_id': '9000'}},
+            {'action': 'unlike', 'cast_id': 2, 'params': {'tweet_id': '9000'}},
+        ])
+
+        # 同期版の like_tweet / unlike_tweet と同じメッセージで、X API には送らない
+        self.assertEqual([result['message'] for result in results], [LIKE_FREE_PLAN_MESSAGE, UNLIKE_FREE_PLAN_MESSAGE])
+        self.assertFalse(any(result['success'] for result in results))
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(self.poster.like_tweet('9000', cast_id=1), (False, LIKE_FREE_PLAN_MESSAGE))
+
+
+if __name__ == "__main__":
+    unittest.main()
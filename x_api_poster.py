@@ -1,18 +1,99 @@
 # X (Twitter) API 投稿機能
 # pip install tweepy
 
-import tweepy
+import asyncio
 import os
 import json
+import sqlite3
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 
+from config import Config
+from lazy_imports import lazy_import
+from media_pipeline import MAX_MEDIA_PER_TWEET, discard_prepared, file_hash, prepare_media, prune_prepared_media
+from perf_timing import timing
+from x_async_poster import DEFAULT_MAX_CONCURRENCY, AsyncFanout, async_available
+from x_rate_limit import ENDPOINT_LABELS, RateLimitTracker
+
+tweepy = lazy_import("tweepy")  # 最初のX API操作でインポート
+
+DB_FILE = "casting_office.db"
+
+# アップロード済みメディアIDの有効期限（X の既定は24時間、余裕を持って短めに扱う）
+MEDIA_ID_TTL_SECONDS = 20 * 60 * 60
+
+# 権限エラー時の対処ヒント（エンドポイント別、未指定は既定のヒント）
+FORBIDDEN_HINTS = {
+    'like': "アプリの権限設定(Read and Write)とOAuth 2.0スコープ(like.write)を確認してください。",
+    'unlike': "アプリの権限設定(Read and Write)とOAuth 2.0スコープ(like.write)を確認してください。",
+    'media_upload': "アプリの権限設定(Read and Write)とメディアアップロード権限を確認してください。",
+}
+DEFAULT_FORBIDDEN_HINT = "アプリの権限設定(Read and Write)を確認してください。"
+
+LIKE_FREE_PLAN_MESSAGE = """❌ X API FREEプランでは「いいね」機能は利用できません。
+
+💡 いいね機能を使用するには：
+• BASIC プラン ($100/月): 200回/24時間
+• PRO プラン ($5,000/月): 1000回/24時間
+
+📋 FREEプランで利用可能な機能：
+• ✅ 投稿: 17回/24時間  
+• ✅ いいね履歴確認: 1回/15分
+• ✅ リツイート: 1回/15分
+• ✅ ユーザー情報取得: 制限付き
+
+詳細: https://developer.twitter.com/en/docs/twitter-api/rate-limits"""
+
+UNLIKE_FREE_PLAN_MESSAGE = """❌ X API FREEプランでは「いいね取り消し」機能は利用できません。
+
+💡 いいね機能を使用するには：
+• BASIC プラン ($100/月): 100回/24時間
+• PRO プラン ($5,000/月): 50回/15分
+
+📋 FREEプランで利用可能な機能：
+• ✅ 投稿: 17回/24時間  
+• ✅ いいね履歴確認: 1回/15分
+• ✅ リツイート: 1回/15分
+
+詳細: https://developer.twitter.com/en/docs/twitter-api/rate-limits"""
+
+# FREEプランで利用できない操作（エンドポイント → メッセージ）
+FREE_PLAN_UNAVAILABLE_MESSAGES = {
+    'like': LIKE_FREE_PLAN_MESSAGE,
+    'unlike': UNLIKE_FREE_PLAN_MESSAGE,
+}
+
 class XTwitterPoster:
-    def __init__(self):
+    # run_batch で指定できる操作 → メソッド名
+    BATCH_ACTIONS = {
+        'tweet': 'post_tweet_for_cast',
+        'quote': 'quote_tweet',
+        'retweet': 'retweet',
+        'unretweet': 'unretweet',
+        'like': 'like_tweet',
+        'unlike': 'unlike_tweet',
+    }
+    
+    def __init__(self, db_path=DB_FILE):
         """X API の設定を初期化"""
         self.client = None
         self.api_initialized = False
+        self.db_path = db_path
         self.cast_clients = {}  # キャスト別のクライアントキャッシュ
+        self.cast_client_versions = {}  # キャスト別の認証情報バージョン（cast_x_credentials.updated_at）
+        self.cast_identities = {}  # キャスト別の認証ユーザー情報 {'id', 'username', 'name'}
+        self.global_identity = None  # グローバルアカウントの認証ユーザー情報
+        self._clients_lock = threading.Lock()
+        self.api_v1_clients = {}  # アカウント別の v1 API（メディアアップロード用）キャッシュ
+        self.media_id_cache = {}  # (アカウント, 内容ハッシュ) → (media_id, 有効期限)
+        self._media_lock = threading.Lock()
+        self.rate_limits = RateLimitTracker(Config.X_API_PLAN, Config.X_API_PLAN_DEFAULTS)  # アカウント・エンドポイント別のレート制限
+        self.action_stats = {}  # エンドポイント別の実行回数・所要時間
+        self._stats_lock = threading.Lock()
+        prune_prepared_media()  # 異常終了などで残った古い縮小済みファイルを削除
         
     def setup_credentials(self):
         """X API認証情報をセットアップ"""
@@ -25,13 +106,12 @@ class XTwitterPoster:
                     creds = json.load(f)
                 
                 # X API v2 Client を作成
-                self.client = tweepy.Client(
-                    bearer_token=creds.get('bearer_token'),
-                    consumer_key=creds.get('api_key'),
-                    consumer_secret=creds.get('api_secret'),
-                    access_token=creds.get('access_token'),
-                    access_token_secret=creds.get('access_token_secret'),
-                    wait_on_rate_limit=True
+                self.client = self._build_client(
+                    creds.get('api_key'),
+                    creds.get('api_secret'),
+                    creds.get('bearer_token'),
+                    creds.get('access_token'),
+                    creds.get('access_token_secret')
                 )
                 
                 # 認証テスト
@@ -39,6 +119,7 @@ class XTwitterPoster:
                     me = self.client.get_me()
                     if me.data:
                         self.api_initialized = True
+                        self.global_identity = self._identity_from_user(me.data)
                         return True, f"X API認証成功: @{me.data.username}"
                     else:
                         return False, "X API認証に失敗しました"
@@ -84,49 +165,7 @@ class XTwitterPoster:
             cast_name (str, optional): キャスト名
             quote_tweet_id (str, optional): 引用ツイートのID（コメント入りリツイート用）
         """
-        try:
-            if not self.api_initialized:
-                success, message = self.setup_credentials()
-                if not success:
-                    return False, message
-            
-            # 投稿内容の前処理
-            tweet_content = content.strip()
-            
-            # キャスト名を含める場合（オプション）
-            if cast_name:
-                # 必要に応じてキャスト名をハッシュタグとして追加
-                pass
-            
-            # 文字数制限チェック（X の制限は280文字）
-            if len(tweet_content) > 280:
-                return False, f"投稿内容が280文字を超えています（{len(tweet_content)}文字）"
-            
-            # ツイート投稿（コメント入りリツイート対応）
-            tweet_params = {'text': tweet_content}
-            if quote_tweet_id:
-                tweet_params['quote_tweet_id'] = quote_tweet_id
-            
-            response = self.client.create_tweet(**tweet_params)
-            
-            if response.data:
-                tweet_id = response.data['id']
-                tweet_url = f"https://twitter.com/user/status/{tweet_id}"
-                if quote_tweet_id:
-                    return True, f"コメント入りリツイート投稿成功！ ID: {tweet_id} (引用元: {quote_tweet_id})"
-                else:
-                    return True, f"ツイート投稿成功！ ID: {tweet_id}"
-            else:
-                return False, "ツイート投稿に失敗しました"
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden:
-            return False, "投稿権限がありません。X API の設定を確認してください。"
-        except tweepy.Unauthorized:
-            return False, "認証エラー。X API の認証情報を確認してください。"
-        except Exception as e:
-            return False, f"投稿エラー: {str(e)}"
+        return self.post_tweet_for_cast(None, content, cast_name=cast_name, quote_tweet_id=quote_tweet_id)
     
     def schedule_tweet(self, content, scheduled_datetime, cast_name=None):
         """スケジュール投稿（X API v2では直接サポートされていないため、将来の実装用）"""
@@ -134,23 +173,67 @@ class XTwitterPoster:
         # 外部スケジューラーやタスクキューとの連携が必要
         return False, "スケジュール投稿は現在未対応です。即座投稿を使用してください。"
     
-    def get_account_info(self):
+    @staticmethod
+    def _identity_from_user(user):
+        return {'id': user.id, 'username': user.username, 'name': user.name}
+    
+    def _persist_identity(self, cast_id, identity):
+        """認証ユーザー情報を cast_x_credentials に保存（updated_at は変更しない）"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    conn.execute(
+                        "UPDATE cast_x_credentials SET twitter_user_id = ?, twitter_username = ? WHERE cast_id = ?",
+                        (str(identity['id']), identity['username'], cast_id)
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logging.warning(f"キャストID {cast_id} のアカウント情報保存エラー: {e}")
+    
+    def get_identity(self, cast_id=None, refresh=False):
+        """認証ユーザー情報（id / username / name）を取得
+        
+        キャッシュ済みの情報を返し、未取得または refresh=True の場合のみ get_me を呼び出す。
+        キャストの場合は取得した情報を cast_x_credentials.twitter_user_id / twitter_username に保存する。
+        
+        Returns:
+            tuple: (ユーザー情報の辞書またはNone, メッセージ)
+        """
+        client, account_type, error = self._resolve_client(cast_id)
+        if error:
+            return None, error
+        identity = self.cast_identities.get(cast_id) if cast_id is not None else self.global_identity
+        
+        if identity and not refresh:
+            return identity, "成功"
+        
+        blocked = self._acquire_rate_limit(cast_id, 'get_me')
+        if blocked:
+            return None, blocked
+        
+        me = client.get_me()
+        if not me.data:
+            return None, "アカウント情報の取得に失敗しました"
+        identity = self._identity_from_user(me.data)
+        
+        if cast_id is not None:
+            with self._clients_lock:
+                self.cast_identities[cast_id] = identity
+            self._persist_identity(cast_id, identity)
+        else:
+            self.global_identity = identity
+        return identity, "成功"
+    
+    def get_account_info(self, refresh=False):
         """アカウント情報を取得"""
         try:
-            if not self.api_initialized:
-                success, message = self.setup_credentials()
-                if not success:
-                    return None, message
-            
-            me = self.client.get_me()
-            if me.data:
-                return {
-                    'username': me.data.username,
-                    'name': me.data.name,
-                    'id': me.data.id
-                }, "成功"
+            identity, message = self.get_identity(refresh=refresh)
+            if identity:
+                return dict(identity), "成功"
             else:
-                return None, "アカウント情報の取得に失敗"
+                return None, message
                 
         except Exception as e:
             return None, f"アカウント情報取得エラー: {str(e)}"
@@ -159,38 +242,28 @@ class XTwitterPoster:
         """詳細な権限確認とトラブルシューティング情報を取得"""
         try:
             # 使用するクライアントを決定
-            if cast_id is not None:
-                if cast_id not in self.cast_clients:
-                    return False, f"キャストID {cast_id} の認証情報が設定されていません"
-                client = self.cast_clients[cast_id]
-                account_type = f"キャスト (ID: {cast_id})"
-            else:
-                if not self.api_initialized:
-                    success, message = self.setup_credentials()
-                    if not success:
-                        return False, f"認証失敗: {message}"
-                client = self.client
-                account_type = "グローバルアカウント"
+            client, account_type, error = self._resolve_client(cast_id)
+            if error:
+                return False, error
             
-            # 基本的なアカウント情報を取得
-            me = client.get_me()
-            if not me.data:
-                return False, f"{account_type}: アカウント情報の取得に失敗しました"
+            # 基本的なアカウント情報を取得（診断のため最新化し、これを読み取り権限テストも兼ねる）
+            try:
+                identity, message = self.get_identity(cast_id, refresh=True)
+            except Exception as e:
+                identity, message = None, str(e)
+            if not identity:
+                return False, f"{account_type}: アカウント情報の取得に失敗しました（{message}）"
             
             results = {
                 'account_type': account_type,
-                'username': me.data.username,
-                'name': me.data.name,
-                'user_id': me.data.id,
+                'username': identity['username'],
+                'name': identity['name'],
+                'user_id': identity['id'],
                 'tests': {}
             }
             
-            # 1. 読み取り権限テスト
-            try:
-                recent_tweets = client.get_me(user_fields=['public_metrics'])
-                results['tests']['read_permission'] = True
-            except Exception as e:
-                results['tests']['read_permission'] = f"読み取り権限エラー: {str(e)}"
+            # 1. 読み取り権限テスト（上記の get_me が成功していれば読み取り可能）
+            results['tests']['read_permission'] = True
             
             # 2. 投稿権限テスト（実際には投稿しない、構文チェックのみ）
             try:
@@ -206,8 +279,11 @@ class XTwitterPoster:
             # 3. いいね権限テスト（自分の最新投稿にいいねを試行）
             try:
                 # 自分の最新投稿を取得
+                blocked = self._acquire_rate_limit(cast_id, 'get_users_tweets')
+                if blocked:
+                    raise RuntimeError(blocked)
                 my_tweets = client.get_users_tweets(
-                    id=me.data.id,
+                    id=identity['id'],
                     max_results=5,
                     tweet_fields=['created_at']
                 )
@@ -233,25 +309,291 @@ class XTwitterPoster:
         except Exception as e:
             return False, f"権限確認エラー: {str(e)}"
     
+    def _build_client(self, api_key, api_secret, bearer_token, access_token, access_token_secret, cast_id=None):
+        """tweepy v2 Client を作成（制限時にスリープせず、レスポンスヘッダーから残り回数を記録する）"""
+        client = tweepy.Client(
+            bearer_token=bearer_token,
+            consumer_key=api_key,
+            consumer_secret=api_secret,
+            access_token=access_token,
+            access_token_secret=access_token_secret,
+            wait_on_rate_limit=False
+        )
+        client.session.hooks['response'].append(self.rate_limits.response_hook(self._account_key(cast_id)))
+        return client
+    
+    @staticmethod
+    def _account_key(cast_id):
+        return cast_id if cast_id is not None else 'global'
+    
+    def _plan_unavailable_message(self, endpoint):
+        """現在のプランで利用できない操作ならメッセージを返す（同期・非同期の実行で共通）"""
+        if self.rate_limits.plan == 'free':
+            return FREE_PLAN_UNAVAILABLE_MESSAGES.get(endpoint)
+        return None
+    
+    def _acquire_rate_limit(self, cast_id, endpoint):
+        """レート制限を確認して1回分消費する（制限中はスリープせずメッセージを返す）"""
+        account_key = self._account_key(cast_id)
+        blocked = self.rate_limits.blocked_message(account_key, endpoint)
+        if blocked:
+            return blocked
+        self.rate_limits.record_call(account_key, endpoint)
+        return None
+    
+    def get_rate_limit_status(self, cast_id=None):
+        """UI表示用の残り回数一覧（cast_id 省略時は全アカウント）"""
+        return self.rate_limits.snapshot(None if cast_id is None else cast_id)
+    
+    def next_available_at(self, endpoint, cast_id=None):
+        """制限中のエンドポイントを次に実行できる時刻（JST文字列、実行可能なら None）"""
+        return self.rate_limits.next_available_at(self._account_key(cast_id), endpoint)
+    
+    def _resolve_client(self, cast_id=None):
+        """使用するクライアントを決定（キャスト指定時はキャスト専用、それ以外はグローバル）
+        
+        Returns:
+            tuple: (クライアント, アカウント種別, エラーメッセージ)
+        """
+        if cast_id is not None:
+            client = self.get_cast_client(cast_id)
+            if client is None:
+                return None, None, f"キャストID {cast_id} の認証情報が設定されていません"
+            return client, f"キャスト (ID: {cast_id})", None
+        
+        if not self.api_initialized:
+            success, message = self.setup_credentials()
+            if not success:
+                return None, None, f"認証失敗: {message}"
+        return self.client, "グローバルアカウント", None
+    
+    def _dispatch(self, endpoint, cast_id, call, failure_value=False):
+        """X API 操作の共通実行（クライアント解決 → レート制限 → 実行・計測 → 例外のメッセージ変換）
+        
+        Args:
+            endpoint (str): x_rate_limit のエンドポイント名
+            cast_id (int, optional): キャストID。None の場合はグローバルアカウント
+            call: call(client, account_type) → (結果, メッセージ)
+            failure_value: 失敗時にタプルの先頭として返す値
+        """
+        try:
+            client, account_type, error = self._resolve_client(cast_id)
+        except Exception as e:
+            return failure_value, f"認証設定エラー: {str(e)}"
+        if error:
+            return failure_value, error
+        
+        blocked = self._acquire_rate_limit(cast_id, endpoint)
+        if blocked:
+            return failure_value, blocked
+        
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            with timing(f"x_api.{endpoint}", "http"):
+                result = call(client, account_type)
+            succeeded = bool(result[0])
+            return result
+        except tweepy.TweepyException as e:
+            return failure_value, self._map_error(e, endpoint, cast_id)
+        except Exception as e:
+            return failure_value, f"{ENDPOINT_LABELS.get(endpoint, endpoint)}エラー: {str(e)}"
+        finally:
+            self._record_action(endpoint, time.perf_counter() - started, succeeded)
+    
+    def _map_error(self, error, endpoint, cast_id):
+        """tweepy の例外を表示用メッセージに変換"""
+        label = ENDPOINT_LABELS.get(endpoint, endpoint)
+        detail = str(error)
+        if isinstance(error, tweepy.TooManyRequests):
+            retry_at = self.next_available_at(endpoint, cast_id)
+            retry_hint = f"{retry_at} 以降に再実行できます。" if retry_at else "しばらく待ってから再試行してください。"
+            return f"API使用制限に達しました（{label}）。{retry_hint}"
+        if isinstance(error, tweepy.Forbidden):
+            lowered = detail.lower()
+            if "attached to a Project" in detail:
+                return f"❌ アプリがプロジェクトに紐付いていません: {detail}\n💡 X Developer Portalでプロジェクト内にアプリを作成し直してください。"
+            if "already retweeted" in lowered:
+                return "❌ この投稿は既にリツイート済みです"
+            if "not retweeted" in lowered:
+                return "❌ この投稿はリツイートしていません"
+            return f"❌ {label}権限エラー: {detail}\n💡 {FORBIDDEN_HINTS.get(endpoint, DEFAULT_FORBIDDEN_HINT)}"
+        if isinstance(error, tweepy.Unauthorized):
+            return f"認証エラー: {detail}\n💡 API Key/Token を確認してください。"
+        if isinstance(error, tweepy.NotFound):
+            return "指定された投稿が見つかりません。投稿IDを確認してください。"
+        return f"{label}エラー: {detail}"
+    
+    def _record_action(self, endpoint, elapsed, succeeded):
+        with self._stats_lock:
+            stats = self.action_stats.setdefault(endpoint, {'count': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            stats['count'] += 1
+            if not succeeded:
+                stats['errors'] += 1
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+    
+    def get_action_stats(self):
+        """エンドポイント別の実行回数・エラー数・平均/最大所要時間（秒）"""
+        with self._stats_lock:
+            return [{
+                'endpoint': endpoint,
+                'label': ENDPOINT_LABELS.get(endpoint, endpoint),
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'avg_seconds': stats['total_seconds'] / stats['count'] if stats['count'] else 0.0,
+                'max_seconds': stats['max_seconds'],
+            } for endpoint, stats in sorted(self.action_stats.items())]
+    
+    def run_batch(self, actions, max_workers=8):
+        """複数アカウントの操作をまとめて実行（アカウント間は並列、同一アカウント内は順番に実行）
+        
+        Args:
+            actions (list): {'action': 'retweet', 'cast_id': 1, 'params': {'tweet_id': '...'}} のリスト。
+                action は BATCH_ACTIONS のキー
+            max_workers (int): 同時に処理するアカウント数の上限
+            
+        Returns:
+            list: 入力順の結果 {'action', 'cast_id', 'success', 'message', 'elapsed'}
+        """
+        results = [None] * len(actions)
+        indexes_by_account = {}
+        for index, action in enumerate(actions):
+            indexes_by_account.setdefault(action.get('cast_id'), []).append(index)
+        
+        def run_account(indexes):
+            for index in indexes:
+                action = actions[index]
+                started = time.perf_counter()
+                method_name = self.BATCH_ACTIONS.get(action['action'])
+                if method_name is None:
+                    success, message = False, f"未対応の操作です: {action['action']}"
+                else:
+                    try:
+                        success, message = getattr(self, method_name)(cast_id=action.get('cast_id'), **action.get('params', {}))
+                    except Exception as e:
+                        success, message = False, f"{action['action']}エラー: {str(e)}"
+                results[index] = {
+                    'action': action['action'],
+                    'cast_id': action.get('cast_id'),
+                    'success': bool(success),
+                    'message': message,
+                    'elapsed': time.perf_counter() - started,
+                }
+        
+        if not indexes_by_account:
+            return results
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(indexes_by_account)))) as executor:
+            list(executor.map(run_account, indexes_by_account.values()))
+        return results
+    
+    def run_batch_async(self, actions, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """run_batch の非同期版（tweepy AsyncClient で多数のアカウントへ一斉実行）
+        
+        tweepy[async] が未インストールの場合はスレッド版の run_batch で実行する。
+        
+        Returns:
+            list: 入力順の結果 {'action', 'cast_id', 'success', 'message', 'elapsed'}
+        """
+        if not async_available():
+            return self.run_batch(actions, max_workers=max_concurrency)
+        return asyncio.run(AsyncFanout(self, max_concurrency).run(actions))
+    
+    def _load_cast_credentials(self, cast_id):
+        """cast_x_credentials からキャストの有効な認証情報を読み込む"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                "SELECT * FROM cast_x_credentials WHERE cast_id = ? AND is_active = 1",
+                (cast_id,)
+            ).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+    
+    def get_cast_client(self, cast_id):
+        """キャスト専用クライアントを取得（初回利用時にDBから読み込み、認証情報が更新された場合のみ作り直す）
+        
+        Returns:
+            tweepy.Client: クライアント。認証情報が未設定の場合は None
+        """
+        try:
+            creds = self._load_cast_credentials(cast_id)
+        except sqlite3.Error:
+            # DBが使えない場合は setup_cast_credentials 済みのクライアントを使う
+            return self.cast_clients.get(cast_id)
+        
+        with self._clients_lock:
+            if not creds:
+                self.cast_clients.pop(cast_id, None)
+                self.cast_client_versions.pop(cast_id, None)
+                self.cast_identities.pop(cast_id, None)
+                return None
+            
+            version = creds.get('updated_at')
+            client = self.cast_clients.get(cast_id)
+            if client is not None and self.cast_client_versions.get(cast_id) == version:
+                return client
+            
+            # setup_cast_credentials で検証済みの同じ認証情報ならそのまま採用
+            # （シークレットだけを更新した場合も作り直す。古いシークレットで署名すると 401 になる）
+            if client is None or self._client_credentials(client) != (
+                creds['api_key'], creds['api_secret'], creds['bearer_token'],
+                creds['access_token'], creds['access_token_secret'],
+            ):
+                client = self._build_client(
+                    creds['api_key'],
+                    creds['api_secret'],
+                    creds['bearer_token'],
+                    creds['access_token'],
+                    creds['access_token_secret'],
+                    cast_id
+                )
+                self.cast_identities.pop(cast_id, None)
+            self.cast_clients[cast_id] = client
+            self.cast_client_versions[cast_id] = version
+            
+            if cast_id not in self.cast_identities and creds.get('twitter_user_id'):
+                self.cast_identities[cast_id] = {
+                    'id': creds['twitter_user_id'],
+                    'username': creds.get('twitter_username'),
+                    'name': None
+                }
+            return client
+    
+    @staticmethod
+    def _client_credentials(client):
+        """クライアントが使っている認証情報（_build_client の引数と同じ順序）"""
+        return (client.consumer_key, client.consumer_secret, client.bearer_token,
+                client.access_token, client.access_token_secret)
+    
+    def invalidate_cast_client(self, cast_id):
+        """キャスト専用クライアントのキャッシュを破棄（次回利用時にDBから再読み込み）"""
+        with self._clients_lock:
+            self.cast_clients.pop(cast_id, None)
+            self.cast_client_versions.pop(cast_id, None)
+            self.cast_identities.pop(cast_id, None)
+    
     def setup_cast_credentials(self, cast_id, api_key, api_secret, bearer_token, access_token, access_token_secret):
         """キャスト専用のX API認証情報をセットアップ"""
         try:
             # キャスト専用のX API v2 Client を作成
-            cast_client = tweepy.Client(
-                bearer_token=bearer_token,
-                consumer_key=api_key,
-                consumer_secret=api_secret,
-                access_token=access_token,
-                access_token_secret=access_token_secret,
-                wait_on_rate_limit=True
-            )
+            cast_client = self._build_client(api_key, api_secret, bearer_token, access_token, access_token_secret, cast_id)
             
             # 認証テスト
             try:
                 me = cast_client.get_me()
                 if me.data:
-                    # キャッシュに保存
-                    self.cast_clients[cast_id] = cast_client
+                    # キャッシュに保存（バージョンは次回 get_cast_client で確定）
+                    with self._clients_lock:
+                        self.cast_clients[cast_id] = cast_client
+                        self.cast_client_versions.pop(cast_id, None)
+                        self.cast_identities[cast_id] = {
+                            'id': me.data.id,
+                            'username': me.data.username,
+                            'name': me.data.name
+                        }
                     return True, f"キャストID {cast_id} のX API認証成功: @{me.data.username}", me.data
                 else:
                     return False, f"キャストID {cast_id} のX API認証に失敗しました", None
@@ -261,59 +603,14 @@ class XTwitterPoster:
         except Exception as e:
             return False, f"キャストID {cast_id} の認証設定エラー: {str(e)}", None
     
-    def post_tweet_for_cast(self, cast_id, content, cast_name=None):
-        """指定されたキャストのアカウントでツイートを投稿"""
-        try:
-            # キャスト専用クライアントを取得
-            if cast_id not in self.cast_clients:
-                return False, f"キャストID {cast_id} の認証情報が設定されていません"
-            
-            cast_client = self.cast_clients[cast_id]
-            
-            # 投稿内容の前処理
-            tweet_content = content.strip()
-            
-            # 文字数制限チェック（X の制限は280文字）
-            if len(tweet_content) > 280:
-                return False, f"投稿内容が280文字を超えています（{len(tweet_content)}文字）"
-            
-            # ツイート投稿
-            response = cast_client.create_tweet(text=tweet_content)
-            
-            if response.data:
-                tweet_id = response.data['id']
-                tweet_url = f"https://twitter.com/user/status/{tweet_id}"
-                return True, f"ツイート投稿成功！ ID: {tweet_id}, URL: {tweet_url}"
-            else:
-                return False, "ツイート投稿に失敗しました"
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden:
-            return False, "投稿権限がありません。X API の設定を確認してください。"
-        except tweepy.Unauthorized:
-            return False, "認証エラー。X API の認証情報を確認してください。"
-        except Exception as e:
-            return False, f"投稿エラー: {str(e)}"
-    
-    def get_cast_account_info(self, cast_id):
+    def get_cast_account_info(self, cast_id, refresh=False):
         """キャストのアカウント情報を取得"""
         try:
-            if cast_id not in self.cast_clients:
-                return None, f"キャストID {cast_id} の認証情報が設定されていません"
-            
-            cast_client = self.cast_clients[cast_id]
-            me = cast_client.get_me()
-            
-            if me.data:
-                return {
-                    'username': me.data.username,
-                    'name': me.data.name,
-                    'id': me.data.id,
-                    'cast_id': cast_id
-                }, "成功"
+            identity, message = self.get_identity(cast_id, refresh=refresh)
+            if identity:
+                return dict(identity, cast_id=cast_id), "成功"
             else:
-                return None, "アカウント情報の取得に失敗"
+                return None, message
                 
         except Exception as e:
             return None, f"アカウント情報取得エラー: {str(e)}"
@@ -329,63 +626,17 @@ class XTwitterPoster:
             tuple: (成功True/失敗False, メッセージ)
         """
         # FREEプランでの制限を事前警告
-        return False, """❌ X API FREEプランでは「いいね」機能は利用できません。
-
-💡 いいね機能を使用するには：
-• BASIC プラン ($100/月): 200回/24時間
-• PRO プラン ($5,000/月): 1000回/24時間
-
-📋 FREEプランで利用可能な機能：
-• ✅ 投稿: 17回/24時間  
-• ✅ いいね履歴確認: 1回/15分
-• ✅ リツイート: 1回/15分
-• ✅ ユーザー情報取得: 制限付き
-
-詳細: https://developer.twitter.com/en/docs/twitter-api/rate-limits"""
+        unavailable = self._plan_unavailable_message('like')
+        if unavailable:
+            return False, unavailable
         
-        try:
-            # キャスト指定時はキャスト専用クライアントを使用
-            if cast_id is not None:
-                if cast_id not in self.cast_clients:
-                    return False, f"キャストID {cast_id} の認証情報が設定されていません"
-                client = self.cast_clients[cast_id]
-                account_type = f"キャスト (ID: {cast_id})"
-            else:
-                # グローバル認証を使用
-                if not self.api_initialized:
-                    success, message = self.setup_credentials()
-                    if not success:
-                        return False, f"認証失敗: {message}"
-                client = self.client
-                account_type = "グローバルアカウント"
-            
-            # いいねを実行
+        def call(client, account_type):
             response = client.like(tweet_id)
-            
             if response.data and response.data.get('liked'):
                 return True, f"✅ {account_type}で投稿にいいねしました (Tweet ID: {tweet_id})"
-            else:
-                return False, f"❌ いいねに失敗しました: {response}"
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden as e:
-            error_detail = str(e)
-            if "403 Forbidden" in error_detail:
-                if "attached to a Project" in error_detail:
-                    return False, f"❌ アプリがプロジェクトに紐付いていません: {error_detail}\n💡 X Developer Portalでプロジェクト内にアプリを作成し直してください。"
-                elif "scope" in error_detail.lower() or "permission" in error_detail.lower():
-                    return False, f"❌ いいね権限が不足しています: {error_detail}\n💡 OAuth 2.0設定でlike.writeスコープを有効にしてください。"
-                else:
-                    return False, f"❌ いいね権限エラー: {error_detail}\n💡 アプリの権限設定(Read and Write)とOAuth 2.0スコープ(like.write)を確認してください。"
-            else:
-                return False, f"いいね権限がありません: {error_detail}"
-        except tweepy.Unauthorized as e:
-            return False, f"認証エラー: {str(e)}\n💡 API Key/Token を確認してください。"
-        except tweepy.NotFound:
-            return False, "指定された投稿が見つかりません。投稿IDを確認してください。" 
-        except Exception as e:
-            return False, f"いいねエラー: {str(e)}"
+            return False, f"❌ いいねに失敗しました: {response}"
+        
+        return self._dispatch('like', cast_id, call)
     
     def unlike_tweet(self, tweet_id, cast_id=None):
         """投稿の「いいね」を取り消す
@@ -398,53 +649,17 @@ class XTwitterPoster:
             tuple: (成功True/失敗False, メッセージ)
         """
         # FREEプランでの制限を事前警告
-        return False, """❌ X API FREEプランでは「いいね取り消し」機能は利用できません。
-
-💡 いいね機能を使用するには：
-• BASIC プラン ($100/月): 100回/24時間
-• PRO プラン ($5,000/月): 50回/15分
-
-📋 FREEプランで利用可能な機能：
-• ✅ 投稿: 17回/24時間  
-• ✅ いいね履歴確認: 1回/15分
-• ✅ リツイート: 1回/15分
-
-詳細: https://developer.twitter.com/en/docs/twitter-api/rate-limits"""
+        unavailable = self._plan_unavailable_message('unlike')
+        if unavailable:
+            return False, unavailable
         
-        try:
-            # キャスト指定時はキャスト専用クライアントを使用
-            if cast_id is not None:
-                if cast_id not in self.cast_clients:
-                    return False, f"キャストID {cast_id} の認証情報が設定されていません"
-                client = self.cast_clients[cast_id]
-                account_type = f"キャスト (ID: {cast_id})"
-            else:
-                # グローバル認証を使用
-                if not self.api_initialized:
-                    success, message = self.setup_credentials()
-                    if not success:
-                        return False, f"認証失敗: {message}"
-                client = self.client
-                account_type = "グローバルアカウント"
-            
-            # いいね取り消しを実行
+        def call(client, account_type):
             response = client.unlike(tweet_id)
-            
             if response.data and response.data.get('liked') == False:
                 return True, f"✅ {account_type}で投稿のいいねを取り消しました (Tweet ID: {tweet_id})"
-            else:
-                return False, f"❌ いいね取り消しに失敗しました: {response}"
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden as e:
-            return False, f"いいね権限がありません: {str(e)}"
-        except tweepy.Unauthorized:
-            return False, "認証エラー。X API の認証情報を確認してください。"
-        except tweepy.NotFound:
-            return False, "指定された投稿が見つかりません。投稿IDを確認してください。"
-        except Exception as e:
-            return False, f"いいね取り消しエラー: {str(e)}"
+            return False, f"❌ いいね取り消しに失敗しました: {response}"
+        
+        return self._dispatch('unlike', cast_id, call)
     
     def get_liked_tweets(self, cast_id=None, max_results=10):
         """いいねした投稿一覧を取得
@@ -456,69 +671,34 @@ class XTwitterPoster:
         Returns:
             tuple: (成功True/失敗False, データまたはエラーメッセージ)
         """
-        try:
-            # キャスト指定時はキャスト専用クライアントを使用  
-            if cast_id is not None:
-                if cast_id not in self.cast_clients:
-                    return False, f"キャストID {cast_id} の認証情報が設定されていません"
-                client = self.cast_clients[cast_id]
-                # キャストのuser_idを取得
-                me = client.get_me()
-                if not me.data:
-                    return False, "アカウント情報の取得に失敗しました"
-                user_id = me.data.id
-                account_type = f"キャスト (ID: {cast_id})"
-            else:
-                # グローバル認証を使用
-                if not self.api_initialized:
-                    success, message = self.setup_credentials() 
-                    if not success:
-                        return False, f"認証失敗: {message}"
-                client = self.client
-                # グローバルユーザーのuser_idを取得
-                me = client.get_me()
-                if not me.data:
-                    return False, "アカウント情報の取得に失敗しました"
-                user_id = me.data.id
-                account_type = "グローバルアカウント"
+        def call(client, account_type):
+            # user_id はキャッシュ済みの認証ユーザー情報を使う（users/me を毎回呼ばない）
+            identity, message = self.get_identity(cast_id)
+            if not identity:
+                return False, message
             
-            # いいねした投稿を取得
             liked_tweets = client.get_liked_tweets(
-                id=user_id,
+                id=identity['id'],
                 max_results=max_results,
                 tweet_fields=['created_at', 'author_id', 'public_metrics']
             )
             
-            if liked_tweets.data:
-                tweets_data = []
-                for tweet in liked_tweets.data:
-                    tweets_data.append({
-                        'id': tweet.id,
-                        'text': tweet.text,
-                        'created_at': tweet.created_at,
-                        'author_id': tweet.author_id,
-                        'public_metrics': tweet.public_metrics
-                    })
-                return True, {
-                    'account_type': account_type,
-                    'tweets': tweets_data,
-                    'count': len(tweets_data)
-                }
-            else:
-                return True, {
-                    'account_type': account_type, 
-                    'tweets': [],
-                    'count': 0
-                }
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden as e:
-            return False, f"いいね履歴取得権限がありません: {str(e)}"
-        except tweepy.Unauthorized:
-            return False, "認証エラー。X API の認証情報を確認してください。"
-        except Exception as e:
-            return False, f"いいね履歴取得エラー: {str(e)}"
+            tweets_data = []
+            for tweet in liked_tweets.data or []:
+                tweets_data.append({
+                    'id': tweet.id,
+                    'text': tweet.text,
+                    'created_at': tweet.created_at,
+                    'author_id': tweet.author_id,
+                    'public_metrics': tweet.public_metrics
+                })
+            return True, {
+                'account_type': account_type,
+                'tweets': tweets_data,
+                'count': len(tweets_data)
+            }
+        
+        return self._dispatch('get_liked_tweets', cast_id, call)
     
     def retweet(self, tweet_id, cast_id=None):
         """投稿をリツイート（リポスト）する
@@ -530,49 +710,13 @@ class XTwitterPoster:
         Returns:
             tuple: (成功True/失敗False, メッセージ)
         """
-        try:
-            # キャスト指定時はキャスト専用クライアントを使用
-            if cast_id is not None:
-                if cast_id not in self.cast_clients:
-                    return False, f"キャストID {cast_id} の認証情報が設定されていません"
-                client = self.cast_clients[cast_id]
-                account_type = f"キャスト (ID: {cast_id})"
-            else:
-                # グローバル認証を使用
-                if not self.api_initialized:
-                    success, message = self.setup_credentials()
-                    if not success:
-                        return False, f"認証失敗: {message}"
-                client = self.client
-                account_type = "グローバルアカウント"
-            
-            # リツイートを実行
+        def call(client, account_type):
             response = client.retweet(tweet_id)
-            
             if response.data and response.data.get('retweeted'):
                 return True, f"✅ {account_type}で投稿をリツイートしました (Tweet ID: {tweet_id})"
-            else:
-                return False, f"❌ リツイートに失敗しました: {response}"
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました（FREEプラン: 1回/15分）。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden as e:
-            error_detail = str(e)
-            if "403 Forbidden" in error_detail:
-                if "attached to a Project" in error_detail:
-                    return False, f"❌ アプリがプロジェクトに紐付いていません: {error_detail}\n💡 X Developer Portalでプロジェクト内にアプリを作成し直してください。"
-                elif "already retweeted" in error_detail.lower():
-                    return False, f"❌ この投稿は既にリツイート済みです"
-                else:
-                    return False, f"❌ リツイート権限エラー: {error_detail}\n💡 アプリの権限設定(Read and Write)を確認してください。"
-            else:
-                return False, f"リツイート権限がありません: {error_detail}"
-        except tweepy.Unauthorized as e:
-            return False, f"認証エラー: {str(e)}\n💡 API Key/Token を確認してください。"
-        except tweepy.NotFound:
-            return False, "指定された投稿が見つかりません。投稿IDを確認してください。"
-        except Exception as e:
-            return False, f"リツイートエラー: {str(e)}"
+            return False, f"❌ リツイートに失敗しました: {response}"
+        
+        return self._dispatch('retweet', cast_id, call)
     
     def unretweet(self, tweet_id, cast_id=None):
         """リツイートを取り消す
@@ -584,47 +728,13 @@ class XTwitterPoster:
         Returns:
             tuple: (成功True/失敗False, メッセージ)
         """
-        try:
-            # キャスト指定時はキャスト専用クライアントを使用
-            if cast_id is not None:
-                if cast_id not in self.cast_clients:
-                    return False, f"キャストID {cast_id} の認証情報が設定されていません"
-                client = self.cast_clients[cast_id]
-                account_type = f"キャスト (ID: {cast_id})"
-            else:
-                # グローバル認証を使用
-                if not self.api_initialized:
-                    success, message = self.setup_credentials()
-                    if not success:
-                        return False, f"認証失敗: {message}"
-                client = self.client
-                account_type = "グローバルアカウント"
-            
-            # リツイート取り消しを実行
+        def call(client, account_type):
             response = client.unretweet(tweet_id)
-            
             if response.data and response.data.get('retweeted') == False:
                 return True, f"✅ {account_type}でリツイートを取り消しました (Tweet ID: {tweet_id})"
-            else:
-                return False, f"❌ リツイート取り消しに失敗しました: {response}"
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました（FREEプラン: 1回/15分）。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden as e:
-            error_detail = str(e)
-            if "403 Forbidden" in error_detail:
-                if "not retweeted" in error_detail.lower():
-                    return False, f"❌ この投稿はリツイートしていません"
-                else:
-                    return False, f"❌ リツイート取り消し権限エラー: {error_detail}"
-            else:
-                return False, f"リツイート取り消し権限がありません: {error_detail}"
-        except tweepy.Unauthorized as e:
-            return False, f"認証エラー: {str(e)}\n💡 API Key/Token を確認してください。"
-        except tweepy.NotFound:
-            return False, "指定された投稿が見つかりません。投稿IDを確認してください。"
-        except Exception as e:
-            return False, f"リツイート取り消しエラー: {str(e)}"
+            return False, f"❌ リツイート取り消しに失敗しました: {response}"
+        
+        return self._dispatch('unretweet', cast_id, call)
     
     def quote_tweet(self, tweet_id, comment, cast_id=None):
         """コメント入りリツイート（引用ツイート）
@@ -637,197 +747,133 @@ class XTwitterPoster:
         Returns:
             tuple: (成功True/失敗False, メッセージ)
         """
-        try:
-            # キャスト指定時はキャスト専用クライアントを使用
-            if cast_id is not None:
-                if cast_id not in self.cast_clients:
-                    return False, f"キャストID {cast_id} の認証情報が設定されていません"
-                client = self.cast_clients[cast_id]
-                account_type = f"キャスト (ID: {cast_id})"
-            else:
-                # グローバル認証を使用
-                if not self.api_initialized:
-                    success, message = self.setup_credentials()
-                    if not success:
-                        return False, f"認証失敗: {message}"
-                client = self.client
-                account_type = "グローバルアカウント"
-            
-            # コメント内容の前処理
-            comment = comment.strip()
-            
-            # 文字数制限チェック（X の制限は280文字）
-            if len(comment) > 280:
-                return False, f"コメントが280文字を超えています（{len(comment)}文字）"
-            
-            # コメント入りリツイートを実行
+        # コメント内容の前処理
+        comment = comment.strip()
+        
+        # 文字数制限チェック（X の制限は280文字）
+        if len(comment) > 280:
+            return False, f"コメントが280文字を超えています（{len(comment)}文字）"
+        
+        def call(client, account_type):
             response = client.create_tweet(text=comment, quote_tweet_id=tweet_id)
-            
             if response.data:
                 new_tweet_id = response.data['id']
                 return True, f"✅ {account_type}でコメント入りリツイートしました\n📝 コメント: {comment}\n🔗 新しい投稿ID: {new_tweet_id}\n📄 引用元ID: {tweet_id}"
-            else:
-                return False, f"❌ コメント入りリツイートに失敗しました: {response}"
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました（FREEプラン: 17回/24時間）。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden as e:
-            error_detail = str(e)
-            if "403 Forbidden" in error_detail:
-                if "attached to a Project" in error_detail:
-                    return False, f"❌ アプリがプロジェクトに紐付いていません: {error_detail}\n💡 X Developer Portalでプロジェクト内にアプリを作成し直してください。"
-                else:
-                    return False, f"❌ 投稿権限エラー: {error_detail}\n💡 アプリの権限設定(Read and Write)を確認してください。"
-            else:
-                return False, f"投稿権限がありません: {error_detail}"
-        except tweepy.Unauthorized as e:
-            return False, f"認証エラー: {str(e)}\n💡 API Key/Token を確認してください。"
-        except tweepy.NotFound:
-            return False, "指定された投稿が見つかりません。投稿IDを確認してください。"
-        except Exception as e:
-            return False, f"コメント入りリツイートエラー: {str(e)}"
+            return False, f"❌ コメント入りリツイートに失敗しました: {response}"
+        
+        return self._dispatch('create_tweet', cast_id, call)
     
     def post_tweet_for_cast(self, cast_id, content, cast_name=None, quote_tweet_id=None):
-        """キャスト専用のツイート投稿（コメント入りリツイート対応）"""
-        try:
-            if cast_id not in self.cast_clients:
-                return False, f"キャストID {cast_id} の認証情報が設定されていません"
-            
-            client = self.cast_clients[cast_id]
-            
-            # 投稿内容の前処理
-            tweet_content = content.strip()
-            
-            # 文字数制限チェック
-            if len(tweet_content) > 280:
-                return False, f"投稿内容が280文字を超えています（{len(tweet_content)}文字）"
-            
-            # ツイート投稿（コメント入りリツイート対応）
-            tweet_params = {'text': tweet_content}
-            if quote_tweet_id:
-                tweet_params['quote_tweet_id'] = quote_tweet_id
-            
+        """キャスト専用のツイート投稿（コメント入りリツイート対応、cast_id が None の場合はグローバルアカウント）"""
+        # 投稿内容の前処理
+        tweet_content = content.strip()
+        
+        # 文字数制限チェック（X の制限は280文字）
+        if len(tweet_content) > 280:
+            return False, f"投稿内容が280文字を超えています（{len(tweet_content)}文字）"
+        
+        # ツイート投稿（コメント入りリツイート対応）
+        tweet_params = {'text': tweet_content}
+        if quote_tweet_id:
+            tweet_params['quote_tweet_id'] = quote_tweet_id
+        
+        def call(client, account_type):
             response = client.create_tweet(**tweet_params)
-            
             if response.data:
                 tweet_id = response.data['id']
                 if quote_tweet_id:
-                    return True, f"キャスト (ID: {cast_id}) でコメント入りリツイート投稿成功！ ID: {tweet_id} (引用元: {quote_tweet_id})"
-                else:
-                    return True, f"キャスト (ID: {cast_id}) でツイート投稿成功！ ID: {tweet_id}"
-            else:
-                return False, "投稿に失敗しました"
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden:
-            return False, "投稿権限がありません。X API の設定を確認してください。"
-        except tweepy.Unauthorized:
-            return False, "認証エラー。X API の認証情報を確認してください。"
-        except Exception as e:
-            return False, f"投稿エラー: {str(e)}"
+                    return True, f"{account_type} でコメント入りリツイート投稿成功！ ID: {tweet_id} (引用元: {quote_tweet_id})"
+                return True, f"{account_type} でツイート投稿成功！ ID: {tweet_id}"
+            return False, "投稿に失敗しました"
+        
+        return self._dispatch('create_tweet', cast_id, call)
 
-    def upload_media(self, media_path, cast_id=None):
-        """画像・動画ファイルをX APIにアップロード"""
-        try:
-            # 使用するクライアントを決定
-            if cast_id is not None:
-                if cast_id not in self.cast_clients:
-                    return None, f"キャストID {cast_id} の認証情報が設定されていません"
-                client = self.cast_clients[cast_id]
-            else:
-                if not self.api_initialized:
-                    success, message = self.setup_credentials()
-                    if not success:
-                        return None, f"認証失敗: {message}"
-                client = self.client
-            
-            # ファイル存在確認
-            if not os.path.exists(media_path):
-                return None, f"ファイルが見つかりません: {media_path}"
-            
-            # ファイルサイズ確認（5MB制限）
-            file_size = os.path.getsize(media_path)
-            if file_size > 5 * 1024 * 1024:  # 5MB
-                return None, f"ファイルサイズが5MBを超えています: {file_size / (1024*1024):.1f}MB"
-            
-            # ファイル形式確認
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4']
-            file_ext = os.path.splitext(media_path)[1].lower()
-            if file_ext not in allowed_extensions:
-                return None, f"対応していないファイル形式: {file_ext}"
-            
-            # tweepy v1 API（メディアアップロード用）
+    def _get_api_v1(self, client, cast_id=None):
+        """アカウント別の tweepy v1 API（メディアアップロード用）を取得・再利用"""
+        account_key = cast_id if cast_id is not None else 'global'
+        with self._media_lock:
+            cached = self.api_v1_clients.get(account_key)
+            if cached and cached[0] is client:
+                return cached[1]
             auth = tweepy.OAuth1UserHandler(
                 client.consumer_key,
                 client.consumer_secret,
                 client.access_token,
                 client.access_token_secret
             )
-            api_v1 = tweepy.API(auth, wait_on_rate_limit=True)
-            
-            # メディアアップロード実行
-            media = api_v1.media_upload(media_path)
-            
+            api_v1 = tweepy.API(auth, wait_on_rate_limit=False)
+            api_v1.session.hooks['response'].append(self.rate_limits.response_hook(account_key))
+            self.api_v1_clients[account_key] = (client, api_v1)
+            return api_v1
+
+    def _get_cached_media_id(self, account_key, digest):
+        with self._media_lock:
+            cached = self.media_id_cache.get((account_key, digest))
+            if cached and cached[1] > time.time():
+                return cached[0]
+            self.media_id_cache.pop((account_key, digest), None)
+            return None
+
+    def upload_media(self, media_path, cast_id=None):
+        """画像・動画ファイルをX APIにアップロード（事前検証・自動縮小・アップロード済みIDの再利用）"""
+        # 同じ内容を既にアップロード済みならそのIDを使う（リトライ時の再アップロード防止）
+        try:
+            digest = file_hash(media_path)
+        except OSError as e:
+            return None, f"ファイルを読み込めません: {str(e)}"
+        if digest is None:
+            return None, f"ファイルが見つかりません: {media_path}"
+        account_key = self._account_key(cast_id)
+        cached_media_id = self._get_cached_media_id(account_key, digest)
+        if cached_media_id:
+            return cached_media_id, f"アップロード済みメディアを再利用: {cached_media_id}"
+        
+        # ローカルで検証し、X の制限を超える画像は縮小・再エンコード
+        upload_path, prepare_message = prepare_media(media_path)
+        if not upload_path:
+            return None, prepare_message
+        
+        def call(client, account_type):
+            media = self._get_api_v1(client, cast_id).media_upload(upload_path)
+            ttl = min(getattr(media, 'expires_after_secs', None) or MEDIA_ID_TTL_SECONDS, MEDIA_ID_TTL_SECONDS)
+            with self._media_lock:
+                self.media_id_cache[(account_key, digest)] = (media.media_id, time.time() + ttl)
             return media.media_id, f"メディアアップロード成功: {media.media_id}"
-            
-        except tweepy.TooManyRequests:
-            return None, "API使用制限に達しました。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden:
-            return None, "メディアアップロード権限がありません。"
-        except Exception as e:
-            return None, f"メディアアップロードエラー: {str(e)}"
+        
+        try:
+            return self._dispatch('media_upload', cast_id, call, failure_value=None)
+        finally:
+            # 縮小済みの一時ファイルは成否にかかわらず削除（再試行時は元のファイルから作り直す）
+            discard_prepared(upload_path)
     
     def post_tweet_with_media(self, text, media_paths, cast_name=None, cast_id=None):
         """画像付きツイートを投稿"""
-        try:
-            # メディアファイルをアップロード
-            media_ids = []
-            for media_path in media_paths:
-                media_id, message = self.upload_media(media_path, cast_id)
-                if media_id:
-                    media_ids.append(media_id)
-                else:
-                    return False, f"メディアアップロード失敗: {message}"
-            
-            if not media_ids:
-                return False, "アップロードできるメディアがありません"
-            
-            # 最大4枚まで制限
-            if len(media_ids) > 4:
-                media_ids = media_ids[:4]
-                
-            # 使用するクライアントを決定
-            if cast_id is not None:
-                if cast_id not in self.cast_clients:
-                    return False, f"キャストID {cast_id} の認証情報が設定されていません"
-                client = self.cast_clients[cast_id]
+        # 最大4枚まで制限（アップロード前に絞る）
+        media_paths = list(media_paths)[:MAX_MEDIA_PER_TWEET]
+        if not media_paths:
+            return False, "アップロードできるメディアがありません"
+        
+        # メディアファイルを並列アップロード（順序は維持）
+        with ThreadPoolExecutor(max_workers=len(media_paths)) as executor:
+            upload_results = list(executor.map(lambda path: self.upload_media(path, cast_id), media_paths))
+        
+        media_ids = []
+        for media_id, message in upload_results:
+            if media_id:
+                media_ids.append(media_id)
             else:
-                if not self.api_initialized:
-                    success, message = self.setup_credentials()
-                    if not success:
-                        return False, f"認証失敗: {message}"
-                client = self.client
-            
-            # 画像付きツイート投稿
+                return False, f"メディアアップロード失敗: {message}"
+        
+        def call(client, account_type):
             response = client.create_tweet(text=text, media_ids=media_ids)
-            
             if response.data:
                 tweet_id = response.data['id']
                 tweet_url = f"https://twitter.com/user/status/{tweet_id}"
                 account_info = f" (キャスト: {cast_name})" if cast_name else ""
                 return True, f"画像付きツイート投稿成功{account_info}! URL: {tweet_url}"
-            else:
-                return False, "画像付きツイート投稿に失敗しました"
-                
-        except tweepy.TooManyRequests:
-            return False, "API使用制限に達しました。しばらく待ってから再試行してください。"
-        except tweepy.Forbidden:
-            return False, "投稿権限がありません。X API の設定を確認してください。"
-        except tweepy.Unauthorized:
-            return False, "認証エラー。X API の認証情報を確認してください。"
-        except Exception as e:
-            return False, f"画像付き投稿エラー: {str(e)}"
+            return False, "画像付きツイート投稿に失敗しました"
+        
+        return self._dispatch('create_tweet', cast_id, call)
 
 # グローバルインスタンス
 x_poster = XTwitterPoster()
\ No newline at end of file
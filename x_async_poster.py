@@ -0,0 +1,182 @@
+# X API 非同期実行モード（複数アカウントへの一斉実行用）
+# tweepy の AsyncClient（pip install "tweepy[async]"）で、アカウントごとの操作を並行実行する
+# 同一アカウント内は順番に実行し、レート制限は XTwitterPoster のトラッカーをアカウント別に共有する
+# （アカウントごとの aiohttp セッションに TraceConfig を登録し、すべてのレスポンスの x-rate-limit-* を記録する）
+
+import asyncio
+import time
+
+from lazy_imports import lazy_import
+
+tweepy = lazy_import("tweepy")
+_async_client_class = None
+
+
+def get_async_client_class():
+    """tweepy の AsyncClient（aiohttp が未インストールの場合は None）"""
+    global _async_client_class
+    if _async_client_class is None:
+        try:
+            from tweepy.asynchronous import AsyncClient
+            _async_client_class = AsyncClient
+        except ImportError:
+            _async_client_class = False
+    return _async_client_class or None
+
+
+def async_available():
+    return get_async_client_class() is not None
+
+# 操作 → レート制限のエンドポイント名
+ASYNC_ACTIONS = {
+    'tweet': 'create_tweet',
+    'quote': 'create_tweet',
+    'retweet': 'retweet',
+    'unretweet': 'unretweet',
+    'like': 'like',
+    'unlike': 'unlike',
+}
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+def summarize_batch_results(results):
+    """一括実行結果の集計（成功数・失敗数・アカウント数）"""
+    succeeded = sum(1 for result in results if result and result['success'])
+    return {
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'accounts': len({result['cast_id'] for result in results if result}),
+    }
+
+
+class AsyncFanout:
+    """複数アカウントへの操作を asyncio で並行実行する"""
+
+    def __init__(self, poster, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.poster = poster
+        self.max_concurrency = max(1, max_concurrency)
+
+    def _make_session(self, trace_configs):
+        """アカウント用の aiohttp セッション（イベントループ内で作成する）"""
+        import aiohttp
+        return aiohttp.ClientSession(trace_configs=trace_configs)
+
+    def _build_async_client(self, cast_id, session):
+        """同期クライアント（認証情報キャッシュ済み）と同じ認証情報で AsyncClient を作成
+
+        Returns:
+            tuple: (AsyncClient, アカウント種別, エラーメッセージ)
+        """
+        client, account_type, error = self.poster._resolve_client(cast_id)
+        if error:
+            return None, None, error
+        async_client = get_async_client_class()(
+            bearer_token=client.bearer_token,
+            consumer_key=client.consumer_key,
+            consumer_secret=client.consumer_secret,
+            access_token=client.access_token,
+            access_token_secret=client.access_token_secret,
+            wait_on_rate_limit=False
+        )
+        async_client.session = session
+        return async_client, account_type, None
+
+    async def _execute(self, client, account_type, action, params):
+        """1件の操作を実行し (成功, メッセージ) を返す"""
+        tweet_id = params.get('tweet_id')
+        if action in ('tweet', 'quote'):
+            text = (params.get('content') if action == 'tweet' else params.get('comment')) or ''
+            quote_tweet_id = tweet_id if action == 'quote' else params.get('quote_tweet_id')
+            response = await client.create_tweet(text=text.strip(), quote_tweet_id=quote_tweet_id)
+            if response.data:
+                return True, f"✅ {account_type}で投稿しました ID: {response.data['id']}"
+            return False, "投稿に失敗しました"
+        if action == 'retweet':
+            response = await client.retweet(tweet_id)
+            if response.data and response.data.get('retweeted'):
+                return True, f"✅ {account_type}で投稿をリツイートしました (Tweet ID: {tweet_id})"
+            return False, f"❌ リツイートに失敗しました: {response}"
+        if action == 'unretweet':
+            response = await client.unretweet(tweet_id)
+            if response.data and response.data.get('retweeted') == False:
+                return True, f"✅ {account_type}でリツイートを取り消しました (Tweet ID: {tweet_id})"
+            return False, f"❌ リツイート取り消しに失敗しました: {response}"
+        if action == 'like':
+            response = await client.like(tweet_id)
+            if response.data and response.data.get('liked'):
+                return True, f"✅ {account_type}で投稿にいいねしました (Tweet ID: {tweet_id})"
+            return False, f"❌ いいねに失敗しました: {response}"
+        response = await client.unlike(tweet_id)
+        if response.data and response.data.get('liked') == False:
+            return True, f"✅ {account_type}で投稿のいいねを取り消しました (Tweet ID: {tweet_id})"
+        return False, f"❌ いいね取り消しに失敗しました: {response}"
+
+    async def _run_one(self, client, account_type, action):
+        name = action['action']
+        cast_id = action.get('cast_id')
+        params = action.get('params', {})
+        endpoint = ASYNC_ACTIONS.get(name)
+        if endpoint is None:
+            return False, f"未対応の操作です: {name}"
+        text = params.get('content') if name == 'tweet' else params.get('comment') if name == 'quote' else None
+        if text is not None and len(text.strip()) > 280:
+            return False, f"投稿内容が280文字を超えています（{len(text.strip())}文字）"
+
+        # 同期版（like_tweet / unlike_tweet）と同じくプランで利用できない操作は送らない
+        unavailable = self.poster._plan_unavailable_message(endpoint)
+        if unavailable:
+            return False, unavailable
+        blocked = self.poster._acquire_rate_limit(cast_id, endpoint)
+        if blocked:
+            return False, blocked
+
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            success, message = await self._execute(client, account_type, name, params)
+            succeeded = success
+            return success, message
+        except tweepy.TweepyException as e:
+            return False, self.poster._map_error(e, endpoint, cast_id)
+        except Exception as e:
+            return False, f"{name}エラー: {str(e)}"
+        finally:
+            self.poster._record_action(endpoint, time.perf_counter() - started, succeeded)
+
+    async def _run_account(self, cast_id, indexes, actions, results, semaphore):
+        account_key = self.poster._account_key(cast_id)
+        async with semaphore, self._make_session([self.poster.rate_limits.trace_config(account_key)]) as session:
+            try:
+                client, account_type, error = self._build_async_client(cast_id, session)
+            except Exception as e:
+                client, account_type, error = None, None, f"認証設定エラー: {str(e)}"
+            for index in indexes:
+                action = actions[index]
+                started = time.perf_counter()
+                if error:
+                    success, message = False, error
+                else:
+                    success, message = await self._run_one(client, account_type, action)
+                results[index] = {
+                    'action': action['action'],
+                    'cast_id': cast_id,
+                    'success': bool(success),
+                    'message': message,
+                    'elapsed': time.perf_counter() - started,
+                }
+
+    async def run(self, actions):
+        """操作リストを実行し、入力順の結果を返す（形式は XTwitterPoster.run_batch と同じ）"""
+        results = [None] * len(actions)
+        indexes_by_account = {}
+        for index, action in enumerate(actions):
+            indexes_by_account.setdefault(action.get('cast_id'), []).append(index)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.gather(*[
+            self._run_account(cast_id, indexes, actions, results, semaphore)
+            for cast_id, indexes in indexes_by_account.items()
+        ])
+        return results
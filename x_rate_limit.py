@@ -0,0 +1,233 @@
+# X API レート制限トラッカー
+# レスポンスの x-rate-limit-* ヘッダー（と 429 応答）から、アカウント・エンドポイント別の残り回数を管理する
+# 制限に達した呼び出しはスリープせず、「いつ再実行できるか」を呼び出し側に返す
+# プラン別の既定枠での見積もりは use_plan_defaults=True の場合のみ（実際の枠と違うと呼び出しを誤って止めるため既定では使わない）
+
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+JST = timezone(timedelta(hours=9))
+
+WINDOW_15MIN = 15 * 60
+WINDOW_24H = 24 * 60 * 60
+
+# プラン別の既定枠（ユーザー単位）: エンドポイント → (回数, ウィンドウ秒)
+# use_plan_defaults=True の場合、ヘッダーを受信するまではこの枠で残り回数を見積もる。回数 0 は利用不可
+PLAN_LIMITS = {
+    'free': {
+        'create_tweet': (17, WINDOW_24H),
+        'delete_tweet': (17, WINDOW_24H),
+        'retweet': (1, WINDOW_15MIN),
+        'unretweet': (1, WINDOW_15MIN),
+        'like': (0, WINDOW_24H),
+        'unlike': (0, WINDOW_24H),
+        'get_liked_tweets': (1, WINDOW_15MIN),
+        'get_me': (25, WINDOW_24H),
+        'get_users_tweets': (1, WINDOW_15MIN),
+        'media_upload': (17, WINDOW_24H),
+    },
+    'basic': {
+        'create_tweet': (100, WINDOW_24H),
+        'delete_tweet': (17, WINDOW_15MIN),
+        'retweet': (5, WINDOW_15MIN),
+        'unretweet': (5, WINDOW_15MIN),
+        'like': (200, WINDOW_24H),
+        'unlike': (100, WINDOW_24H),
+        'get_liked_tweets': (5, WINDOW_15MIN),
+        'get_me': (250, WINDOW_24H),
+        'get_users_tweets': (5, WINDOW_15MIN),
+        'media_upload': (100, WINDOW_24H),
+    },
+}
+
+ENDPOINT_LABELS = {
+    'create_tweet': '投稿',
+    'delete_tweet': '投稿削除',
+    'retweet': 'リツイート',
+    'unretweet': 'リツイート取消',
+    'like': 'いいね',
+    'unlike': 'いいね取消',
+    'get_liked_tweets': 'いいね履歴',
+    'get_me': 'ユーザー情報',
+    'get_users_tweets': 'ユーザー投稿取得',
+    'media_upload': 'メディアアップロード',
+}
+
+# リクエスト（メソッド, URL）→ エンドポイント名
+_ENDPOINT_PATTERNS = [
+    ('POST', re.compile(r'/2/tweets/?$'), 'create_tweet'),
+    ('DELETE', re.compile(r'/2/tweets/\d+$'), 'delete_tweet'),
+    ('POST', re.compile(r'/2/users/\d+/retweets$'), 'retweet'),
+    ('DELETE', re.compile(r'/2/users/\d+/retweets/\d+$'), 'unretweet'),
+    ('POST', re.compile(r'/2/users/\d+/likes$'), 'like'),
+    ('DELETE', re.compile(r'/2/users/\d+/likes/\d+$'), 'unlike'),
+    ('GET', re.compile(r'/2/users/\d+/liked_tweets$'), 'get_liked_tweets'),
+    ('GET', re.compile(r'/2/users/me$'), 'get_me'),
+    ('GET', re.compile(r'/2/users/\d+/tweets$'), 'get_users_tweets'),
+    ('POST', re.compile(r'/1\.1/media/upload\.json$'), 'media_upload'),
+]
+
+
+def endpoint_for_request(method, url):
+    """HTTPメソッドとURLからエンドポイント名を判定（対象外は None）"""
+    path = url.split('?', 1)[0]
+    for pattern_method, pattern, endpoint in _ENDPOINT_PATTERNS:
+        if method == pattern_method and pattern.search(path):
+            return endpoint
+    return None
+
+
+class RateLimitTracker:
+    """アカウント・エンドポイント別のレート制限状態（スレッドセーフ）"""
+
+    def __init__(self, plan='free', use_plan_defaults=False):
+        self.plan = plan if plan in PLAN_LIMITS else 'free'
+        self.use_plan_defaults = use_plan_defaults
+        self._states = {}  # (account, endpoint) → 状態
+        self._lock = threading.Lock()
+
+    def _plan_limit(self, endpoint):
+        if not self.use_plan_defaults:
+            return None
+        return PLAN_LIMITS[self.plan].get(endpoint)
+
+    def _state(self, account, endpoint, now):
+        """状態を取得（ウィンドウが過ぎていればリセット）。ロック内で呼ぶ
+
+        ヘッダー・429 応答を受信していない場合は None（プランの既定枠を使う設定の場合のみ既定枠で作成）
+        """
+        key = (account, endpoint)
+        state = self._states.get(key)
+        if state and state['reset_at'] <= now:
+            state = None
+        if state is None:
+            plan_limit = self._plan_limit(endpoint)
+            if plan_limit is None:
+                return None
+            limit, window = plan_limit
+            state = {
+                'limit': limit,
+                'remaining': limit,
+                'reset_at': now + window,
+                'source': 'plan',
+            }
+            self._states[key] = state
+        return state
+
+    def check(self, account, endpoint):
+        """呼び出し可能か確認する（スリープしない）
+
+        Returns:
+            tuple: (実行可能True/不可False, 再実行できるまでの秒数)
+        """
+        now = time.time()
+        with self._lock:
+            state = self._state(account, endpoint, now)
+            if state is None or state['remaining'] > 0:
+                return True, 0
+            return False, max(0, int(state['reset_at'] - now) + 1)
+
+    def next_available_at(self, account, endpoint):
+        """次に呼び出せる時刻（JST文字列）。すぐ呼べる場合は None"""
+        allowed, wait_seconds = self.check(account, endpoint)
+        if allowed:
+            return None
+        return (datetime.now(JST) + timedelta(seconds=wait_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+
+    def record_call(self, account, endpoint):
+        """呼び出しを1回分消費する（ヘッダーを受信した場合はそちらで上書きされる）"""
+        now = time.time()
+        with self._lock:
+            state = self._state(account, endpoint, now)
+            if state is not None and state['remaining'] > 0:
+                state['remaining'] -= 1
+
+    def record_headers(self, account, endpoint, headers, status_code=None):
+        """レスポンスの x-rate-limit-* ヘッダーで状態を更新する"""
+        now = time.time()
+        limit = headers.get('x-rate-limit-limit')
+        remaining = headers.get('x-rate-limit-remaining')
+        reset = headers.get('x-rate-limit-reset')
+        with self._lock:
+            if limit is not None and remaining is not None and reset is not None:
+                try:
+                    self._states[(account, endpoint)] = {
+                        'limit': int(limit),
+                        'remaining': int(remaining),
+                        'reset_at': float(reset),
+                        'source': 'header',
+                    }
+                except ValueError:
+                    pass
+            if status_code == 429:
+                state = self._state(account, endpoint, now)
+                if state is None:
+                    state = {'limit': 0, 'remaining': 0, 'reset_at': now + WINDOW_15MIN, 'source': 'header'}
+                    self._states[(account, endpoint)] = state
+                state['remaining'] = 0
+                # 24時間枠の使い切りは x-user-limit-24hour-reset で通知される
+                user_reset = headers.get('x-user-limit-24hour-reset')
+                if user_reset:
+                    try:
+                        state['reset_at'] = max(state['reset_at'], float(user_reset))
+                    except ValueError:
+                        pass
+
+    def record_response(self, account, method, url, headers, status_code):
+        """X API のレスポンス1件を記録（対象外のURLは無視）。同期・非同期クライアント共通"""
+        endpoint = endpoint_for_request(method, url)
+        if endpoint:
+            self.record_headers(account, endpoint, headers, status_code)
+
+    def response_hook(self, account):
+        """requests のレスポンスフックを生成（tweepy のセッションに登録して使う）"""
+        def hook(response, *args, **kwargs):
+            self.record_response(account, response.request.method, response.request.url,
+                                 response.headers, response.status_code)
+            return response
+        return hook
+
+    def trace_config(self, account):
+        """aiohttp の TraceConfig を生成（AsyncClient のセッションに登録して、すべてのレスポンスのヘッダーを記録する）"""
+        import aiohttp
+
+        async def on_request_end(session, context, params):
+            self.record_response(account, params.method, str(params.url), params.response.headers, params.response.status)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    def blocked_message(self, account, endpoint):
+        """制限中なら表示用メッセージを返す（実行可能なら None）"""
+        allowed, wait_seconds = self.check(account, endpoint)
+        if allowed:
+            return None
+        label = ENDPOINT_LABELS.get(endpoint, endpoint)
+        plan_limit = self._plan_limit(endpoint)
+        if plan_limit is not None and plan_limit[0] == 0:
+            return f"❌ 現在のプラン（{self.plan.upper()}）では{label}は利用できません"
+        minutes = max(1, (wait_seconds + 59) // 60)
+        return f"API使用制限中です（{label}）。約{minutes}分後（{self.next_available_at(account, endpoint)}）に再実行できます。"
+
+    def snapshot(self, account=None):
+        """UI表示用に残り回数の一覧を返す"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for (state_account, endpoint), state in sorted(self._states.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+                if account is not None and state_account != account:
+                    continue
+                expired = state['reset_at'] <= now
+                rows.append({
+                    'account': state_account,
+                    'endpoint': endpoint,
+                    'label': ENDPOINT_LABELS.get(endpoint, endpoint),
+                    'limit': state['limit'],
+                    'remaining': state['limit'] if expired else state['remaining'],
+                    'reset_at': None if expired else datetime.fromtimestamp(state['reset_at'], JST).strftime('%Y-%m-%d %H:%M:%S'),
+                    'source': state['source'],
+                })
+        return rows